@@ -0,0 +1,183 @@
+"""
+Benchmark suite of the shipped algorithms on reproducible synthetic data: word_count_graph, inverted_index_graph
+and pmi_graph on a Zipf-distributed text corpus, yandex_maps_graph on travel times over random road graph edges.
+Rows are input rows: documents for the text algorithms, travel times for yandex maps (with one edge per
+ten travel times). Data is generated on the fly from fixed seeds, so it does not take memory of the run.
+
+Every case runs in its own process, which reports wall time, throughput in input rows per second and
+peak RSS of the process (sort workers are not included). Results may be saved as JSON baseline and later
+runs compared with it: throughput below baseline or peak memory above it by more than tolerance
+is reported as regression and the suite exits with status 1. Baseline keeps git commit it was taken at,
+re-record it when measured code paths change.
+
+    python benchmarks/bench_algorithms.py --rows 10000 100000 --save benchmarks/baseline.json
+    python benchmarks/bench_algorithms.py --rows 10000 100000 --compare benchmarks/baseline.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import string
+import subprocess
+import sys
+import time
+import typing as tp
+
+from datetime import datetime, timedelta
+
+from compgraph import algorithms, operations as ops
+from compgraph.graph import Graph
+
+ALGORITHMS = ["word_count", "inverted_index", "pmi", "yandex_maps"]
+
+
+def zipf_vocabulary(size: int, rng: random.Random) -> list[str]:
+    """Distinct random words ordered by rank, frequent words are short as in natural language"""
+    words: list[str] = []
+    seen = set()
+    while len(words) < size:
+        word = "".join(rng.choices(string.ascii_lowercase, k=2 + len(words).bit_length() // 2 + rng.randint(0, 3)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def zipf_corpus(n_docs: int, vocabulary: int = 10_000, exponent: float = 1.1,
+                seed: int = 1) -> ops.TRowsGenerator:
+    """Documents of 20-80 words drawn from Zipf distribution, some words are capitalized or punctuated"""
+    rng = random.Random(seed)
+    words = zipf_vocabulary(vocabulary, rng)
+    cum_weights = list(itertools.accumulate(rank ** -exponent for rank in range(1, vocabulary + 1)))
+    marks = ["", "", "", "", ",", ".", "!", "?"]
+    for doc_id in range(n_docs):
+        text = rng.choices(words, cum_weights=cum_weights, k=rng.randint(20, 80))
+        yield {"doc_id": doc_id,
+               "text": " ".join(word.capitalize() + rng.choice(marks) if rng.random() < 0.1 else word
+                                for word in text)}
+
+
+def road_edges(n_edges: int, seed: int = 2) -> ops.TRowsGenerator:
+    """Straight road segments of up to about 1 km around Moscow"""
+    rng = random.Random(seed)
+    for edge_id in range(n_edges):
+        lon, lat = rng.uniform(37.3, 37.9), rng.uniform(55.5, 55.9)
+        yield {"edge_id": edge_id, "start": [lon, lat],
+               "end": [lon + rng.uniform(-0.01, 0.01), lat + rng.uniform(-0.005, 0.005)]}
+
+
+def travel_times(n_rows: int, n_edges: int, seed: int = 3) -> ops.TRowsGenerator:
+    """Passages of random edges during one month, taking from 1 second to 2 minutes"""
+    rng = random.Random(seed)
+    month = datetime(2017, 10, 1)
+    for _ in range(n_rows):
+        enter = month + timedelta(seconds=rng.uniform(0, 31 * 86400))
+        leave = enter + timedelta(seconds=rng.uniform(1, 120))
+        yield {"enter_time": enter.strftime("%Y%m%dT%H%M%S.%f"), "leave_time": leave.strftime("%Y%m%dT%H%M%S.%f"),
+               "edge_id": rng.randrange(n_edges)}
+
+
+def make_case(algorithm: str, rows: int) -> tuple[Graph, dict[str, tp.Any]]:
+    """Graph of algorithm and its data sources for run"""
+    if algorithm == "yandex_maps":
+        n_edges = max(rows // 10, 1)
+        graph = algorithms.yandex_maps_graph("times", "lengths")
+        return graph, {"times": lambda: travel_times(rows, n_edges), "lengths": lambda: road_edges(n_edges)}
+    graph = getattr(algorithms, f"{algorithm}_graph")("docs")
+    return graph, {"docs": lambda: zipf_corpus(rows)}
+
+
+def run_case(algorithm: str, rows: int) -> dict[str, tp.Any]:
+    """Run one case in this process"""
+    graph, sources = make_case(algorithm, rows)
+    start = time.perf_counter()
+    output_rows = sum(1 for _ in graph.run(**sources))
+    seconds = time.perf_counter() - start
+    return {"algorithm": algorithm, "rows": rows, "seconds": seconds, "rows_per_second": rows / seconds,
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, "output_rows": output_rows}
+
+
+def measure(algorithm: str, rows: int, repeat: int) -> dict[str, tp.Any]:
+    """Best of repeat runs of case, every run in a fresh process"""
+    best: dict[str, tp.Any] | None = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, __file__, "--run-case", algorithm, "--rows", str(rows)],
+                                check=True, capture_output=True, text=True).stdout
+        result: dict[str, tp.Any] = json.loads(output)
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    assert best is not None
+    return best
+
+
+def source_commit() -> str | None:
+    """Git commit of the measured tree, None outside of git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results: list[dict[str, tp.Any]], baseline: list[dict[str, tp.Any]],
+                tolerance: float) -> list[str]:
+    """Descriptions of cases whose throughput or peak memory is worse than in baseline by more than tolerance"""
+    expected = {(result["algorithm"], result["rows"]): result for result in baseline}
+    found = []
+    for result in results:
+        base = expected.get((result["algorithm"], result["rows"]))
+        if base is None:
+            continue
+        name = f"{result['algorithm']} at {result['rows']} rows"
+        if result["rows_per_second"] < base["rows_per_second"] * (1 - tolerance):
+            found.append(f"{name}: throughput {result['rows_per_second']:.0f} rows/s, "
+                         f"baseline {base['rows_per_second']:.0f} rows/s")
+        if result["peak_rss_bytes"] > base["peak_rss_bytes"] * (1 + tolerance):
+            found.append(f"{name}: peak memory {result['peak_rss_bytes'] / 2 ** 20:.0f} MiB, "
+                         f"baseline {base['peak_rss_bytes'] / 2 ** 20:.0f} MiB")
+        if result["output_rows"] != base["output_rows"]:
+            found.append(f"{name}: {result['output_rows']} output rows, baseline {base['output_rows']}")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=ALGORITHMS)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--save", help="save results as JSON baseline to this path")
+    parser.add_argument("--compare", help="compare results with JSON baseline from this path")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--run-case", choices=ALGORITHMS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case is not None:
+        print(json.dumps(run_case(args.run_case, args.rows[0])))
+        return
+
+    results = []
+    for algorithm, rows in itertools.product(args.algorithms, args.rows):
+        result = measure(algorithm, rows, args.repeat)
+        results.append(result)
+        print(f"{algorithm:15} {rows:>9} rows: {result['seconds']:8.2f} s, {result['rows_per_second']:9.0f} rows/s, "
+              f"peak {result['peak_rss_bytes'] / 2 ** 20:6.0f} MiB")
+    if args.save:
+        with open(args.save, "w") as out:
+            json.dump({"commit": source_commit(), "python": platform.python_version(), "machine": platform.machine(),
+                       "results": results}, out, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        print(f"baseline taken at commit {baseline.get('commit')}")
+        found = regressions(results, baseline["results"], args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
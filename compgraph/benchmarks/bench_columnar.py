@@ -0,0 +1,78 @@
+"""
+Rows/sec of numeric mappers and reducers in row mode (ops.Map / ops.Reduce over dict rows)
+against columnar mode (ColumnarMap / ColumnarReduce with numpy kernels), including conversion
+of rows to record batches and back, which columnar mode pays at boundaries with row operations.
+
+    python benchmarks/bench_columnar.py --rows 500000 --batch-size 4096
+"""
+import argparse
+import random
+import time
+import typing as tp
+
+from datetime import datetime, timedelta
+
+from compgraph import operations as ops
+from compgraph.columnar import ColumnarMap, ColumnarReduce
+
+
+def make_rows(n: int) -> list[ops.TRow]:
+    return [{"doc_id": i // 10, "text": f"word{i % 1000}", "count_docs": 1000 + i % 7,
+             "count_docs_with_word": 1 + i % 50, "tf": 1 / (1 + i % 10), "count_words_in_this_doc": 1 + i % 90,
+             "count_words_in_all_docs": 100_000,
+             "a": i % 100, "b": 0.5 * (i % 17)} for i in range(n)]
+
+
+def make_trips(n: int) -> list[ops.TRow]:
+    rng = random.Random(0)
+    trips = []
+    for i in range(n):
+        enter = datetime(2017, 10, 1) + timedelta(seconds=rng.uniform(0, 31 * 86400))
+        leave = enter + timedelta(seconds=rng.uniform(0, 60))
+        trips.append({"enter_time": enter.strftime("%Y%m%dT%H%M%S.%f"),
+                      "leave_time": leave.strftime("%Y%m%dT%H%M%S.%f"),
+                      "edge_id": i, "start": [rng.uniform(37, 38), rng.uniform(55, 56)],
+                      "end": [rng.uniform(37, 38), rng.uniform(55, 56)]})
+    return trips
+
+
+def measure(operation: tp.Callable[[ops.TRowsIterable], ops.TRowsIterable], rows: list[ops.TRow]) -> float:
+    start = time.perf_counter()
+    for _ in operation(iter(rows)):
+        pass
+    return len(rows) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    mappers: dict[str, list[ops.Mapper]] = {
+        "Product": [ops.Product(["a", "b"])],
+        "CalculateIdf": [ops.CalculateIdf()],
+        "CalculatePMI": [ops.CalculatePMI()],
+        "Idf + PMI + Product": [ops.CalculateIdf(), ops.CalculatePMI(), ops.Product(["a", "b"])],
+    }
+    for name, chain in mappers.items():
+        row_mode = measure(ops.FusedMap(chain), rows)
+        columnar = measure(ColumnarMap(chain, args.batch_size), rows)
+        print(f"{name:>20}: rows {row_mode:>12,.0f} rows/sec, columnar {columnar:>12,.0f} rows/sec "
+              f"(x{columnar / row_mode:.1f})")
+    for name, reducer in {"Count": ops.Count("count"), "Sum": ops.Sum("a")}.items():
+        row_mode = measure(ops.Reduce(reducer, ["doc_id"]), rows)
+        columnar = measure(ColumnarReduce(reducer, ["doc_id"], args.batch_size), rows)
+        print(f"{name:>20}: rows {row_mode:>12,.0f} rows/sec, columnar {columnar:>12,.0f} rows/sec "
+              f"(x{columnar / row_mode:.1f})")
+    trips = make_trips(args.rows)
+    mapper = ops.CalculateTimeAndDistance()
+    row_mode = measure(ops.Map(mapper), trips)
+    columnar = measure(ColumnarMap([mapper], args.batch_size), trips)
+    print(f"{'TimeAndDistance':>20}: rows {row_mode:>12,.0f} rows/sec, columnar {columnar:>12,.0f} rows/sec "
+          f"(x{columnar / row_mode:.1f})")
+
+
+if __name__ == "__main__":
+    main()
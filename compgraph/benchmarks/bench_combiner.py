@@ -0,0 +1,64 @@
+"""
+Word count with and without map-side combining: rows are sorted and reduced by Count as is
+(graph before combining) against ops.Combine folding them into partial counts first,
+so the sort gets about one row per distinct word.
+
+    python benchmarks/bench_combiner.py --docs 20000 --words 1000 --repeat 3
+"""
+import argparse
+import random
+import time
+import typing as tp
+
+from compgraph import algorithms, operations as ops
+from compgraph.external_sort import ExternalSort
+
+
+def make_docs(n: int, n_words: int) -> list[ops.TRow]:
+    rng = random.Random(1)
+    words = [f"word{i}" for i in range(n_words)]
+    return [{"doc_id": i, "text": " ".join(rng.choice(words) for _ in range(50))} for i in range(n)]
+
+
+def run_plain(rows: list[ops.TRow]) -> list[ops.TRow]:
+    return list(ops.Reduce(ops.Count("count"), ["text"])(ExternalSort(["text"])(iter(rows))))
+
+
+def run_combined(rows: list[ops.TRow]) -> list[ops.TRow]:
+    reducer = ops.Count("count")
+    combined = ops.Combine(reducer, ["text"])(iter(rows))
+    return list(ops.Reduce(reducer.merger(), ["text"])(ExternalSort(["text"])(combined)))
+
+
+def measure(run: tp.Callable[[list[ops.TRow]], list[ops.TRow]], rows: list[ops.TRow], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--words", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    docs = make_docs(args.docs, args.words)
+    rows = list(ops.FusedMap([ops.FilterPunctuation("text"), ops.LowerCase("text"), ops.Split("text")])(docs))
+    assert run_plain(rows) == run_combined(rows)
+    plain = measure(run_plain, rows, args.repeat)
+    combined = measure(run_combined, rows, args.repeat)
+    print(f"{len(rows)} tokens, {args.words} distinct words: "
+          f"sort + Count {plain:.2f} s, Combine + sort + merge {combined:.2f} s (x{plain / combined:.2f})")
+    graph = algorithms.word_count_graph("docs")
+    start = time.perf_counter()
+    for _ in graph.run(docs=lambda: iter(docs)):
+        pass
+    print(f"word_count_graph: {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
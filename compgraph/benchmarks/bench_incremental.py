@@ -0,0 +1,50 @@
+"""
+Daily word count over a growing corpus: word_count_graph rerun over all documents every day against
+word_count_incremental_graph reading only documents of the day and counts persisted by the previous day.
+
+    python benchmarks/bench_incremental.py --days 5 --docs-per-day 20000 --words 20000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from compgraph import algorithms, operations as ops
+
+
+def make_docs(n: int, n_words: int, seed: int) -> list[ops.TRow]:
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(n_words)]
+    return [{"doc_id": i, "text": " ".join(rng.choice(words) for _ in range(50))} for i in range(n)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--docs-per-day", type=int, default=20_000)
+    parser.add_argument("--words", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        state_filename = os.path.join(directory, "state")
+        incremental_graph = algorithms.word_count_incremental_graph("docs", state_filename)
+        full_graph = algorithms.word_count_graph("docs")
+        corpus: list[ops.TRow] = []
+        for day in range(args.days):
+            docs = make_docs(args.docs_per_day, args.words, day)
+            corpus += docs
+            start = time.perf_counter()
+            full = list(full_graph.run(docs=lambda: iter(corpus)))
+            full_time = time.perf_counter() - start
+            start = time.perf_counter()
+            incremental = list(incremental_graph.run(docs=lambda: iter(docs)))
+            incremental_time = time.perf_counter() - start
+            assert incremental == full
+            print(f"day {day + 1}: {len(corpus)} docs, {len(full)} words, state {os.path.getsize(state_filename)} "
+                  f"bytes: full {full_time:.2f} s, incremental {incremental_time:.2f} s "
+                  f"(x{full_time / incremental_time:.2f})")
+
+
+if __name__ == "__main__":
+    main()
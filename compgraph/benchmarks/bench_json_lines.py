@@ -0,0 +1,87 @@
+"""
+Throughput of reading JSON lines files shaped like inputs of `algorithms`: documents of word count,
+inverted index and pmi, travel times and road graph of yandex maps. ops.Read with json.loads per text line
+is compared with ops.ReadJsonLines decoding binary blocks with json module and with orjson (if installed)
+and with ops.ReadMmap scanning memory map of the file.
+
+    python benchmarks/bench_json_lines.py --rows 200000 --repeat 3
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import typing as tp
+
+from compgraph import operations as ops
+from compgraph.operations import operation_impl
+
+
+def make_docs(n: int) -> tp.Iterator[ops.TRow]:
+    rng = random.Random(1)
+    words = [f"Word{i}," for i in range(5000)]
+    for i in range(n):
+        yield {"doc_id": i, "text": " ".join(rng.choice(words) for _ in range(rng.randint(5, 60)))}
+
+
+def make_times(n: int) -> tp.Iterator[ops.TRow]:
+    rng = random.Random(2)
+    for _ in range(n):
+        yield {"leave_time": "20171020T112238.723000", "enter_time": "20171020T112237.427000",
+               "edge_id": rng.getrandbits(63)}
+
+
+def make_lengths(n: int) -> tp.Iterator[ops.TRow]:
+    rng = random.Random(3)
+    for _ in range(n):
+        yield {"start": [rng.uniform(37, 38), rng.uniform(55, 56)], "end": [rng.uniform(37, 38), rng.uniform(55, 56)],
+               "edge_id": rng.getrandbits(63)}
+
+
+def measure(read: tp.Callable[[], tp.Iterable[ops.TRow]], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in read():
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    inputs = {"docs": make_docs, "travel times": make_times, "road graph": make_lengths}
+    orjson = operation_impl.orjson
+    for name, make_rows in inputs.items():
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        try:
+            with os.fdopen(fd, "w") as f:
+                for row in make_rows(args.rows):
+                    f.write(json.dumps(row) + "\n")
+            megabytes = os.path.getsize(path) / 1e6
+            readers: dict[str, tp.Callable[[], tp.Iterable[ops.TRow]]] = {
+                "Read + json.loads": ops.Read(path, json.loads),
+                "ReadMmap + json.loads": ops.ReadMmap(path, json.loads),
+                "ReadJsonLines, json": ops.ReadJsonLines(path),
+            }
+            if orjson is not None:
+                readers["ReadJsonLines, orjson"] = ops.ReadJsonLines(path)
+                readers["ReadMmap, orjson"] = ops.ReadMmap(path)
+            print(f"{name}: {args.rows} rows, {megabytes:.1f} MB")
+            for reader_name, read in readers.items():
+                setattr(operation_impl, "orjson", orjson if reader_name.endswith("orjson") else None)
+                seconds = measure(read, args.repeat)
+                print(f"  {reader_name:>22}: {megabytes / seconds:7.1f} MB/s, "
+                      f"{args.rows / seconds / 1e6:5.2f} M rows/s")
+        finally:
+            operation_impl.orjson = orjson
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Per-row cost of a chain of maps: one ops.Map generator per mapper (graph before fusion)
+against ops.FusedMap applying the whole chain in one pass. The word count chain
+FilterPunctuation -> LowerCase -> Split and a chain of mappers giving one row per row (which fused map
+runs as plain calls on one copy of row) are measured together with a chain of DummyMapper,
+which shows pure per-layer overhead.
+
+    python benchmarks/bench_map_fusion.py --rows 200000 --repeat 5
+"""
+import argparse
+import time
+import typing as tp
+
+from compgraph import operations as ops
+
+
+def make_rows(n: int) -> list[ops.TRow]:
+    return [{"doc_id": i, "text": f"Hello, little World{i % 100}!"} for i in range(n)]
+
+
+def run_chain(rows: list[ops.TRow], mappers: list[ops.Mapper]) -> None:
+    stream: ops.TRowsIterable = rows
+    for mapper in mappers:
+        stream = ops.Map(mapper)(stream)
+    for _ in stream:
+        pass
+
+
+def run_fused(rows: list[ops.TRow], mappers: list[ops.Mapper]) -> None:
+    for _ in ops.FusedMap(mappers)(rows):
+        pass
+
+
+def measure(run: tp.Callable[[list[ops.TRow], list[ops.Mapper]], None], rows: list[ops.TRow],
+            mappers: list[ops.Mapper], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(rows, mappers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    chains: dict[str, list[ops.Mapper]] = {
+        "tokenize chain": [ops.FilterPunctuation("text"), ops.LowerCase("text"), ops.Split("text")],
+        "one-row chain": [ops.FilterPunctuation("text"), ops.LowerCase("text"),
+                          ops.Filter(lambda row: bool(row["text"])), ops.Project(["doc_id", "text"])],
+        "3 x DummyMapper": [ops.DummyMapper() for _ in range(3)],
+        "8 x DummyMapper": [ops.DummyMapper() for _ in range(8)],
+    }
+    for name, mappers in chains.items():
+        chained = measure(run_chain, rows, mappers, args.repeat)
+        fused = measure(run_fused, rows, mappers, args.repeat)
+        print(f"{name:>16}: chained {chained / args.rows * 1e9:7.0f} ns/row, "
+              f"fused {fused / args.rows * 1e9:7.0f} ns/row (x{chained / fused:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Ingestion of a JSON lines corpus followed by the word count tokenize maps: reading in place
+(ReadJsonLines + FusedMap) against ParallelRead, which parses line-aligned byte ranges and applies
+the maps in worker processes. Scaling needs as many free cores as workers.
+
+    python benchmarks/bench_parallel_read.py --docs 100000 --workers 1 2 4
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from compgraph.graph import Graph
+from compgraph import operations as ops
+
+
+def write_docs(path: str, n: int) -> None:
+    rng = random.Random(1)
+    words = [f"Word{i}," for i in range(5000)]
+    with open(path, "w") as f:
+        for i in range(n):
+            f.write(json.dumps({"doc_id": i, "text": " ".join(rng.choice(words) for _ in range(30))}) + "\n")
+
+
+def tokenized(path: str, workers: int | None) -> Graph:
+    return Graph.graph_from_json_lines(path, workers=workers) \
+        .map(ops.FilterPunctuation("text")) \
+        .map(ops.LowerCase("text")) \
+        .map(ops.Split("text"))
+
+
+def measure(graph: Graph) -> tuple[float, int]:
+    start = time.perf_counter()
+    rows = sum(1 for _ in graph.run())
+    return time.perf_counter() - start, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    try:
+        write_docs(path, args.docs)
+        megabytes = os.path.getsize(path) / 1e6
+        print(f"{args.docs} docs, {megabytes:.1f} MB, {os.cpu_count()} cpus")
+        seconds, rows = measure(tokenized(path, None))
+        print(f"  {'in place':>12}: {seconds:6.2f} s, {megabytes / seconds:6.1f} MB/s, {rows} rows")
+        for workers in args.workers:
+            seconds, rows = measure(tokenized(path, workers))
+            print(f"  {f'{workers} workers':>12}: {seconds:6.2f} s, {megabytes / seconds:6.1f} MB/s, {rows} rows")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Rows as dicts against compact records (ops.Record): memory taken by tokens of documents held in memory,
+as sort buffers hold them, time of mapping documents into tokens, and time and peak memory of
+inverted index graph run with and without compact=True.
+
+    python benchmarks/bench_records.py --docs 20000 --repeat 3
+"""
+import argparse
+import random
+import time
+import tracemalloc
+import typing as tp
+
+from compgraph import algorithms, operations as ops
+
+
+def make_docs(n: int) -> list[ops.TRow]:
+    rng = random.Random(1)
+    words = [f"Word{i}," for i in range(1000)]
+    return [{"doc_id": i, "text": " ".join(rng.choice(words) for _ in range(50))} for i in range(n)]
+
+
+def tokenize(rows: ops.TRowsIterable) -> list[ops.TRow]:
+    return list(ops.FusedMap([ops.FilterPunctuation("text"), ops.LowerCase("text"), ops.Split("text")])(rows))
+
+
+def measure(run: tp.Callable[[], tp.Any], repeat: int) -> tuple[float, int]:
+    """Best time of run and its peak of allocated memory"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    docs = make_docs(args.docs)
+    assert tokenize(docs) == tokenize(ops.to_records(docs))
+    for name, run in [("dict", lambda: tokenize(docs)), ("record", lambda: tokenize(ops.to_records(docs)))]:
+        seconds, peak = measure(run, args.repeat)
+        print(f"tokens as {name:6}: {seconds:.2f} s, peak {peak / 2 ** 20:.0f} MiB")
+
+    graph = algorithms.inverted_index_graph("docs")
+    for compact in [False, True]:
+        seconds, peak = measure(lambda: list(graph.run(compact=compact, docs=lambda: iter(docs))), args.repeat)
+        print(f"inverted_index_graph compact={compact}: {seconds:.2f} s, peak {peak / 2 ** 20:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Splitting documents into words: FilterPunctuation, LowerCase and Split fused in one map
+(chain used by the text algorithms before) against ops.Tokenize, alone and as part of word count.
+
+    python benchmarks/bench_tokenize.py --docs 20000 --repeat 3
+"""
+import argparse
+import random
+import time
+import typing as tp
+
+from compgraph import Graph, algorithms, operations as ops
+
+
+def make_docs(n: int) -> list[ops.TRow]:
+    rng = random.Random(1)
+    words = [f"Word{i}" for i in range(1000)] + ["a", "the", "of"]
+    marks = ["", "", "", ",", ".", "!", "?!"]
+    return [{"doc_id": i, "text": " ".join(rng.choice(words) + rng.choice(marks) for _ in range(50))}
+            for i in range(n)]
+
+
+def chain_word_count() -> Graph:
+    return Graph.graph_from_iter("docs") \
+        .map(ops.FilterPunctuation("text")) \
+        .map(ops.LowerCase("text")) \
+        .map(ops.Split("text")) \
+        .sort(["text"]) \
+        .reduce(ops.Count("count"), ["text"]) \
+        .sort(["count", "text"])
+
+
+def measure(run: tp.Callable[[], tp.Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    docs = make_docs(args.docs)
+    chain = ops.FusedMap([ops.FilterPunctuation("text"), ops.LowerCase("text"), ops.Split("text")])
+    tokenize = ops.Map(ops.Tokenize("text"))
+    tokens = list(tokenize(iter(docs)))
+    assert tokens == list(chain(iter(docs)))
+    before = measure(lambda: list(chain(iter(docs))), args.repeat)
+    after = measure(lambda: list(tokenize(iter(docs))), args.repeat)
+    print(f"{len(tokens)} tokens: three mappers {before:.2f} s, Tokenize {after:.2f} s (x{before / after:.2f})")
+
+    old, new = chain_word_count(), algorithms.word_count_graph("docs")
+    assert list(old.run(docs=lambda: iter(docs))) == list(new.run(docs=lambda: iter(docs)))
+    before = measure(lambda: list(old.run(docs=lambda: iter(docs))), args.repeat)
+    after = measure(lambda: list(new.run(docs=lambda: iter(docs))), args.repeat)
+    print(f"word count: three mappers {before:.2f} s, Tokenize {after:.2f} s (x{before / after:.2f})")
+
+
+if __name__ == "__main__":
+    main()
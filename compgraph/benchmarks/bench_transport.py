@@ -0,0 +1,110 @@
+"""
+Rows/sec of cross-process row transport: per-row Pipe.send/recv (the protocol ExternalSort used before)
+against batched RowTransport and SharedMemoryTransport. Every row makes a round trip
+parent -> echo process -> parent. Parent CPU time is reported to show the cost left in the main process.
+
+    python benchmarks/bench_transport.py --rows 1000000 --batch-sizes 64 1024 8192
+"""
+import argparse
+import time
+import typing as tp
+
+from multiprocessing import Pipe, Process, connection, shared_memory
+
+from compgraph.transport import RowTransport, SharedMemoryTransport, DEFAULT_SLOTS, DEFAULT_SLOT_SIZE
+
+
+def make_rows(n: int) -> tp.Generator[dict[str, tp.Any], None, None]:
+    for i in range(n):
+        yield {"text": f"word{i % 5000}", "count": i}
+
+
+def echo_per_row(endpoint: connection.Connection) -> None:
+    rows = []
+    while True:
+        row = endpoint.recv()
+        if row is None:
+            break
+        rows.append(row)
+    for row in rows:
+        endpoint.send(row)
+    endpoint.send(None)
+
+
+def echo_batched(endpoint: connection.Connection, batch_size: int) -> None:
+    transport = RowTransport(endpoint, batch_size)
+    transport.send_rows(list(transport.recv_rows()))
+
+
+def echo_shared_memory(endpoint: connection.Connection, segment_name: str, batch_size: int) -> None:
+    segment = shared_memory.SharedMemory(segment_name)
+    transport = SharedMemoryTransport(endpoint, segment, batch_size)
+    transport.send_rows(list(transport.recv_rows()))
+    del transport
+    segment.close()
+
+
+def run_per_row(n: int) -> tuple[float, float]:
+    local_endpoint, remote_endpoint = Pipe()
+    process = Process(target=echo_per_row, args=(remote_endpoint,))
+    process.start()
+    start, start_cpu = time.perf_counter(), time.process_time()
+    for row in make_rows(n):
+        local_endpoint.send(row)
+    local_endpoint.send(None)
+    while local_endpoint.recv() is not None:
+        pass
+    elapsed, elapsed_cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    process.join()
+    return elapsed, elapsed_cpu
+
+
+def run_transport(n: int, transport: RowTransport, process: Process) -> tuple[float, float]:
+    process.start()
+    start, start_cpu = time.perf_counter(), time.process_time()
+    transport.send_rows(make_rows(n))
+    for _ in transport.recv_rows():
+        pass
+    elapsed, elapsed_cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    process.join()
+    return elapsed, elapsed_cpu
+
+
+def run_batched(n: int, batch_size: int) -> tuple[float, float]:
+    local_endpoint, remote_endpoint = Pipe()
+    process = Process(target=echo_batched, args=(remote_endpoint, batch_size))
+    return run_transport(n, RowTransport(local_endpoint, batch_size), process)
+
+
+def run_shared_memory(n: int, batch_size: int) -> tuple[float, float]:
+    segment = shared_memory.SharedMemory(create=True, size=DEFAULT_SLOTS * DEFAULT_SLOT_SIZE)
+    local_endpoint, remote_endpoint = Pipe()
+    process = Process(target=echo_shared_memory, args=(remote_endpoint, segment.name, batch_size))
+    transport = SharedMemoryTransport(local_endpoint, segment, batch_size)
+    try:
+        return run_transport(n, transport, process)
+    finally:
+        del transport
+        segment.close()
+        segment.unlink()
+
+
+def report(name: str, n: int, elapsed: float, elapsed_cpu: float, baseline: float) -> None:
+    print(f"{name:>28}: {n / elapsed:>12,.0f} rows/sec, parent cpu {elapsed_cpu:6.2f}s (x{baseline / elapsed:.1f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 256, 1024, 8192])
+    args = parser.parse_args()
+
+    baseline, baseline_cpu = run_per_row(args.rows)
+    report("per-row send", args.rows, baseline, baseline_cpu, baseline)
+    for batch_size in args.batch_sizes:
+        report(f"pipe batch_size={batch_size}", args.rows, *run_batched(args.rows, batch_size), baseline)
+        report(f"shm batch_size={batch_size}", args.rows, *run_shared_memory(args.rows, batch_size), baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,39 @@
-import json
-
 from . import Graph, operations
+from .incremental import CountState
 
 
 def word_count_graph(input_stream_name: str, text_column: str = "text", count_column: str = "count",
                      from_file: bool = False) -> Graph:
     """Constructs graph which counts words in text_column of all rows passed"""
     if from_file:
-        graph = Graph.graph_from_file(input_stream_name, json.loads)
+        graph = Graph.graph_from_json_lines(input_stream_name)
+    else:
+        graph = Graph.graph_from_iter(input_stream_name)
+    return graph \
+        .map(operations.Tokenize(text_column)) \
+        .sort([text_column]) \
+        .reduce(operations.Count(count_column), [text_column]) \
+        .sort([count_column, text_column])
+
+
+def word_count_incremental_graph(input_stream_name: str, state_filename: str, text_column: str = "text",
+                                 count_column: str = "count", from_file: bool = False) -> Graph:
+    """Constructs graph which counts words in text_column of new rows passed and adds counts persisted
+    in state_filename by previous run, state is replaced by the new counts when output is exhausted.
+    Output is the same as of word_count_graph over rows of all runs, old rows are not read again
+    """
+    if from_file:
+        graph = Graph.graph_from_json_lines(input_stream_name)
     else:
         graph = Graph.graph_from_iter(input_stream_name)
+    state = CountState(state_filename, text_column, count_column)
     return graph \
-        .map(operations.FilterPunctuation(text_column)) \
-        .map(operations.LowerCase(text_column)) \
-        .map(operations.Split(text_column)) \
+        .map(operations.Tokenize(text_column)) \
         .sort([text_column]) \
         .reduce(operations.Count(count_column), [text_column]) \
+        .join(operations.MergeJoiner(operations.Count(count_column)), Graph.graph_from_count_state(state),
+              [text_column]) \
+        .write_count_state(state) \
         .sort([count_column, text_column])
 
 
@@ -29,14 +47,12 @@ def inverted_index_graph(input_stream_name: str, doc_column: str = "doc_id", tex
     idf = "idf"
 
     if from_file:
-        graph = Graph.graph_from_file(input_stream_name, json.loads)
+        graph = Graph.graph_from_json_lines(input_stream_name)
     else:
         graph = Graph.graph_from_iter(input_stream_name)
 
     split_words = Graph.graph_from_another_graph(graph) \
-        .map(operations.FilterPunctuation(text_column)) \
-        .map(operations.LowerCase(text_column)) \
-        .map(operations.Split(text_column))
+        .map(operations.Tokenize(text_column))
     count_docs = Graph.graph_from_another_graph(graph) \
         .reduce(operations.Count(n_docs_col), [doc_column]) \
         .reduce(operations.Sum(n_docs_col), [n_docs_col])
@@ -45,7 +61,7 @@ def inverted_index_graph(input_stream_name: str, doc_column: str = "doc_id", tex
         .reduce(operations.FirstReducer(), [doc_column, text_column]) \
         .sort([text_column]) \
         .reduce(operations.Count(n_docs_with_word), [text_column]) \
-        .join(operations.InnerJoiner(), count_docs, []) \
+        .join(operations.InnerJoiner(), count_docs, [], strategy="broadcast") \
         .map(operations.CalculateIdf())
     count_tf = Graph.graph_from_another_graph(split_words) \
         .sort([doc_column]) \
@@ -68,18 +84,13 @@ def pmi_graph(input_stream_name: str, doc_column: str = "doc_id", text_column: s
     n_words_col = "count_words"
 
     if from_file:
-        graph = Graph.graph_from_file(input_stream_name, json.loads)
+        graph = Graph.graph_from_json_lines(input_stream_name)
     else:
         graph = Graph.graph_from_iter(input_stream_name)
 
-    split_words = graph \
-        .map(operations.FilterPunctuation(text_column)) \
-        .map(operations.LowerCase(text_column)) \
-        .map(operations.Split(text_column))
-
-    second = split_words \
-        .sort([doc_column, text_column]) \
-        .map(operations.Filter(lambda row: len(row[text_column]) > 4))
+    second = graph \
+        .map(operations.Tokenize(text_column, min_length=5)) \
+        .sort([doc_column, text_column])
 
     count_words = Graph.graph_from_another_graph(second) \
         .reduce(operations.Count(n_words_col), [doc_column, text_column]) \
@@ -95,7 +106,7 @@ def pmi_graph(input_stream_name: str, doc_column: str = "doc_id", text_column: s
     pmi_counter = Graph.graph_from_another_graph(count_words) \
         .join(operations.InnerJoiner(), second, [doc_column, text_column]) \
         .map(operations.Project([doc_column, text_column])) \
-        .join(operations.InnerJoiner(), total_counts_for_words, []) \
+        .join(operations.InnerJoiner(), total_counts_for_words, [], strategy="broadcast") \
         .reduce(operations.TermFrequency(text_column), [doc_column, n_words_col]) \
         .sort([text_column]) \
         .join(operations.InnerJoiner("_in_all_docs", "_in_this_doc"), count_word_in_all, [text_column]) \
@@ -115,12 +126,13 @@ def yandex_maps_graph(input_stream_name_time: str, input_stream_name_length: str
     """Constructs graph which measures average speed in km/h depending on the weekday and hour"""
 
     if from_file:
-        time = Graph.graph_from_file(input_stream_name_time, json.loads)
-        length = Graph.graph_from_file(input_stream_name_length, json.loads)
+        time = Graph.graph_from_json_lines(input_stream_name_time)
+        length = Graph.graph_from_json_lines(input_stream_name_length)
     else:
         time = Graph.graph_from_iter(input_stream_name_time)
         length = Graph.graph_from_iter(input_stream_name_length)
 
+    # not a hash join: it emits rows in another order, which changes float sums of AverageSpeed in the last bits
     time_length = length \
         .sort([edge_id_column]) \
         .join(operations.InnerJoiner(), time.sort([edge_id_column]), [edge_id_column]) \
@@ -128,9 +140,8 @@ def yandex_maps_graph(input_stream_name_time: str, input_stream_name_length: str
                                                  leave_time_column=leave_time_column,
                                                  start_coords_column=start_coord_column,
                                                  end_coords_column=end_coord_column, )) \
-        .sort([weekday_result_column, hour_result_column]) \
-        .reduce(operations.AverageSpeed(result_column=speed_result_column),
-                [weekday_result_column, hour_result_column]) \
+        .aggregate(operations.AverageSpeed(result_column=speed_result_column),
+                   [weekday_result_column, hour_result_column]) \
         .map(operations.Project([weekday_result_column, hour_result_column, speed_result_column]))
 
     return time_length
@@ -0,0 +1,107 @@
+# checkpoint.py
+from __future__ import annotations
+
+import json
+import os
+import typing as tp
+
+from . import operations as ops
+from .exception import CompgraphException
+from .spill import SpillFile, read_rows
+
+MANIFEST = "manifest.json"
+
+
+class Checkpoint(ops.Operation):
+    """
+    Operation passing rows as they are. In runs with checkpoint directory its output is persisted
+    like output of every sort, so resumed runs start from it.
+    """
+
+    def __call__(self, rows: ops.TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> ops.TRowsGenerator:
+        yield from rows
+
+    def output_order(self, *input_orders: ops.TOrder) -> ops.TOrder:
+        return input_orders[0]
+
+    def __repr__(self) -> str:
+        return "Checkpoint()"
+
+
+class CheckpointStore:
+    """
+    Work directory of checkpointed run: output of checkpointed plan nodes in spill files and manifest
+    of completed ones. Output of node is written completely and node is added to manifest before the next
+    operation reads it back from file, so a crash of later operations does not lose it. Manifest is replaced
+    atomically, a crash leaves manifest of completed nodes, files of incomplete ones are removed.
+    Manifest keeps plan of the run (as in Graph.explain): checkpoints are reused only by the same plan.
+    Data sources are not tracked, resumed run should read the same data.
+    """
+
+    def __init__(self, directory: str, plan: str, resume: bool) -> None:
+        """
+        :param directory: work directory, created if it does not exist
+        :param plan: execution plan of run
+        :param resume: reuse checkpoints of previous run of the same plan, remove them otherwise
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.__directory = directory
+        self.__plan = plan
+        self.__completed: dict[str, dict[str, tp.Any]] = {}
+        manifest = self.__load()
+        if resume and manifest is not None:
+            if manifest["plan"] != plan:
+                raise CompgraphException(f"Checkpoints in {directory} were made by another plan:\n{manifest['plan']}")
+            self.__completed = {name: entry for name, entry in manifest["checkpoints"].items()
+                                if os.path.exists(os.path.join(directory, entry["file"]))}
+            return
+        if manifest is not None:
+            for entry in manifest["checkpoints"].values():
+                self.__remove(entry["file"])
+        self.__dump()
+
+    @property
+    def completed(self) -> list[str]:
+        """Names of plan nodes whose output is persisted"""
+        return list(self.__completed)
+
+    def restore(self, name: str) -> ops.TRowsGenerator:
+        """Persisted output of plan node"""
+        yield from read_rows(os.path.join(self.__directory, self.__completed[name]["file"]))
+
+    def save(self, name: str, operation: str, rows: ops.TRowsIterable) -> ops.TRowsGenerator:
+        """
+        Persist rows, mark node as completed and read them back
+        :param name: name of plan node, stable between runs of the same plan
+        :param operation: description of plan node
+        :param rows: output of plan node
+        """
+        spill_file = SpillFile(self.__directory)
+        try:
+            spill_file.write_all(rows)
+        except BaseException:
+            spill_file.remove()
+            raise
+        self.__completed[name] = {"operation": operation, "file": os.path.basename(spill_file.path),
+                                  "rows": spill_file.rows}
+        self.__dump()
+        yield from self.restore(name)
+
+    def __load(self) -> dict[str, tp.Any] | None:
+        path = os.path.join(self.__directory, MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            manifest: dict[str, tp.Any] = json.load(f)
+        return manifest
+
+    def __dump(self) -> None:
+        path = os.path.join(self.__directory, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"plan": self.__plan, "checkpoints": self.__completed}, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def __remove(self, filename: str) -> None:
+        path = os.path.join(self.__directory, filename)
+        if os.path.exists(path):
+            os.remove(path)
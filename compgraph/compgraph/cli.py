@@ -4,7 +4,35 @@ import click
 import pandas as pd
 import plotly.express as px
 
-from .algorithms import word_count_graph, inverted_index_graph, pmi_graph, yandex_maps_graph
+from .algorithms import word_count_graph, word_count_incremental_graph, inverted_index_graph, pmi_graph, \
+    yandex_maps_graph
+from .graph import Graph
+
+profile_option = click.option("--profile", "profile_filename", type=click.Path(),
+                              help="Profile operations: print their table to stderr and save JSON report "
+                                   "on the specified path")
+memory_limit_option = click.option("--memory-limit", "memory_limit", type=click.IntRange(min=1),
+                                   help="Memory limit of the run in MiB: buffered rows are spilled to disk "
+                                        "before the process takes more memory")
+checkpoint_dir_option = click.option("--checkpoint-dir", "checkpoint_dir", type=click.Path(file_okay=False),
+                                     help="Persist output of every sort to this work directory")
+resume_option = click.option("--resume", is_flag=True,
+                             help="Skip sorts whose output was persisted to --checkpoint-dir by previous run")
+
+
+def check_resume(checkpoint_dir: str | None, resume: bool) -> None:
+    if resume and checkpoint_dir is None:
+        raise click.UsageError("--resume needs --checkpoint-dir of the run to resume")
+
+
+def memory_limit_bytes(memory_limit: int | None) -> int | None:
+    return None if memory_limit is None else memory_limit * 2 ** 20
+
+
+def save_profile(graph: Graph, profile_filename: str | None) -> None:
+    if profile_filename is not None and graph.last_profile is not None:
+        with open(profile_filename, "w") as out:
+            out.write(graph.last_profile.to_json())
 
 
 @click.group()
@@ -15,40 +43,73 @@ def cli() -> None:
 @click.command(help="Count words in {input_filename} and save to {output_filename}")
 @click.argument("input_filename", type=click.Path(exists=True))
 @click.argument("output_filename", type=click.Path())
-def run_word_count(input_filename: str, output_filename: str) -> None:
+@profile_option
+@memory_limit_option
+@checkpoint_dir_option
+@resume_option
+@click.option("--state", "state_filename", type=click.Path(dir_okay=False),
+              help="Count words incrementally: add counts persisted in this file by previous run "
+                   "and replace them by the new ones")
+def run_word_count(input_filename: str, output_filename: str, profile_filename: str | None,
+                   memory_limit: int | None, checkpoint_dir: str | None, resume: bool,
+                   state_filename: str | None) -> None:
+    check_resume(checkpoint_dir, resume)
     click.echo(f"Counting words in {input_filename} and saving to {output_filename}")
-    graph = word_count_graph(input_stream_name=input_filename, text_column="text", count_column="count", from_file=True)
-
-    result = graph.run()
+    if state_filename is None:
+        graph = word_count_graph(input_stream_name=input_filename, text_column="text", count_column="count",
+                                 from_file=True)
+    else:
+        graph = word_count_incremental_graph(input_stream_name=input_filename, state_filename=state_filename,
+                                             text_column="text", count_column="count", from_file=True)
+
+    result = graph.run(profile=profile_filename is not None, memory_limit=memory_limit_bytes(memory_limit),
+                       checkpoint_dir=checkpoint_dir, resume=resume)
     with open(output_filename, "w") as out:
         for row in result:
             out.write(json.dumps(row) + "\n")
+    save_profile(graph, profile_filename)
 
 
 @click.command(help="Count top-3 TF-IDF docs for each word in {input_filename} and save to {output_filename}")
 @click.argument("input_filename", type=click.Path(exists=True))
 @click.argument("output_filename", type=click.Path())
-def run_inverted_index(input_filename: str, output_filename: str) -> None:
+@profile_option
+@memory_limit_option
+@checkpoint_dir_option
+@resume_option
+def run_inverted_index(input_filename: str, output_filename: str, profile_filename: str | None,
+                       memory_limit: int | None, checkpoint_dir: str | None, resume: bool) -> None:
+    check_resume(checkpoint_dir, resume)
     graph = inverted_index_graph(input_stream_name=input_filename, doc_column="doc_id", text_column="text",
                                  result_column="tf_idf", from_file=True)
 
-    result = graph.run()
+    result = graph.run(profile=profile_filename is not None, memory_limit=memory_limit_bytes(memory_limit),
+                       checkpoint_dir=checkpoint_dir, resume=resume)
     with open(output_filename, "w") as out:
         for row in result:
             out.write(json.dumps(row) + "\n")
+    save_profile(graph, profile_filename)
 
 
 @click.command(help="Count top-10 PMI words for each document in {input_filename} and save to {output_filename}")
 @click.argument("input_filename", type=click.Path(exists=True))
 @click.argument("output_filename", type=click.Path())
-def run_pmi(input_filename: str, output_filename: str) -> None:
+@profile_option
+@memory_limit_option
+@checkpoint_dir_option
+@resume_option
+def run_pmi(input_filename: str, output_filename: str, profile_filename: str | None,
+            memory_limit: int | None, checkpoint_dir: str | None, resume: bool) -> None:
+    check_resume(checkpoint_dir, resume)
     graph = pmi_graph(input_stream_name=input_filename, doc_column="doc_id", text_column="text", result_column="pmi",
                       from_file=True)
 
-    result = graph.run()
+    result = graph.run(profile=profile_filename is not None, memory_limit=memory_limit_bytes(memory_limit),
+                       checkpoint_dir=checkpoint_dir, resume=resume)
     with open(output_filename, "w") as out:
         for row in result:
             out.write(json.dumps(row) + "\n")
+    save_profile(graph, profile_filename)
 
 
 @click.command(help="Calculate average speed in km/h depending on the weekday and hour")
@@ -57,8 +118,14 @@ def run_pmi(input_filename: str, output_filename: str) -> None:
 @click.argument("input_time_filename", type=click.Path(exists=True))
 @click.argument("input_length_filename", type=click.Path(exists=True))
 @click.argument("output_filename", type=click.Path())
+@profile_option
+@memory_limit_option
+@checkpoint_dir_option
+@resume_option
 def run_yandex_maps(visualization: str, input_time_filename: str, input_length_filename: str,
-                    output_filename: str) -> None:
+                    output_filename: str, profile_filename: str | None, memory_limit: int | None,
+                    checkpoint_dir: str | None, resume: bool) -> None:
+    check_resume(checkpoint_dir, resume)
     graph = yandex_maps_graph(input_stream_name_time=input_time_filename,
                               input_stream_name_length=input_length_filename,
                               enter_time_column="enter_time", leave_time_column="leave_time",
@@ -66,11 +133,13 @@ def run_yandex_maps(visualization: str, input_time_filename: str, input_length_f
                               weekday_result_column="weekday", hour_result_column="hour",
                               speed_result_column="speed", from_file=True)
 
-    result = graph.run()
+    result = graph.run(profile=profile_filename is not None, memory_limit=memory_limit_bytes(memory_limit),
+                       checkpoint_dir=checkpoint_dir, resume=resume)
 
     with open(output_filename, "w") as out:
         for row in result:
             out.write(json.dumps(row) + "\n")
+    save_profile(graph, profile_filename)
 
     if visualization:
         data = []
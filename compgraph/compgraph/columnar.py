@@ -0,0 +1,120 @@
+# columnar.py
+import itertools
+import typing as tp
+
+from abc import abstractmethod
+
+from . import operations as ops
+from .exception import CompgraphException
+
+DEFAULT_BATCH_SIZE = 4096
+
+
+class ColumnarOperation(ops.Operation):
+    """
+    Operation of columnar mode: takes and yields record batches instead of rows.
+    Consecutive columnar operations are chained by executor on batches,
+    rows are converted to batches and back only at the boundaries with row operations.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """
+        :param batch_size: number of rows in batch made from input rows
+        """
+        if batch_size <= 0:
+            raise CompgraphException("batch_size should be positive")
+        self.batch_size = batch_size
+
+    @abstractmethod
+    def batches(self, batches: tp.Iterable[ops.RecordBatch]) -> tp.Iterator[ops.RecordBatch]:
+        pass
+
+    def __call__(self, rows: ops.TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> ops.TRowsGenerator:
+        yield from ops.to_rows(self.batches(ops.to_batches(rows, self.batch_size)))
+
+
+class ColumnarMap(ColumnarOperation):
+    """Apply mappers one after another to every batch, mappers with vectorized kernels map whole columns"""
+
+    def __init__(self, mappers: tp.Sequence[ops.Mapper], batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """
+        :param mappers: mappers in order of application
+        :param batch_size: number of rows in batch made from input rows
+        """
+        super().__init__(batch_size)
+        self.mappers = list(mappers)
+
+    def batches(self, batches: tp.Iterable[ops.RecordBatch]) -> tp.Iterator[ops.RecordBatch]:
+        stream: tp.Iterator[ops.RecordBatch] = iter(batches)
+        for mapper in self.mappers:
+            stream = itertools.chain.from_iterable(map(mapper.map_batch, stream))
+        return stream
+
+    def output_order(self, *input_orders: ops.TOrder) -> ops.TOrder:
+        order = input_orders[0]
+        for mapper in self.mappers:
+            order = mapper.kept_order(order)
+        return order
+
+    def __repr__(self) -> str:
+        return f"ColumnarMap({', '.join(type(mapper).__name__ for mapper in self.mappers)})"
+
+
+class ColumnarReduce(ColumnarOperation):
+    """
+    Apply reducer to batches of rows sorted by keys. Batches are re-cut on group boundaries:
+    the last group of a batch is carried over as pieces of batches until the group ends,
+    then pieces are joined into one batch once, so reducer gets whole groups.
+    """
+
+    def __init__(self, reducer: ops.Reducer, keys: tp.Sequence[str], batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """
+        :param reducer: reducer to use
+        :param keys: keys for grouping, should not be empty
+        :param batch_size: number of rows in batch made from input rows
+        """
+        super().__init__(batch_size)
+        if not keys:
+            raise CompgraphException("Columnar reduce needs keys")
+        self.reducer = reducer
+        self.keys = tuple(keys)
+
+    def __group_keys(self, batch: ops.RecordBatch, starts: tp.Any, previous: tuple[tp.Any, ...] | None) \
+            -> list[tuple[tp.Any, ...]]:
+        """Keys of groups of batch, checked to follow in order after keys of previous group"""
+        group_keys = [tuple(row.values()) for row in batch.take(starts).select(self.keys).to_rows()]
+        if previous is not None:
+            group_keys.insert(0, previous)
+        if any(key < before for before, key in zip(group_keys, group_keys[1:])):
+            raise CompgraphException("Input is not sorted")
+        return group_keys if previous is None else group_keys[1:]
+
+    def batches(self, batches: tp.Iterable[ops.RecordBatch]) -> tp.Iterator[ops.RecordBatch]:
+        carry: list[ops.RecordBatch] = []  # pieces of the last group, which may continue in the next batch
+        carry_key: tuple[tp.Any, ...] | None = None
+        for batch in batches:
+            if not len(batch):
+                continue
+            starts = batch.group_starts(self.keys)
+            group_keys = self.__group_keys(batch, starts, carry_key)
+            first = 0
+            if carry and group_keys[0] == carry_key:
+                first = int(starts[1]) if len(starts) > 1 else len(batch)
+                carry.append(batch.slice(0, first))
+                if first == len(batch):
+                    continue
+            if carry:
+                yield from self.reducer.reduce_batch(self.keys, ops.RecordBatch.concat_all(carry))
+            last = int(starts[-1])
+            if last > first:
+                yield from self.reducer.reduce_batch(self.keys, batch.slice(first, last))
+            carry = [batch.slice(last, len(batch))]
+            carry_key = group_keys[-1]
+        if carry:
+            yield from self.reducer.reduce_batch(self.keys, ops.RecordBatch.concat_all(carry))
+
+    def output_order(self, *input_orders: ops.TOrder) -> ops.TOrder:
+        return self.reducer.kept_order(self.keys, input_orders[0])
+
+    def __repr__(self) -> str:
+        return f"ColumnarReduce({type(self.reducer).__name__}, keys={list(self.keys)})"
@@ -0,0 +1,468 @@
+# executor.py
+from __future__ import annotations
+
+import collections
+import itertools
+import typing as tp
+
+from . import operations as ops, worker_pool
+from .checkpoint import Checkpoint, CheckpointStore
+from .columnar import ColumnarOperation, ColumnarMap, ColumnarReduce
+from .exception import CompgraphException
+from .external_sort import ExternalSort, SortWithinGroups
+from .incremental import WriteCountState
+from .memory import MemoryGovernor
+from .parallel import ParallelRead
+from .profiling import OperationStats, Profiler
+from .spill import SpillFile
+
+if tp.TYPE_CHECKING:
+    from .graph import Graph
+
+DEFAULT_CHUNK_SIZE = 1024
+DEFAULT_MAX_CHUNKS_IN_MEMORY = 16
+
+
+class JoinStep:
+    """Join operation together with the graph which produces its second input"""
+
+    def __init__(self, operation: ops.Operation, graph: Graph) -> None:
+        """
+        :param operation: join operation taking rows of both graphs
+        :param graph: graph to join with, its operations are taken at run time
+        """
+        self.operation = operation
+        self.graph = graph
+
+
+class SharedStream:
+    """
+    Output of an operation computed once and read by several consumers.
+    Rows are pulled from source in chunks, a chunk is dropped when all consumers have read it.
+    At most max_chunks_in_memory chunks are kept in memory, older ones are spilled to disk,
+    so consumers may be arbitrarily far apart (e.g. one of them is a sort which reads everything first).
+    """
+
+    def __init__(self, source: ops.TRowsIterable, consumers: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_chunks_in_memory: int = DEFAULT_MAX_CHUNKS_IN_MEMORY) -> None:
+        """
+        :param source: rows to share
+        :param consumers: number of readers which will be created
+        :param chunk_size: number of rows pulled from source at once
+        :param max_chunks_in_memory: number of chunks kept in memory before spilling the oldest one
+        """
+        self.__source = iter(source)
+        self.__exhausted = False
+        self.__chunk_size = chunk_size
+        self.__max_chunks_in_memory = max_chunks_in_memory
+        self.__active_readers = consumers
+        self.__chunks: dict[int, list[ops.TRow] | SpillFile] = {}
+        self.__readers_left: dict[int, int] = {}
+        self.__in_memory: collections.deque[int] = collections.deque()
+        self.__produced = 0
+
+    def __produce(self) -> bool:
+        chunk = list(itertools.islice(self.__source, self.__chunk_size))
+        if not chunk:
+            self.__exhausted = True
+            return False
+        index = self.__produced
+        self.__produced += 1
+        self.__chunks[index] = chunk
+        self.__readers_left[index] = self.__active_readers
+        self.__in_memory.append(index)
+        if len(self.__in_memory) > self.__max_chunks_in_memory:
+            oldest = self.__in_memory.popleft()
+            oldest_chunk = self.__chunks[oldest]
+            assert isinstance(oldest_chunk, list)
+            self.__chunks[oldest] = SpillFile().write_all(oldest_chunk)
+        return True
+
+    def __release(self, index: int) -> list[ops.TRow]:
+        """Mark chunk as read by one more reader and return its rows"""
+        chunk = self.__chunks[index]
+        rows = chunk if isinstance(chunk, list) else list(chunk.read())
+        self.__readers_left[index] -= 1
+        if self.__readers_left[index] == 0:
+            del self.__chunks[index]
+            del self.__readers_left[index]
+            if isinstance(chunk, SpillFile):
+                chunk.remove()
+            else:
+                self.__in_memory.remove(index)
+        return rows
+
+    def reader(self) -> ops.TRowsGenerator:
+        index = 0
+        try:
+            while index < self.__produced or (not self.__exhausted and self.__produce()):
+                rows = self.__release(index)
+                index += 1
+                yield from rows
+        finally:
+            self.__active_readers -= 1
+            for unread in range(index, self.__produced):
+                self.__release(unread)
+
+    def close(self) -> None:
+        for chunk in self.__chunks.values():
+            if isinstance(chunk, SpillFile):
+                chunk.remove()
+        self.__chunks.clear()
+
+
+class PlanNode:
+    """
+    Node of execution plan: operation applied to output of parent node.
+    Graphs sharing operations (graph_from_another_graph, joined graphs) share nodes,
+    so common prefixes of their pipelines are one path in the plan.
+    """
+
+    def __init__(self, operation: tp.Any, parent: PlanNode | None) -> None:
+        self.operation = operation
+        self.parent = parent
+        self.children: dict[int, PlanNode] = {}
+        self.consumers = 0
+        self.join_input: PlanNode | None = None
+        self.order: ops.TOrder = ()
+        self.runs: tp.Any = operation
+        self.input = parent
+        self.note = ""
+
+    def __repr__(self) -> str:
+        operation = self.operation.operation if isinstance(self.operation, JoinStep) else self.operation
+        if self.runs is self.operation:
+            return repr(operation)
+        if isinstance(self.runs, (ops.FusedMap, ParallelRead)):
+            return repr(self.runs)
+        return f"{self.runs!r} instead of {operation!r}"
+
+
+class Executor:
+    """
+    Runs graph as a DAG. Pipelines of the graph and of all graphs joined into it are merged into one plan,
+    output of every plan node used by several consumers is computed once and fanned out through SharedStream.
+    Plan tracks columns data of every node is sorted by: sort of data already sorted by its keys is dropped,
+    sort of data sorted by a prefix of its keys only sorts groups of equal prefix.
+    Chains of maps whose intermediate results are not shared run as one FusedMap,
+    maps following parallel read run in its workers.
+    Rows sorted only to be reduced by a reducer which can be combined are folded into partial aggregates
+    by Combine before the sort, so the sort handles about one row per distinct key.
+    In columnar mode maps and reduces with vectorized kernels run on record batches,
+    consecutive columnar operations pass batches to each other without converting them to rows.
+    In compact mode rows of data sources are turned into records sharing schema, they are turned back
+    into dicts only in the output of run.
+    With memory limit operations buffering rows (sorts, joins, hash reduces) get memory governor of the run
+    and spill their buffers to disk when it asks for memory.
+    With checkpoint directory output of every sort and Checkpoint of the plan is persisted there (CheckpointStore),
+    resumed run reads output of completed ones instead of computing them and their inputs.
+    """
+
+    def __init__(self, graph: Graph, columnar: bool = False, compact: bool = False,
+                 memory_limit: int | None = None, checkpoint_dir: str | None = None, resume: bool = False) -> None:
+        """
+        :param graph: graph to run
+        :param columnar: run operations which have vectorized kernels on record batches, needs numpy
+        :param compact: pass rows between operations as records (ops.Record) instead of dicts
+        :param memory_limit: memory limit of run processes in bytes, buffers are not governed if None
+        :param checkpoint_dir: work directory to persist output of sorts and checkpoints in, nothing is persisted
+            if None
+        :param resume: start from checkpoints completed in checkpoint_dir by previous run of the same plan
+        """
+        if columnar and ops.batch.np is None:
+            raise CompgraphException("Columnar mode needs numpy, install extra compgraph[columnar]")
+        if resume and checkpoint_dir is None:
+            raise CompgraphException("Resumed run needs checkpoint directory")
+        self.__columnar = columnar
+        self.__compact = compact
+        self.__memory_limit = memory_limit
+        self.__checkpoint_dir = checkpoint_dir
+        self.__resume = resume
+        self.__root = PlanNode(None, None)
+        self.__output = self.__add_pipeline(graph)
+        self.__planned: set[int] = set()
+        self.__plan(self.__output)
+
+    def __add_pipeline(self, graph: Graph) -> PlanNode:
+        """Add graph operations to plan, return node producing graph output"""
+        if not graph.operations:
+            raise CompgraphException("No operations in graph")
+        node = self.__root
+        for operation in graph.operations:
+            child = node.children.get(id(operation))
+            if child is None:
+                child = node.children[id(operation)] = PlanNode(operation, node)
+                node.consumers += 1
+                if isinstance(operation, JoinStep):
+                    child.join_input = self.__add_pipeline(operation.graph)
+            node = child
+        node.consumers += 1
+        return node
+
+    def __plan(self, node: PlanNode) -> None:
+        """Compute sort order of node output and replace sort which is not needed for this order"""
+        if node is self.__root or id(node) in self.__planned:
+            return
+        self.__planned.add(id(node))
+        assert node.parent is not None
+        self.__plan(node.parent)
+        order = node.parent.order
+        if isinstance(node.operation, JoinStep):
+            assert node.join_input is not None
+            self.__plan(node.join_input)
+            node.order = node.operation.operation.output_order(order, node.join_input.order)
+        elif isinstance(node.operation, ExternalSort):
+            keys = tuple(node.operation.keys)
+            prefix = 0
+            while prefix < min(len(keys), len(order)) and keys[prefix] == order[prefix]:
+                prefix += 1
+            if prefix == len(keys):
+                node.runs = None
+                node.order = order
+                node.note = f"input is already sorted by {list(order)}"
+            elif prefix:
+                node.runs = SortWithinGroups(keys[:prefix], keys, node.operation.max_rows_in_memory)
+                node.order = keys
+                node.note = f"input is already sorted by {list(order)}"
+            else:
+                node.order = keys
+        else:
+            node.order = node.operation.output_order(order)
+            self.__combine(node)
+            self.__fuse(node)
+            if self.__columnar:
+                self.__vectorize(node)
+
+    @staticmethod
+    def __combine(node: PlanNode) -> None:
+        """
+        Put Combine in front of the sort feeding reduce by the same keys if reducer can be combined,
+        reduce then merges sorted partial aggregates
+        """
+        sort = node.parent
+        assert sort is not None
+        if not isinstance(node.runs, ops.Reduce) or not isinstance(sort.runs, ExternalSort) or sort.consumers != 1:
+            return
+        assert sort.input is not None
+        reducer = node.runs.reducer
+        keys = tuple(node.runs.keys)
+        if tuple(sort.runs.keys) != keys or type(reducer).combine is ops.Reducer.combine:
+            return
+        combine = PlanNode(ops.Combine(reducer, keys), sort.input)
+        combine.consumers = 1
+        sort.input = combine
+        merger = reducer.merger()
+        if merger is not reducer:
+            node.runs = ops.Reduce(merger, keys)
+        node.note = "merges partial aggregates"
+
+    def __fuse(self, node: PlanNode) -> None:
+        """
+        Merge map node with preceding map node if nobody else reads output of the latter,
+        maps directly following parallel read run in its workers
+        """
+        parent = node.parent
+        assert parent is not None
+        if not isinstance(node.runs, ops.Map) or parent.consumers != 1:
+            return
+        if isinstance(parent.runs, ParallelRead):
+            node.runs = parent.runs.with_mappers([node.runs.mapper])
+            node.input = parent.input
+            node.note = "maps run in read workers"
+            return
+        if isinstance(parent.runs, ops.Map):
+            mappers = [parent.runs.mapper]
+        elif isinstance(parent.runs, ops.FusedMap):
+            mappers = parent.runs.mappers
+        else:
+            return
+        node.runs = ops.FusedMap([*mappers, node.runs.mapper])
+        node.input = parent.input
+        node.note = f"{len(node.runs.mappers)} maps fused"
+
+    @staticmethod
+    def __vectorize(node: PlanNode) -> None:
+        """Replace map or reduce by its columnar version if some of its mappers or its reducer has vectorized kernel"""
+        if isinstance(node.runs, (ops.Map, ops.FusedMap)):
+            mappers = node.runs.mappers if isinstance(node.runs, ops.FusedMap) else [node.runs.mapper]
+            if any(type(mapper).map_batch is not ops.Mapper.map_batch for mapper in mappers):
+                node.runs = ColumnarMap(mappers)
+        elif isinstance(node.runs, ops.Reduce) and node.runs.keys \
+                and type(node.runs.reducer).reduce_batch is not ops.Reducer.reduce_batch:
+            node.runs = ColumnarReduce(node.runs.reducer, node.runs.keys)
+
+    def explain(self) -> str:
+        """Execution plan as indented tree: every node is followed by its input, joins by both inputs"""
+        lines: list[str] = []
+        shown: set[int] = set()
+
+        def describe(node: PlanNode, depth: int) -> None:
+            line = "  " * depth + self.__title(node)
+            if node.order:
+                line += f" order={list(node.order)}"
+            if node.note:
+                line += f" -- {node.note}"
+            if node.consumers >= 2:
+                line += f" [shared by {node.consumers} consumers]"
+                if id(node) in shown:
+                    lines.append(f"{line} (see above)")
+                    return
+                shown.add(id(node))
+            lines.append(line)
+            assert node.input is not None
+            if node.input is not self.__root:
+                describe(node.input, depth + 1)
+            if node.join_input is not None:
+                describe(node.join_input, depth + 1)
+
+        describe(self.__output, 0)
+        return "\n".join(lines)
+
+    @staticmethod
+    def __title(node: PlanNode) -> str:
+        return f"(skipped) {node.operation!r}" if node.runs is None else repr(node)
+
+    def __add_stats(self, profiler: Profiler) -> dict[int, OperationStats]:
+        """Add counters of every plan node to profiler in the order of explain"""
+        stats: dict[int, OperationStats] = {}
+
+        def add(node: PlanNode, depth: int) -> OperationStats:
+            if id(node) not in stats:
+                node_stats = stats[id(node)] = profiler.add(self.__title(node), depth)
+                for node_input in (node.input, node.join_input):
+                    if node_input is not None and node_input is not self.__root:
+                        node_stats.inputs.append(add(node_input, depth + 1))
+            return stats[id(node)]
+
+        add(self.__output, 0)
+        return stats
+
+    def __checkpoints(self) -> dict[int, str]:
+        """
+        Names of checkpointed nodes: running sorts and Checkpoint operations, named by their place in explain.
+        Nodes after a count state write are not checkpointed: resumed run writes the state again to commit it
+        """
+        names: dict[int, str] = {}
+        after_write: dict[int, bool] = {}
+
+        def visit(node: PlanNode) -> bool:
+            if id(node) in after_write:
+                return after_write[id(node)]
+            name = str(len(after_write))
+            after_write[id(node)] = False
+            inputs = [node_input for node_input in (node.input, node.join_input)
+                      if node_input is not None and node_input is not self.__root]
+            written = any([visit(node_input) for node_input in inputs])
+            if isinstance(node.runs, (ExternalSort, SortWithinGroups, Checkpoint)) and not written:
+                names[id(node)] = name
+            after_write[id(node)] = written or isinstance(node.runs, WriteCountState)
+            return after_write[id(node)]
+
+        visit(self.__output)
+        return names
+
+    def __count_state_writes(self) -> list[WriteCountState]:
+        """Count states written by the plan, committed when output of the run is exhausted"""
+        writes: list[WriteCountState] = []
+        seen: set[int] = set()
+
+        def visit(node: PlanNode) -> None:
+            if id(node) in seen:
+                return
+            seen.add(id(node))
+            if isinstance(node.runs, WriteCountState):
+                writes.append(node.runs)
+            for node_input in (node.input, node.join_input):
+                if node_input is not None and node_input is not self.__root:
+                    visit(node_input)
+
+        visit(self.__output)
+        return writes
+
+    def __readers(self, restored: tp.Collection[int]) -> dict[int, int]:
+        """Number of readers of every node computed by run, inputs of restored nodes are not read"""
+        readers = {id(self.__output): 1}
+        seen: set[int] = set()
+
+        def visit(node: PlanNode) -> None:
+            if id(node) in seen or id(node) in restored:
+                return
+            seen.add(id(node))
+            for node_input in (node.input, node.join_input):
+                if node_input is not None and node_input is not self.__root:
+                    readers[id(node_input)] = readers.get(id(node_input), 0) + 1
+                    visit(node_input)
+
+        visit(self.__output)
+        return readers
+
+    def run(self, profiler: Profiler | None = None, **kwargs: tp.Any) -> ops.TRowsGenerator:
+        """
+        :param profiler: profiler to collect statistics of every plan node in
+        """
+        shared: dict[int, SharedStream] = {}
+        stats = {} if profiler is None else self.__add_stats(profiler)
+        options = {} if self.__memory_limit is None else {"governor": MemoryGovernor(self.__memory_limit)}
+        checkpoints = {} if self.__checkpoint_dir is None else self.__checkpoints()
+        store = None if self.__checkpoint_dir is None \
+            else CheckpointStore(self.__checkpoint_dir, self.explain(), self.__resume)
+        restored = set() if store is None else {node for node, name in checkpoints.items() if name in store.completed}
+        readers = self.__readers(restored)
+
+        def evaluate(node: PlanNode) -> ops.TRowsIterable:
+            if readers[id(node)] < 2:
+                return compute(node)
+            if id(node) not in shared:
+                shared[id(node)] = SharedStream(compute(node), readers[id(node)])
+            return shared[id(node)].reader()
+
+        def compute_batches(node: PlanNode) -> tp.Iterator[ops.RecordBatch]:
+            assert isinstance(node.runs, ColumnarOperation) and node.input is not None
+            if isinstance(node.input.runs, ColumnarOperation) and readers[id(node.input)] < 2:
+                batches = compute_batches(node.input)
+                if profiler is not None:
+                    batches = profiler.track(stats[id(node.input)], batches, len)
+            else:
+                batches = ops.to_batches(evaluate(node.input), node.runs.batch_size)
+            return node.runs.batches(batches)
+
+        def source(rows: ops.TRowsIterable) -> ops.TRowsIterable:
+            return ops.to_records(rows) if self.__compact else rows
+
+        def compute(node: PlanNode) -> ops.TRowsIterable:
+            if id(node) in checkpoints and store is not None:
+                name = checkpoints[id(node)]
+                if id(node) in restored:
+                    rows = source(store.restore(name)) if self.__compact else ops.to_dicts(store.restore(name))
+                else:
+                    rows = store.save(name, self.__title(node), compute_rows(node))
+            else:
+                rows = compute_rows(node)
+            return rows if profiler is None else profiler.track(stats[id(node)], rows)
+
+        def compute_rows(node: PlanNode) -> ops.TRowsIterable:
+            assert node.parent is not None
+            if node.parent is self.__root:
+                return source(tp.cast(ops.TRowsIterable, node.operation(**kwargs)))
+            if isinstance(node.runs, ColumnarOperation):
+                return ops.to_rows(compute_batches(node))
+            if node.input is self.__root:  # source with maps pushed into it
+                return source(tp.cast(ops.TRowsIterable, node.runs(**kwargs)))
+            assert node.input is not None
+            data = evaluate(node.input)
+            if isinstance(node.operation, JoinStep):
+                assert node.join_input is not None
+                return tp.cast(ops.TRowsIterable, node.operation.operation(data, evaluate(node.join_input), **options))
+            if node.runs is None:
+                return data
+            return tp.cast(ops.TRowsIterable, node.runs(data, **options))
+
+        with worker_pool.session():
+            try:
+                output = evaluate(self.__output)
+                yield from ops.to_dicts(output) if self.__compact else output
+                for write in self.__count_state_writes():
+                    write.commit()
+            finally:
+                for stream in shared.values():
+                    stream.close()
@@ -1,49 +1,166 @@
+import itertools
+import tempfile
 import typing as tp
 
-from multiprocessing import Pipe, Process, connection
+from multiprocessing import connection, shared_memory
 from operator import itemgetter
 
-from . import operations as ops
+from . import operations as ops, worker_pool
+from .exception import CompgraphException
+from .memory import MemoryGovernor, RowBuffer
+from .spill import SpillFile
+from .transport import RowTransport, SharedMemoryTransport, DEFAULT_BATCH_SIZE, DEFAULT_SLOTS, \
+    DEFAULT_SLOT_SIZE
 
+DEFAULT_MAX_ROWS_IN_MEMORY = 500_000
 
-def do_sort(endpoint: connection.Connection, keys: tuple[str, ...]) -> None:
-    rows = []
-    while True:
-        row = endpoint.recv()
-        if row is None:
-            break
-        rows.append(row)
-    rows.sort(key=itemgetter(*keys))
-    for row in rows:
-        endpoint.send(row)
-    endpoint.send(None)
+
+def sort_rows(rows: ops.TRowsIterable, keys: tp.Sequence[str], max_rows_in_memory: int,
+              directory: str | None = None, governor: MemoryGovernor | None = None) -> ops.TRowsGenerator:
+    """
+    Sort rows keeping at most max_rows_in_memory of them in memory.
+    Input is cut into runs of max_rows_in_memory rows, every run is sorted and spilled to directory,
+    then runs are streamed back through heap-based k-way merge. Sort is stable.
+    :param rows: rows to sort
+    :param keys: sorting keys
+    :param max_rows_in_memory: size of one sorted run
+    :param directory: directory for spilled runs, default temporary directory if None
+    :param governor: memory governor of run, buffer is also spilled when it asks for memory
+    """
+    with RowBuffer(governor, itemgetter(*keys), max_rows_in_memory, directory) as buffer:
+        yield from buffer.extend(rows)
+
+
+def stream_sort(transport: RowTransport, keys: tuple[str, ...], max_rows_in_memory: int,
+                memory_limit: int | None) -> None:
+    """
+    Sort rows received through transport and send them back followed by number of bytes spilled,
+    sort buffer is governed by memory_limit of worker process if it is given
+    """
+    spilled_before = SpillFile.bytes_written
+    governor = None if memory_limit is None else MemoryGovernor(memory_limit)
+    with tempfile.TemporaryDirectory(prefix="compgraph-sort-") as directory:
+        transport.send_rows(sort_rows(transport.recv_rows(), keys, max_rows_in_memory, directory, governor))
+    transport.send_count(SpillFile.bytes_written - spilled_before)
+
+
+def do_sort(endpoint: connection.Connection, keys: tuple[str, ...], max_rows_in_memory: int,
+            batch_size: int, segment_name: str | None = None, memory_limit: int | None = None) -> None:
+    if segment_name is None:
+        stream_sort(RowTransport(endpoint, batch_size), keys, max_rows_in_memory, memory_limit)
+        return
+    segment = shared_memory.SharedMemory(segment_name)
+    try:
+        stream_sort(SharedMemoryTransport(endpoint, segment, batch_size), keys, max_rows_in_memory, memory_limit)
+    finally:
+        segment.close()
 
 
 class ExternalSort(ops.Operation):
     """
     In order to not account materialization during sorting in main process memory consumption, we delegate
-    sorting to a separate process.
+    sorting to a separate process taken from the shared warm worker pool.
+    Sorting process keeps at most max_rows_in_memory rows in memory, the rest is spilled to disk
+    in sorted runs, which are merged back while streaming result. With memory governor the sorting process
+    also spills its buffer before it grows beyond memory limit of the run.
+    Rows travel between processes in batches of batch_size rows sent through the pipe, or staged in shared memory
+    if use_shared_memory is set (it does not pay off on benchmarks/bench_transport.py, so it is off by default).
     This class illustrates cross-process streaming.
     """
 
-    def __init__(self, keys: tp.Sequence[str]):
+    def __init__(self, keys: tp.Sequence[str], max_rows_in_memory: int = DEFAULT_MAX_ROWS_IN_MEMORY,
+                 batch_size: int = DEFAULT_BATCH_SIZE, use_shared_memory: bool = False):
+        """
+        :param keys: sorting keys
+        :param max_rows_in_memory: memory budget of sorting process in rows
+        :param batch_size: number of rows sent between processes in one message
+        :param use_shared_memory: stage batches in shared memory and send only their offsets through the pipe
+        """
+        if max_rows_in_memory <= 0:
+            raise CompgraphException("max_rows_in_memory should be positive")
+        if batch_size <= 0:
+            raise CompgraphException("batch_size should be positive")
         self.keys = keys
+        self.max_rows_in_memory = max_rows_in_memory
+        self.batch_size = batch_size
+        self.use_shared_memory = use_shared_memory
+
+    def output_order(self, *input_orders: ops.TOrder) -> ops.TOrder:
+        return tuple(self.keys)
+
+    def __repr__(self) -> str:
+        return f"ExternalSort(keys={list(self.keys)})"
+
+    def __call__(self, rows: ops.TRowsIterable, *args: tp.Any, governor: MemoryGovernor | None = None,
+                 **kwargs: tp.Any) -> ops.TRowsGenerator:
+        """
+        :param rows: rows to sort
+        :param governor: memory governor of run, sort worker governs its buffer by the same memory limit
+        """
+        segment = shared_memory.SharedMemory(create=True, size=DEFAULT_SLOTS * DEFAULT_SLOT_SIZE) \
+            if self.use_shared_memory else None
+        try:
+            yield from self.__sort_in_worker(rows, segment, None if governor is None else governor.limit)
+        finally:
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+
+    def __sort_in_worker(self, rows: ops.TRowsIterable, segment: shared_memory.SharedMemory | None,
+                         memory_limit: int | None) -> ops.TRowsGenerator:
+        with worker_pool.session() as pool:
+            worker = pool.acquire()
+            completed = False
+            try:
+                worker.submit(do_sort, tuple(self.keys), self.max_rows_in_memory, self.batch_size,
+                              None if segment is None else segment.name, memory_limit)
+                transport = RowTransport(worker.endpoint, self.batch_size) if segment is None \
+                    else SharedMemoryTransport(worker.endpoint, segment, self.batch_size)
+                try:
+                    row_count_before = transport.send_rows(rows)
+                except BrokenPipeError:  # worker failed, its error is waiting in the pipe
+                    row_count_before = -1
+                row_count_after = 0
+                for row in transport.recv_rows():
+                    yield row
+                    row_count_after += 1
+                assert row_count_before == row_count_after
+                SpillFile.bytes_written += transport.recv_count()  # spilled by worker on behalf of this process
+                completed = True
+            finally:
+                if completed:
+                    pool.release(worker)
+                else:
+                    pool.discard(worker)
+
+
+class SortWithinGroups(ops.Operation):
+    """
+    Sort rows which are already sorted by prefix of keys: every group of equal prefix is sorted on its own
+    in the main process, so only one group is held in memory (spilled above max_rows_in_memory rows).
+    Output is the same as of ExternalSort(keys) on such input. Planner puts it instead of a full sort.
+    """
+
+    def __init__(self, prefix: tp.Sequence[str], keys: tp.Sequence[str],
+                 max_rows_in_memory: int = DEFAULT_MAX_ROWS_IN_MEMORY) -> None:
+        """
+        :param prefix: keys input is already sorted by, should be a prefix of keys
+        :param keys: sorting keys
+        :param max_rows_in_memory: memory budget of one group sort in rows
+        """
+        if tuple(keys[:len(prefix)]) != tuple(prefix):
+            raise CompgraphException("Sorted columns should be a prefix of sorting keys")
+        self.prefix = tuple(prefix)
+        self.keys = tuple(keys)
+        self.max_rows_in_memory = max_rows_in_memory
+
+    def output_order(self, *input_orders: ops.TOrder) -> ops.TOrder:
+        return self.keys
+
+    def __repr__(self) -> str:
+        return f"SortWithinGroups(prefix={list(self.prefix)}, keys={list(self.keys)})"
 
-    def __call__(self, rows: ops.TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> ops.TRowsGenerator:
-        local_endpoint, remote_endpoint = Pipe()
-        process = Process(target=do_sort, args=(remote_endpoint, self.keys))
-        process.start()
-        row_count_before = 0
-        for row in rows:
-            local_endpoint.send(row)
-            row_count_before += 1
-        local_endpoint.send(None)
-        row_count_after = 0
-        while True:
-            local_endpoint_row = local_endpoint.recv()
-            if local_endpoint_row is None:
-                break
-            yield local_endpoint_row
-            row_count_after += 1
-        assert row_count_before == row_count_after
-        process.join()
+    def __call__(self, rows: ops.TRowsIterable, *args: tp.Any, governor: MemoryGovernor | None = None,
+                 **kwargs: tp.Any) -> ops.TRowsGenerator:
+        for _, group in itertools.groupby(rows, key=itemgetter(*self.prefix)):
+            yield from sort_rows(group, self.keys, self.max_rows_in_memory, governor=governor)
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import sys
 import typing as tp
 
-from . import external_sort as ex_sort, CompgraphException
+from . import external_sort as ex_sort, parallel, CompgraphException
 from . import operations as ops
+from .checkpoint import Checkpoint
+from .executor import Executor, JoinStep
+from .incremental import CountState, ReadCountState, WriteCountState
+from .profiling import Profiler
 
 
 class Graph:
@@ -11,7 +16,12 @@ class Graph:
 
     def __init__(self) -> None:
         self._operations: list[tp.Any] = []
-        self._input_data: tp.Any = None
+        self.last_profile: Profiler | None = None
+
+    @property
+    def operations(self) -> list[tp.Any]:
+        """Operations of graph pipeline, the first one is data source"""
+        return self._operations
 
     @staticmethod
     def graph_from_iter(name: str) -> Graph:
@@ -35,53 +45,173 @@ class Graph:
         return new_graph
 
     @staticmethod
-    def graph_from_file(filename: str, parser: tp.Callable[[str], ops.TRow]) -> Graph:
+    def graph_from_file(filename: str, parser: tp.Callable[[str], ops.TRow], workers: int | None = None,
+                        chunk_bytes: int = parallel.DEFAULT_CHUNK_BYTES, memory_map: bool = False) -> Graph:
         """Construct new graph extended with operation for reading rows from file
         Use ops.Read
         :param filename: filename to read from
         :param parser: parser from string to Row
+        :param workers: number of processes to parse file in, split into line-aligned byte ranges; maps which
+            directly follow reading run in them too. Rows are in file order. Read in place if None
+        :param chunk_bytes: approximate size of byte range parsed by worker at once
+        :param memory_map: read file in place through memory map (ops.ReadMmap) instead of read buffers
+        """
+        graph = Graph()
+        if workers is None:
+            graph._operations.append(ops.ReadMmap(filename, parser) if memory_map else ops.Read(filename, parser))
+        else:
+            graph._operations.append(parallel.ParallelRead(filename, parser, workers, chunk_bytes))
+        return graph
+
+    @staticmethod
+    def graph_from_json_lines(filename: str, workers: int | None = None,
+                              chunk_bytes: int = parallel.DEFAULT_CHUNK_BYTES, memory_map: bool = False) -> Graph:
+        """Construct new graph extended with operation for reading rows from file with one JSON object per line,
+        rows are the same as of graph_from_file(filename, json.loads), file is read and decoded in large blocks
+        Use ops.ReadJsonLines
+        :param filename: filename to read from
+        :param workers: number of processes to parse file in, as in graph_from_file; read in place if None
+        :param chunk_bytes: approximate size of byte range parsed by worker at once
+        :param memory_map: read file in place through memory map (ops.ReadMmap) instead of read buffers
         """
         graph = Graph()
-        graph._operations.append(ops.Read(filename, parser))
+        if workers is None:
+            graph._operations.append(ops.ReadMmap(filename) if memory_map else ops.ReadJsonLines(filename))
+        else:
+            graph._operations.append(parallel.ParallelRead(filename, None, workers, chunk_bytes))
         return graph
 
-    def map(self, mapper: ops.Mapper) -> Graph:
+    @staticmethod
+    def graph_from_count_state(state: CountState) -> Graph:
+        """Construct new graph which reads rows of count state persisted by previous run, sorted by its key
+        Use ReadCountState
+        :param state: count state, empty if its file does not exist
+        """
+        graph = Graph()
+        graph._operations.append(ReadCountState(state))
+        return graph
+
+    def map(self, mapper: ops.Mapper, workers: int | None = None,
+            chunk_size: int = parallel.DEFAULT_CHUNK_SIZE) -> Graph:
         """Construct new graph extended with map operation with particular mapper
         :param mapper: mapper to use
+        :param workers: number of processes to map in parallel, output order is kept; map in place if None
+        :param chunk_size: number of rows sent to worker process at once
         """
-        self._operations.append(ops.Map(mapper))
+        if workers is None:
+            self._operations.append(ops.Map(mapper))
+        else:
+            self._operations.append(parallel.ParallelMap(mapper, workers, chunk_size))
         return self
 
-    def reduce(self, reducer: ops.Reducer, keys: tp.Sequence[str]) -> Graph:
+    def reduce(self, reducer: ops.Reducer, keys: tp.Sequence[str], workers: int | None = None) -> Graph:
         """Construct new graph extended with reduce operation with particular reducer
         :param reducer: reducer to use
         :param keys: keys for grouping
+        :param workers: number of processes to reduce hash partitions in, input does not have to be sorted then;
+            reduce sorted input in place if None
+        """
+        if workers is None:
+            self._operations.append(ops.Reduce(reducer, keys))
+        else:
+            self._operations.append(parallel.PartitionedReduce(reducer, keys, workers))
+        return self
+
+    def aggregate(self, reducer: ops.Reducer, keys: tp.Sequence[str],
+                  max_rows_in_memory: int = ex_sort.DEFAULT_MAX_ROWS_IN_MEMORY) -> Graph:
+        """Construct new graph extended with hash reduce: rows are grouped by keys in hash table instead of sorting,
+        which pays off when there are few groups. Output is the same as of sort + reduce
+        Use ops.HashReduce
+        :param reducer: reducer to use
+        :param keys: keys for grouping
+        :param max_rows_in_memory: memory budget in rows, above it rows are hash-partitioned to disk
         """
-        self._operations.append(ops.Reduce(reducer, keys))
+        self._operations.append(ops.HashReduce(reducer, keys, max_rows_in_memory))
         return self
 
-    def sort(self, keys: tp.Sequence[str]) -> Graph:
+    def sort(self, keys: tp.Sequence[str], max_rows_in_memory: int = ex_sort.DEFAULT_MAX_ROWS_IN_MEMORY) -> Graph:
         """Construct new graph extended with sort operation
         :param keys: sorting keys (typical is tuple of strings)
+        :param max_rows_in_memory: memory budget of sort in rows, the rest is spilled to disk
+        """
+        self._operations.append(ex_sort.ExternalSort(keys, max_rows_in_memory))
+        return self
+
+    def checkpoint(self) -> Graph:
+        """Construct new graph extended with checkpoint: in runs with checkpoint_dir output of the graph so far
+        is persisted, as output of every sort is, and resumed runs start from it
+        """
+        self._operations.append(Checkpoint())
+        return self
+
+    def write_count_state(self, state: CountState) -> Graph:
+        """Construct new graph extended with persisting rows (sorted by key of state) as new count state,
+        it replaces the previous one when output of the run is exhausted. Rows are passed on as they are
+        Use WriteCountState
+        :param state: count state to replace
         """
-        self._operations.append(ex_sort.ExternalSort(keys))
+        self._operations.append(WriteCountState(state))
         return self
 
-    def join(self, joiner: ops.Joiner, join_graph: Graph, keys: tp.Sequence[str]) -> Graph:
+    def join(self, joiner: ops.Joiner, join_graph: Graph, keys: tp.Sequence[str], strategy: str = "merge") -> Graph:
         """Construct new graph extended with join operation with another graph
         :param joiner: join strategy to use
         :param join_graph: other graph to join with
         :param keys: keys for grouping
+        :param strategy: "merge" joins inputs sorted by keys,
+            "hash" builds hash table of the smaller input and does not need sorted inputs,
+            "broadcast" attaches small join_graph output to every row, only for empty keys
         """
-        self._operations.append(lambda data: ops.Join(joiner, keys)(data, join_graph.run(**self._input_data)))
+        operation: ops.Operation
+        if strategy == "merge":
+            operation = ops.Join(joiner, keys)
+        elif strategy == "hash":
+            operation = ops.HashJoin(joiner, keys)
+        elif strategy == "broadcast":
+            if keys:
+                raise CompgraphException("Broadcast join does not support keys")
+            operation = ops.BroadcastJoin(joiner)
+        else:
+            raise CompgraphException(f"Unknown join strategy: {strategy}")
+        self._operations.append(JoinStep(operation, join_graph))
         return self
 
-    def run(self, **kwargs: tp.Any) -> ops.TRowsIterable:
-        """Single method to start execution; data sources passed as kwargs"""
-        self._input_data = kwargs
-        if not self._operations:
-            raise CompgraphException("No operations in graph")
-        data = self._operations[0](**kwargs)
-        for operation in self._operations[1::]:
-            data = operation(data)
-        return data
+    def explain(self, columnar: bool = False) -> str:
+        """Execution plan of graph: operations with inputs indented below them, sort order of their output,
+        shared operations and sorts dropped or weakened by planner because data is already sorted
+        :param columnar: plan for columnar mode
+        """
+        return Executor(self, columnar).explain()
+
+    def run(self, columnar: bool = False, compact: bool = False, profile: bool = False,
+            memory_limit: int | None = None, checkpoint_dir: str | None = None, resume: bool = False,
+            **kwargs: tp.Any) -> ops.TRowsIterable:
+        """Single method to start execution; data sources passed as kwargs
+        Operations shared with joined graphs (e.g. common source of graphs made by graph_from_another_graph)
+        are executed once. Sort workers are shared by the whole run and stopped when result is exhausted
+        :param columnar: run maps and reduces which have vectorized numpy kernels (Product, CalculateIdf,
+            CalculatePMI, CalculateTimeAndDistance, Count, Sum) on record batches, needs numpy. Result rows are
+            the same, logarithms may differ from row mode in the last bit
+        :param compact: pass rows between operations as records (ops.Record: tuple of values with schema shared
+            by rows of the same columns) instead of dicts, which takes less memory for rows held in sorts,
+            hash tables and spill files. Rows of data sources are turned into records, result rows are dicts
+        :param profile: collect rows in and out, wall and CPU time and bytes spilled of every operation of plan
+            into last_profile, its table is written to stderr when result is exhausted
+        :param memory_limit: memory limit in bytes of the process and of every sort worker. Sort buffers, groups
+            kept by joins and hash tables are spilled to disk before their estimated size takes the process beyond
+            it. Memory taken by the process when run starts counts towards the limit
+        :param checkpoint_dir: work directory to persist output of every sort and checkpoint of the plan in,
+            with manifest of completed ones; checkpoints of previous run there are removed unless run resumes
+        :param resume: skip operations whose output was persisted in checkpoint_dir by previous run of the same
+            plan (e.g. crashed one): run starts from their output. Data sources should be the same as before
+        """
+        executor = Executor(self, columnar, compact, memory_limit, checkpoint_dir, resume)
+        if not profile:
+            return executor.run(**kwargs)
+        self.last_profile = Profiler()
+        return self.__profiled(executor.run(self.last_profile, **kwargs), self.last_profile)
+
+    @staticmethod
+    def __profiled(rows: ops.TRowsIterable, profiler: Profiler) -> ops.TRowsGenerator:
+        yield from rows
+        print(profiler.table(), file=sys.stderr)
@@ -0,0 +1,121 @@
+# incremental.py
+from __future__ import annotations
+
+import os
+import pickle
+import typing as tp
+
+from . import operations as ops
+from .exception import CompgraphException
+from .spill import FRAME_SIZE
+
+
+class CountState:
+    """
+    Counts of keys persisted between incremental runs, e.g. of words by word_count_incremental_graph.
+    File starts with pickled pair of column names, then rows sorted by key go in frames of FRAME_SIZE rows:
+    every frame is pickled pair of lists of keys and of counts, so column names are not repeated per row.
+    New state is staged next to file when all rows are written and replaces it on commit, which executor does
+    when output of the run is exhausted: a run failed before that, e.g. while its output is written, leaves
+    state of the previous one, so rerun does not count its rows twice. Only state staged by write of the same
+    run is committed, file left by a failed one is removed by the next write.
+    """
+
+    def __init__(self, path: str, key_column: str = "text", count_column: str = "count") -> None:
+        """
+        :param path: state file, state is empty if it does not exist
+        :param key_column: column of keys
+        :param count_column: column of counts
+        """
+        self.path = path
+        self.staged_path = path + ".tmp"
+        self.__staged = False
+        self.key_column = key_column
+        self.count_column = count_column
+
+    def read(self) -> ops.TRowsGenerator:
+        """Persisted rows of key and count sorted by key"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            if pickle.load(f) != (self.key_column, self.count_column):
+                raise CompgraphException(f"State {self.path} is not of columns {self.key_column}, {self.count_column}")
+            while True:
+                try:
+                    keys, counts = pickle.load(f)
+                except EOFError:
+                    break
+                for key, count in zip(keys, counts):
+                    yield {self.key_column: key, self.count_column: count}
+
+    def write(self, rows: ops.TRowsIterable) -> ops.TRowsGenerator:
+        """
+        Pass rows through and stage them as new state when they are exhausted
+        :param rows: rows sorted by key
+        """
+        tmp_path = self.staged_path
+        self.__staged = False
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        keys: list[tp.Any] = []
+        counts: list[int] = []
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump((self.key_column, self.count_column), f, protocol=pickle.HIGHEST_PROTOCOL)
+                for row in rows:
+                    keys.append(row[self.key_column])
+                    counts.append(row[self.count_column])
+                    if len(keys) >= FRAME_SIZE:
+                        pickle.dump((keys, counts), f, protocol=pickle.HIGHEST_PROTOCOL)
+                        keys, counts = [], []
+                    yield row
+                if keys:
+                    pickle.dump((keys, counts), f, protocol=pickle.HIGHEST_PROTOCOL)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.__staged = True
+
+    def commit(self) -> None:
+        """Replace state by the one staged by the last write, if it was not committed yet"""
+        if self.__staged:
+            os.replace(self.staged_path, self.path)
+            self.__staged = False
+
+
+class ReadCountState(ops.Operation):
+    """Take rows of persisted count state, they are sorted by key"""
+
+    def __init__(self, state: CountState) -> None:
+        self.__state = state
+
+    def __call__(self, *args: tp.Any, **kwargs: tp.Any) -> ops.TRowsGenerator:
+        yield from self.__state.read()
+
+    def output_order(self, *input_orders: ops.TOrder) -> ops.TOrder:
+        return (self.__state.key_column,)
+
+    def __repr__(self) -> str:
+        return f"ReadCountState({self.__state.path!r})"
+
+
+class WriteCountState(ops.Operation):
+    """
+    Pass rows sorted by key as they are and stage them as new count state when they are exhausted,
+    executor commits it when output of the run is exhausted
+    """
+
+    def __init__(self, state: CountState) -> None:
+        self.__state = state
+
+    def commit(self) -> None:
+        self.__state.commit()
+
+    def __call__(self, rows: ops.TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> ops.TRowsGenerator:
+        yield from self.__state.write(rows)
+
+    def output_order(self, *input_orders: ops.TOrder) -> ops.TOrder:
+        return input_orders[0]
+
+    def __repr__(self) -> str:
+        return f"WriteCountState({self.__state.path!r})"
@@ -0,0 +1,232 @@
+# memory.py
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import resource
+import sys
+import typing as tp
+
+from abc import ABC, abstractmethod
+
+from .exception import CompgraphException
+from .operations.base import TRow, TRowsIterable
+from .spill import SpillFile
+
+RESERVE_PERIOD = 256
+MIN_RUN_ROWS = 4 * RESERVE_PERIOD
+MERGE_FAN_IN = 64
+
+
+def current_rss() -> int:
+    """Resident memory of this process in bytes, peak resident memory where the current one is not available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+def row_size(row: TRow) -> int:
+    """Estimated memory taken by row: the row object and its values, values nested in them are not counted"""
+    return sys.getsizeof(row) + sum(map(sys.getsizeof, row.values()))
+
+
+class Spillable(ABC):
+    """Holder of rows in memory which can move them to disk when governor asks for memory"""
+
+    @abstractmethod
+    def spill(self) -> bool:
+        """
+        Move rows to disk and release memory reserved for them, now or as soon as holder can
+        :return: False if holder can not spill its rows, e.g. while they are being read
+        """
+        pass
+
+
+class MemoryGovernor:
+    """
+    Memory budget of rows buffered by operations of one graph run: sort buffers, join groups, hash tables.
+    Budget is memory limit of the process minus memory it already took when the run started.
+    Holders reserve estimated size of rows they keep (see row_size) and release it when they drop or spill them.
+    When reservations exceed the budget, holders are asked to spill starting from the largest one,
+    until reservations fit, so process moves rows to disk instead of growing beyond the limit.
+    Holder which was asked but spills later (see Reservation) has its memory counted as freed until it releases it,
+    so it is not asked again and other holders are not spilled for memory it is about to free.
+    Sizes are estimates: memory of rows being passed between operations and fragmentation of Python heap
+    are not counted, so limit should leave some headroom.
+    """
+
+    def __init__(self, limit: int, baseline: int | None = None) -> None:
+        """
+        :param limit: memory limit of the process in bytes
+        :param baseline: memory taken by the process before run, current resident memory if None
+        """
+        baseline = current_rss() if baseline is None else baseline
+        if limit <= baseline:
+            raise CompgraphException(f"Memory limit {limit} is below memory already taken by process {baseline}")
+        self.limit = limit
+        self.budget = limit - baseline
+        self.used = 0
+        self.spills = 0
+        self.__reserved: dict[Spillable, int] = {}
+        self.__requested: set[Spillable] = set()
+
+    def reserve(self, holder: Spillable, size: int) -> None:
+        """Account size bytes more held by holder, ask holders to spill if budget is exceeded"""
+        self.__reserved[holder] = self.__reserved.get(holder, 0) + size
+        self.used += size
+        if self.used > self.budget:
+            self.__reclaim()
+
+    def release(self, holder: Spillable) -> None:
+        """Forget all memory reserved by holder"""
+        self.used -= self.__reserved.pop(holder, 0)
+        self.__requested.discard(holder)
+
+    def __reclaim(self) -> None:
+        requested = sum(self.__reserved[holder] for holder in self.__requested)
+        for holder in sorted(self.__reserved, key=self.__reserved.__getitem__, reverse=True):
+            if self.used - requested <= self.budget:
+                return
+            if holder in self.__requested or not holder.spill():
+                continue
+            self.spills += 1
+            if holder in self.__reserved:  # holder spills later, its memory is counted as freed until it releases it
+                self.__requested.add(holder)
+                requested += self.__reserved[holder]
+
+
+class RowBuffer(Spillable):
+    """
+    Rows kept in memory under governor, which are written to disk as a run when governor asks for memory
+    or when there are max_rows of them. If key is given runs are sorted, otherwise rows keep the order they were
+    added in. Buffer may be read many times: runs and rows in memory are chained, or merged by key (stable).
+    Once buffer is read its rows in memory are held by readers, so it does not spill them any more
+    and keeps their memory reserved until it is closed.
+    Governor asking for memory while there are less than MIN_RUN_ROWS rows is served once there are that many,
+    so tight budget does not cut input into tiny runs. At most MERGE_FAN_IN runs are merged at once:
+    above that groups of runs are first merged into longer runs, so files open at once stay bounded.
+    """
+
+    def __init__(self, governor: MemoryGovernor | None = None, key: tp.Callable[[TRow], tp.Any] | None = None,
+                 max_rows: int | None = None, directory: str | None = None) -> None:
+        """
+        :param governor: governor to reserve memory of rows in, rows are spilled only above max_rows if None
+        :param key: sorting key of buffer, rows are read in order of adding if None
+        :param max_rows: maximum number of rows in memory, not limited if None
+        :param directory: directory for spilled runs, default temporary directory if None
+        """
+        self.__governor = governor
+        self.__key = key
+        self.__max_rows = max_rows
+        self.__directory = directory
+        self.__rows: list[TRow] = []
+        self.__runs: list[SpillFile] = []
+        self.__size = 0
+        self.__spill_requested = False
+        self.__read = False
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def extend(self, rows: TRowsIterable) -> RowBuffer:
+        rows = iter(rows)
+        while True:
+            count = RESERVE_PERIOD if self.__max_rows is None else min(RESERVE_PERIOD,
+                                                                       self.__max_rows - len(self.__rows))
+            chunk = list(itertools.islice(rows, count))
+            if not chunk:
+                return self
+            self.__rows += chunk
+            self.__size += len(chunk)
+            if self.__governor is not None:
+                self.__governor.reserve(self, len(chunk) * row_size(chunk[-1]))
+            if self.__max_rows is not None and len(self.__rows) >= self.__max_rows or \
+                    self.__spill_requested and len(self.__rows) >= MIN_RUN_ROWS:
+                self.__write_run()
+
+    def spill(self) -> bool:
+        if self.__read:
+            return False
+        if len(self.__rows) >= MIN_RUN_ROWS:
+            self.__write_run()
+        else:
+            self.__spill_requested = True
+        return True
+
+    def __write_run(self) -> None:
+        if self.__rows:
+            if self.__key is not None:
+                self.__rows.sort(key=self.__key)
+            self.__runs.append(SpillFile(self.__directory).write_all(self.__rows))
+            self.__rows = []
+        self.__spill_requested = False
+        if self.__governor is not None:
+            self.__governor.release(self)
+
+    def __merge_runs(self, key: tp.Callable[[TRow], tp.Any]) -> None:
+        """Merge consecutive groups of runs until at most MERGE_FAN_IN of them are left, order of equal keys is kept"""
+        while len(self.__runs) > MERGE_FAN_IN:
+            merged = []
+            for start in range(0, len(self.__runs), MERGE_FAN_IN):
+                group = self.__runs[start:start + MERGE_FAN_IN]
+                if len(group) == 1:
+                    merged += group
+                    continue
+                rows = heapq.merge(*(run.read() for run in group), key=key)
+                merged.append(SpillFile(self.__directory).write_all(rows))
+                for run in group:
+                    run.remove()
+            self.__runs = merged
+
+    def __iter__(self) -> tp.Iterator[TRow]:
+        self.__read = True
+        if self.__key is None:  # chained runs are opened one after another
+            return itertools.chain(*(run.read() for run in self.__runs), self.__rows)
+        self.__merge_runs(self.__key)
+        runs = [run.read() for run in self.__runs]
+        self.__rows.sort(key=self.__key)
+        # heapq.merge is stable: on equal keys earlier runs go first, rows in memory are the latest run
+        return heapq.merge(*runs, self.__rows, key=self.__key) if runs else iter(self.__rows)
+
+    def close(self) -> None:
+        """Drop rows and remove runs"""
+        if self.__governor is not None:
+            self.__governor.release(self)
+        for run in self.__runs:
+            run.remove()
+        self.__runs.clear()
+        self.__rows = []
+        self.__size = 0
+        self.__spill_requested = False
+        self.__read = False
+
+    def __enter__(self) -> RowBuffer:
+        return self
+
+    def __exit__(self, *args: tp.Any) -> None:
+        self.close()
+
+
+class Reservation(Spillable):
+    """
+    Memory of rows held by operation which spills them on its own, e.g. hash table partitioned to disk:
+    governor asking for memory only sets spill_requested, operation checks it and calls release after it spilled.
+    """
+
+    def __init__(self, governor: MemoryGovernor) -> None:
+        self.__governor = governor
+        self.spill_requested = False
+
+    def reserve(self, size: int) -> None:
+        self.__governor.reserve(self, size)
+
+    def spill(self) -> bool:
+        self.spill_requested = True
+        return True
+
+    def release(self) -> None:
+        self.__governor.release(self)
@@ -1,15 +1,20 @@
-from .base import Operation, Mapper, Reducer, Joiner, TRow, TRowsIterable, TRowsGenerator
+from .base import Operation, Mapper, Reducer, Joiner, TRow, TRowsIterable, TRowsGenerator, TOrder, order_within, \
+    order_without
+from .batch import RecordBatch, to_batches, to_rows
+from .record import Record, Schema, to_records, to_dicts, with_column, with_columns
 from .joiners import (
     InnerJoiner,
     OuterJoiner,
     LeftJoiner,
-    RightJoiner
+    RightJoiner,
+    MergeJoiner
 )
 from .mappers import (
     DummyMapper,
     FilterPunctuation,
     LowerCase,
     Split,
+    Tokenize,
     Product,
     Filter,
     Project,
@@ -21,10 +26,17 @@ from .mappers_misc import (
 )
 from .operation_impl import (
     Read,
+    ReadJsonLines,
+    ReadMmap,
     ReadIterFactory,
     Map,
+    FusedMap,
     Reduce,
-    Join
+    HashReduce,
+    Combine,
+    Join,
+    HashJoin,
+    BroadcastJoin
 )
 from .reducers import (
     FirstReducer,
@@ -37,8 +49,10 @@ from .reducers_misc import (
     AverageSpeed
 )
 
-__all__ = ["Operation", "Mapper", "Reducer", "Joiner", "TRow", "TRowsIterable", "TRowsGenerator", "InnerJoiner",
-           "OuterJoiner", "LeftJoiner", "RightJoiner", "DummyMapper", "FilterPunctuation", "LowerCase", "Split",
-           "CalculateIdf", "CalculatePMI", "Product", "Filter", "Project", "CalculateTimeAndDistance", "Read",
-           "ReadIterFactory", "Map", "Reduce", "Join", "FirstReducer", "TopN", "TermFrequency", "Count", "Sum",
-           "AverageSpeed"]
+__all__ = ["Operation", "Mapper", "Reducer", "Joiner", "TRow", "TRowsIterable", "TRowsGenerator", "TOrder",
+           "order_within", "order_without", "RecordBatch", "to_batches", "to_rows", "Record", "Schema", "to_records",
+           "to_dicts", "with_column", "with_columns", "InnerJoiner", "OuterJoiner", "LeftJoiner", "RightJoiner",
+           "MergeJoiner", "DummyMapper", "FilterPunctuation", "LowerCase", "Split", "Tokenize", "CalculateIdf",
+           "CalculatePMI", "Product", "Filter", "Project", "CalculateTimeAndDistance", "Read", "ReadJsonLines",
+           "ReadMmap", "ReadIterFactory", "Map", "FusedMap", "Reduce", "HashReduce", "Combine", "Join", "HashJoin",
+           "BroadcastJoin", "FirstReducer", "TopN", "TermFrequency", "Count", "Sum", "AverageSpeed"]
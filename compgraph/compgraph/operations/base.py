@@ -1,21 +1,61 @@
 # base.py
+import itertools
 import typing as tp
 from abc import abstractmethod, ABC
 
+from .batch import RecordBatch, to_batches
+from ..exception import CompgraphException
+
+if tp.TYPE_CHECKING:
+    from ..memory import MemoryGovernor
+
 TRow = dict[str, tp.Any]
 TRowsIterable = tp.Iterable[TRow]
 TRowsGenerator = tp.Generator[TRow, None, None]
 
 
+TOrder = tuple[str, ...]
+
+
+def order_within(order: TOrder, columns: tp.Iterable[str]) -> TOrder:
+    """Longest prefix of sort order which consists of columns only"""
+    allowed = set(columns)
+    prefix = []
+    for column in order:
+        if column not in allowed:
+            break
+        prefix.append(column)
+    return tuple(prefix)
+
+
+def order_without(order: TOrder, columns: tp.Iterable[str]) -> TOrder:
+    """Longest prefix of sort order which does not touch columns"""
+    touched = set(columns)
+    return order_within(order, (column for column in order if column not in touched))
+
+
 class Operation(ABC):
     @abstractmethod
     def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
         pass
 
+    def output_order(self, *input_orders: TOrder) -> TOrder:
+        """
+        Columns output rows are sorted by, used by planner; empty if unknown
+        :param input_orders: columns rows of every input are sorted by
+        """
+        return ()
+
 
 class Mapper(ABC):
     """Base class for mappers"""
 
+    # mapper gives at most one row per input row, FusedMap calls its map_one when the class defining __call__
+    # (or its subclass) defines map_one too
+    one_row: tp.ClassVar[bool] = False
+    # map_one may change dict row passed in place
+    updates_row: tp.ClassVar[bool] = False
+
     @abstractmethod
     def __call__(self, row: TRow) -> TRowsGenerator:
         """
@@ -23,6 +63,33 @@ class Mapper(ABC):
         """
         pass
 
+    def map_one(self, row: TRow) -> TRow | None:
+        """
+        Fast path of mappers with one_row set, used by FusedMap instead of generator of __call__:
+        mapped row, None if row is dropped. If updates_row is set, mapper may change dict row in place
+        (set_column) and return it, FusedMap passes its own copy of input row then.
+        By default row is mapped by __call__, which should give at most one row
+        :param row: one table row
+        """
+        rows = list(self(row))
+        if len(rows) > 1:
+            raise CompgraphException(f"{type(self).__name__} gave {len(rows)} rows for one row")
+        return rows[0] if rows else None
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        """
+        Prefix of input sort order which mapped rows keep, used by planner; empty if unknown
+        :param order: columns input rows are sorted by
+        """
+        return ()
+
+    def map_batch(self, batch: RecordBatch) -> tp.Iterator[RecordBatch]:
+        """
+        Apply mapper to batch of rows in columnar mode. Maps row by row, mappers with vectorized kernel override it
+        :param batch: rows to map
+        """
+        return to_batches((result for row in batch.to_rows() for result in self(row)), max(len(batch), 1))
+
 
 class Reducer(ABC):
     """Base class for reducers"""
@@ -34,6 +101,49 @@ class Reducer(ABC):
         """
         pass
 
+    def kept_order(self, group_key: tuple[str, ...], order: TOrder) -> TOrder:
+        """
+        Prefix of input sort order which reduced rows keep, used by planner; empty if unknown
+        :param group_key: keys for grouping
+        :param order: columns input rows are sorted by
+        """
+        return ()
+
+    def combine(self, group_key: tuple[str, ...], partial: TRow | None, row: TRow) -> TRow | None:
+        """
+        Add row to partial aggregate of its combine key, used to shrink data before it is sorted for reduce.
+        Reducers which can be combined override it together with combine_key and merger
+        :param group_key: keys for grouping
+        :param partial: aggregate of rows with the same combine key seen before, None for the first of them;
+                        may be changed in place
+        :param row: row to add
+        :return: new partial aggregate; None if row can not be combined,
+                 then it and all rows after it are given to merger as they are
+        """
+        return None
+
+    def combine_key(self, group_key: tuple[str, ...]) -> tuple[str, ...]:
+        """
+        Columns rows are combined by, group_key by default. If they are wider than group_key, partial aggregates
+        of one combine key may be split in several ones, merger should give the same result for them
+        :param group_key: keys for grouping
+        """
+        return group_key
+
+    def merger(self) -> "Reducer":
+        """Reducer which turns groups of partial aggregates (and rows not combined) into output of this reducer"""
+        return self
+
+    def reduce_batch(self, group_key: tuple[str, ...], batch: RecordBatch) -> tp.Iterator[RecordBatch]:
+        """
+        Apply reducer to every group of batch in columnar mode, groups do not continue in the next batch.
+        Reduces group by group, reducers with vectorized kernel override it
+        :param group_key: keys for grouping
+        :param batch: rows sorted by group_key
+        """
+        groups = itertools.groupby(batch.to_rows(), key=lambda row: tuple(row[key] for key in group_key))
+        return to_batches((result for _, rows in groups for result in self(group_key, rows)), max(len(batch), 1))
+
 
 class Joiner(ABC):
     """Base class for joiners"""
@@ -42,6 +152,7 @@ class Joiner(ABC):
         self._a_suffix = suffix_a
         self._b_suffix = suffix_b
         self._keys_that_were_before: set[str] = set()
+        self._governor: "MemoryGovernor | None" = None  # groups materialized by joiner are buffered under it
 
     @property
     def keys_that_were_before(self) -> set[str]:
@@ -61,9 +172,9 @@ class Joiner(ABC):
         """
         pass
 
-    def _merge_rows(self, keys: tp.Sequence[str], rows_a: list[TRow], rows_b: TRowsIterable) \
+    def _merge_rows(self, keys: tp.Sequence[str], rows_a: tp.Iterable[TRow], rows_b: TRowsIterable) \
             -> tp.Generator[TRow, None, bool | None]:
-        assert len(rows_a) > 0
+        assert rows_a
         b_was_empty = True
         for row_b in rows_b:
             b_was_empty = False
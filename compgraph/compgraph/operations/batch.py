@@ -0,0 +1,174 @@
+# batch.py
+from __future__ import annotations
+
+import itertools
+import operator
+import typing as tp
+
+try:
+    import numpy as np
+except ImportError:  # columnar mode is not available then, row mode does not need numpy
+    np = None  # type: ignore[assignment]
+
+TRow = dict[str, tp.Any]
+
+# integers of vectorized results should stay far from int64 overflow
+INT64_SAFE_LIMIT = 2 ** 62
+# integers converted to float64 exactly
+FLOAT64_EXACT_LIMIT = 2 ** 53
+
+
+def _column(values: tp.Any) -> tp.Any:
+    """Store values as numpy array if all of them are int or all of them are float, keep list otherwise"""
+    if isinstance(values, np.ndarray):
+        return values
+    kinds = set(map(type, values))
+    if kinds == {int}:
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            return values
+    if kinds == {float}:
+        return np.array(values, dtype=np.float64)
+    return values
+
+
+def _values(column: tp.Any) -> list[tp.Any]:
+    return column.tolist() if isinstance(column, np.ndarray) else column
+
+
+class RecordBatch:
+    """
+    Rows stored column by column.
+    Batch made from rows keeps them and builds columns only when they are asked for, so columns which kernels
+    do not touch cost nothing. Columns of ints or of floats are converted to numpy arrays for kernels,
+    other columns (strings, mixed types, ...) stay lists. Columns set by kernels are written over the kept rows
+    when batch is converted back, as {**row, column: value} would do. Converting rows to batch and back
+    gives equal rows.
+    """
+
+    def __init__(self, columns: dict[str, tp.Any], length: int, rows: list[TRow] | None = None,
+                 changed: tuple[str, ...] = ()) -> None:
+        """
+        :param columns: column name -> numpy array or list of values
+        :param length: number of rows
+        :param rows: rows batch is made of, they provide columns which are not in columns
+        :param changed: columns which are set over rows
+        """
+        self.__columns = columns
+        self.__rows = rows
+        self.__changed = changed
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    @staticmethod
+    def from_rows(rows: list[TRow]) -> RecordBatch:
+        return RecordBatch({}, len(rows), rows)
+
+    def to_rows(self) -> list[TRow]:
+        if self.__rows is None:
+            if not self.__columns:
+                return [{} for _ in range(self.length)]
+            names = list(self.__columns)
+            columns = zip(*map(_values, self.__columns.values()))
+            return list(map(dict, map(zip, itertools.repeat(names), columns)))
+        if not self.__changed:
+            return self.__rows
+        rows = [row.copy() for row in self.__rows]
+        for name in self.__changed:
+            for row, value in zip(rows, _values(self.__columns[name])):
+                row[name] = value
+        return rows
+
+    def column(self, name: str) -> tp.Any:
+        """Column as numpy array or list"""
+        if name not in self.__columns:
+            assert self.__rows is not None, f"No column {name} in batch"
+            self.__columns[name] = [row[name] for row in self.__rows]
+        return self.__columns[name]
+
+    def numeric(self, *names: str) -> list[tp.Any] | None:
+        """Columns as numpy arrays, None if some of them is not numeric"""
+        columns = []
+        for name in names:
+            column = self.__columns[name] = _column(self.column(name))
+            if not isinstance(column, np.ndarray):
+                return None
+            columns.append(column)
+        return columns
+
+    def with_column(self, name: str, values: tp.Any) -> RecordBatch:
+        """Batch with column added or replaced, like {**row, name: value} for every row"""
+        changed = self.__changed if name in self.__changed or self.__rows is None else (*self.__changed, name)
+        return RecordBatch({**self.__columns, name: values}, self.length, self.__rows, changed)
+
+    def select(self, names: tp.Iterable[str]) -> RecordBatch:
+        """Batch of given columns only"""
+        return RecordBatch({name: self.column(name) for name in names}, self.length)
+
+    def take(self, indices: tp.Any) -> RecordBatch:
+        """
+        :param indices: numpy array of row indices
+        """
+        columns = {}
+        for name, column in self.__columns.items():
+            columns[name] = column[indices] if isinstance(column, np.ndarray) else [column[i] for i in indices]
+        rows = None if self.__rows is None else [self.__rows[i] for i in indices]
+        return RecordBatch(columns, len(indices), rows, self.__changed)
+
+    def slice(self, start: int, stop: int) -> RecordBatch:
+        columns = {name: column[start:stop] for name, column in self.__columns.items()}
+        rows = None if self.__rows is None else self.__rows[start:stop]
+        return RecordBatch(columns, stop - start, rows, self.__changed)
+
+    @staticmethod
+    def concat_all(batches: tp.Sequence[RecordBatch]) -> RecordBatch:
+        """Rows of batches one after another, a single batch is returned as it is"""
+        if len(batches) == 1:
+            return batches[0]
+        return RecordBatch.from_rows([row for batch in batches for row in batch.to_rows()])
+
+    def group_starts(self, keys: tp.Sequence[str]) -> tp.Any:
+        """Indices of rows which start a new group of equal keys, batch should not be empty"""
+        starts = np.zeros(self.length, dtype=bool)
+        starts[0] = True
+        for key in keys:
+            column = self.__columns[key] = _column(self.column(key))
+            if isinstance(column, np.ndarray):
+                starts[1:] |= column[1:] != column[:-1]
+            else:
+                starts[1:] |= np.fromiter(map(operator.ne, column[1:], column[:-1]), dtype=bool,
+                                          count=self.length - 1)
+        return np.flatnonzero(starts)
+
+
+def _max_abs(column: tp.Any) -> int:
+    return int(np.abs(column).max()) if len(column) else 0
+
+
+def int_product_fits(columns: list[tp.Any]) -> bool:
+    """Product of integer columns is exact in int64, as with python ints"""
+    bound = 1
+    for column in columns:
+        if column.dtype.kind == "i":
+            bound *= _max_abs(column)
+    return bound < INT64_SAFE_LIMIT
+
+
+def ints_exact_in_float(columns: list[tp.Any]) -> bool:
+    """Integer columns are converted to float64 without rounding, so float arithmetic matches python one"""
+    return all(column.dtype.kind != "i" or _max_abs(column) < FLOAT64_EXACT_LIMIT for column in columns)
+
+
+def to_batches(rows: tp.Iterable[TRow], batch_size: int) -> tp.Generator[RecordBatch, None, None]:
+    """Cut rows into batches of at most batch_size rows"""
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, batch_size)):
+        yield RecordBatch.from_rows(chunk)
+
+
+def to_rows(batches: tp.Iterable[RecordBatch]) -> tp.Generator[TRow, None, None]:
+    for batch in batches:
+        yield from batch.to_rows()
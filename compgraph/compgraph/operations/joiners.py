@@ -1,54 +1,98 @@
 # joiners.py
+import itertools
 import typing as tp
 
-from .base import Joiner, TRowsIterable, TRowsGenerator
+from .base import Joiner, Reducer, TRow, TRowsIterable, TRowsGenerator
+from ..memory import MemoryGovernor, RowBuffer
+
+
+def _materialize(rows: TRowsIterable, governor: MemoryGovernor | None) -> list[TRow] | RowBuffer:
+    """Group of rows joiner reads many times: list, or buffer spilled to disk when governor asks for memory"""
+    if isinstance(rows, list):
+        return rows
+    return list(rows) if governor is None else RowBuffer(governor).extend(rows)
+
+
+def _drop(group: list[TRow] | RowBuffer) -> None:
+    if isinstance(group, RowBuffer):
+        group.close()
 
 
 class InnerJoiner(Joiner):
     """Join with inner strategy"""
 
     def __call__(self, keys: tp.Sequence[str], rows_a: TRowsIterable, rows_b: TRowsIterable) -> TRowsGenerator:
-        rows_a = list(rows_a)
-        if rows_a:
-            yield from self._merge_rows(keys, rows_a, rows_b)
+        group_a = _materialize(rows_a, self._governor)
+        try:
+            if group_a:
+                yield from self._merge_rows(keys, group_a, rows_b)
+        finally:
+            _drop(group_a)
 
 
 class OuterJoiner(Joiner):
     """Join with outer strategy"""
 
     def __call__(self, keys: tp.Sequence[str], rows_a: TRowsIterable, rows_b: TRowsIterable) -> TRowsGenerator:
-        rows_a = list(rows_a)
-        if not rows_a:
-            for row in rows_b:
-                yield self._add_suffixes({}, row, keys)
-            return
-        is_rows_b_empty = yield from self._merge_rows(keys, rows_a, rows_b)
-        if is_rows_b_empty:
-            for row in rows_a:
-                yield self._add_suffixes(row, {}, keys)
+        group_a = _materialize(rows_a, self._governor)
+        try:
+            if not group_a:
+                for row in rows_b:
+                    yield self._add_suffixes({}, row, keys)
+                return
+            is_rows_b_empty = yield from self._merge_rows(keys, group_a, rows_b)
+            if is_rows_b_empty:
+                for row in group_a:
+                    yield self._add_suffixes(row, {}, keys)
+        finally:
+            _drop(group_a)
 
 
 class LeftJoiner(Joiner):
     """Join with left strategy"""
 
     def __call__(self, keys: tp.Sequence[str], rows_a: TRowsIterable, rows_b: TRowsIterable) -> TRowsGenerator:
-        rows_a = list(rows_a)
-        if not rows_a:
-            return
-        is_rows_b_empty = yield from self._merge_rows(keys, rows_a, rows_b)
-        if is_rows_b_empty:
-            for row in rows_a:
-                yield self._add_suffixes(row, {}, keys)
+        group_a = _materialize(rows_a, self._governor)
+        try:
+            if not group_a:
+                return
+            is_rows_b_empty = yield from self._merge_rows(keys, group_a, rows_b)
+            if is_rows_b_empty:
+                for row in group_a:
+                    yield self._add_suffixes(row, {}, keys)
+        finally:
+            _drop(group_a)
 
 
 class RightJoiner(Joiner):
     """Join with right strategy"""
 
     def __call__(self, keys: tp.Sequence[str], rows_a: TRowsIterable, rows_b: TRowsIterable) -> TRowsGenerator:
-        rows_b = list(rows_b)
-        if not rows_b:
-            return
-        is_rows_a_empty = yield from self._merge_rows(keys, rows_b, rows_a)
-        if is_rows_a_empty:
-            for row in rows_b:
-                yield self._add_suffixes({}, row, keys)
+        group_b = _materialize(rows_b, self._governor)
+        try:
+            if not group_b:
+                return
+            is_rows_a_empty = yield from self._merge_rows(keys, group_b, rows_a)
+            if is_rows_a_empty:
+                for row in group_b:
+                    yield self._add_suffixes({}, row, keys)
+        finally:
+            _drop(group_b)
+
+
+class MergeJoiner(Joiner):
+    """
+    Join with outer strategy of two datasets of partial aggregates of reducer (e.g. previous output of Count and
+    counts of new rows): rows of both groups are merged into one by reducer.merger(), as partial aggregates
+    of one reduce are
+    """
+
+    def __init__(self, reducer: Reducer) -> None:
+        """
+        :param reducer: reducer whose partial aggregates are joined, join keys are its group keys
+        """
+        super().__init__()
+        self.__merger = reducer.merger()
+
+    def __call__(self, keys: tp.Sequence[str], rows_a: TRowsIterable, rows_b: TRowsIterable) -> TRowsGenerator:
+        yield from self.__merger(tuple(keys), itertools.chain(rows_a, rows_b))
@@ -4,15 +4,28 @@ import re
 import string
 import typing as tp
 
-from .base import Mapper, TRow, TRowsGenerator
+from .base import Mapper, TRow, TRowsGenerator, TOrder, order_within, order_without
+from .batch import RecordBatch, int_product_fits, np
+from .record import with_column, set_column, select
+
+# str.translate table deleting characters of string.punctuation
+_PUNCTUATION = str.maketrans("", "", string.punctuation)
 
 
 class DummyMapper(Mapper):
     """Yield exactly the row passed"""
 
+    one_row = True
+
     def __call__(self, row: TRow) -> TRowsGenerator:
         yield row
 
+    def map_one(self, row: TRow) -> TRow | None:
+        return row
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order
+
 
 class FilterPunctuation(Mapper):
     """Left only non-punctuation symbols"""
@@ -23,9 +36,17 @@ class FilterPunctuation(Mapper):
         """
         self.__column = column
 
+    one_row = True
+    updates_row = True
+
     def __call__(self, row: TRow) -> TRowsGenerator:
-        yield {**row,
-               self.__column: re.sub(fr"[\\{string.punctuation}]", "", row[self.__column])}
+        yield with_column(row, self.__column, row[self.__column].translate(_PUNCTUATION))
+
+    def map_one(self, row: TRow) -> TRow | None:
+        return set_column(row, self.__column, row[self.__column].translate(_PUNCTUATION))
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order_without(order, [self.__column])
 
 
 class LowerCase(Mapper):
@@ -37,8 +58,17 @@ class LowerCase(Mapper):
         """
         self.__column = column
 
+    one_row = True
+    updates_row = True
+
     def __call__(self, row: TRow) -> TRowsGenerator:
-        yield {**row, self.__column: (row[self.__column]).lower()}
+        yield with_column(row, self.__column, (row[self.__column]).lower())
+
+    def map_one(self, row: TRow) -> TRow | None:
+        return set_column(row, self.__column, row[self.__column].lower())
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order_without(order, [self.__column])
 
 
 class Split(Mapper):
@@ -60,13 +90,48 @@ class Split(Mapper):
         matches = re.finditer(rf"{self.__separator}", original_value)
         current = 0
         for match in matches:
-            yield {**row, self.__column: original_value[current:match.start()]}
+            yield with_column(row, self.__column, original_value[current:match.start()])
             current = match.end()
 
         if current == 0:
             yield row
         elif match.end() != len(original_value):
-            yield {**row, self.__column: original_value[match.end():]}
+            yield with_column(row, self.__column, original_value[match.end():])
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order_without(order, [self.__column])
+
+
+class Tokenize(Mapper):
+    """
+    Split text into lower case words without punctuation, one row per word: the same rows as
+    FilterPunctuation, LowerCase and Split by whitespace one after another, made in one pass per row
+    """
+
+    def __init__(self, column: str, min_length: int = 0, stop_words: tp.Iterable[str] = ()) -> None:
+        """
+        :param column: name of column to split
+        :param min_length: words shorter than it are dropped
+        :param stop_words: words (in lower case) to drop
+        """
+        self.__column = column
+        self.__min_length = min_length
+        self.__stop_words = frozenset(stop_words)
+
+    def __call__(self, row: TRow) -> TRowsGenerator:
+        text = row[self.__column].translate(_PUNCTUATION).lower()
+        words = text.split()
+        if not words:
+            words = [""]  # Split gives text itself if there is no separator, and one empty word for blank text
+        elif text[0].isspace():
+            words.insert(0, "")  # leading separator starts with empty word, trailing one does not end with it
+        column = self.__column
+        for word in words:
+            if len(word) >= self.__min_length and word not in self.__stop_words:
+                yield with_column(row, column, word)
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order_without(order, [self.__column])
 
 
 class Product(Mapper):
@@ -80,9 +145,29 @@ class Product(Mapper):
         self.__columns = columns
         self.__result_column = result_column
 
+    one_row = True
+    updates_row = True
+
     def __call__(self, row: TRow) -> TRowsGenerator:
         result = functools.reduce(lambda x, y: x * y, (row[value] for value in self.__columns), 1)
-        yield {**row, self.__result_column: result}
+        yield with_column(row, self.__result_column, result)
+
+    def map_one(self, row: TRow) -> TRow | None:
+        result = functools.reduce(lambda x, y: x * y, (row[value] for value in self.__columns), 1)
+        return set_column(row, self.__result_column, result)
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order_without(order, [self.__result_column])
+
+    def map_batch(self, batch: RecordBatch) -> tp.Iterator[RecordBatch]:
+        columns = batch.numeric(*self.__columns)
+        if columns is None or not int_product_fits(columns):
+            yield from super().map_batch(batch)
+            return
+        result = np.ones(len(batch), dtype=np.int64)  # 1 * ..., same as python reduce with initial 1
+        for column in columns:
+            result = result * column
+        yield batch.with_column(self.__result_column, result)
 
 
 class Filter(Mapper):
@@ -94,10 +179,18 @@ class Filter(Mapper):
         """
         self.__condition = condition
 
+    one_row = True
+
     def __call__(self, row: TRow) -> TRowsGenerator:
         if self.__condition(row):
             yield row
 
+    def map_one(self, row: TRow) -> TRow | None:
+        return row if self.__condition(row) else None
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order
+
 
 class Project(Mapper):
     """Leave only mentioned columns"""
@@ -108,5 +201,13 @@ class Project(Mapper):
         """
         self.__columns = columns
 
+    one_row = True
+
     def __call__(self, row: TRow) -> TRowsGenerator:
-        yield {key: row[key] for key in self.__columns}
+        yield select(row, self.__columns)
+
+    def map_one(self, row: TRow) -> TRow | None:
+        return select(row, self.__columns)
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order_within(order, self.__columns)
@@ -1,8 +1,12 @@
 # mapper_misc.py
 import math
+import sys
+import typing as tp
 from datetime import datetime
 
-from .base import Mapper, TRow, TRowsGenerator
+from .base import Mapper, TRow, TRowsGenerator, TOrder, order_without
+from .batch import RecordBatch, ints_exact_in_float, np
+from .record import with_column, with_columns, set_column, set_columns
 
 
 class CalculateIdf(Mapper):
@@ -19,9 +23,30 @@ class CalculateIdf(Mapper):
         self.__total_docs_column = total_docs_column
         self.__docs_with_word_column = docs_with_word_column
 
+    one_row = True
+    updates_row = True
+
     def __call__(self, row: TRow) -> TRowsGenerator:
         idf = math.log(row[self.__total_docs_column] / row[self.__docs_with_word_column])
-        yield {**row, self.__idf_column: idf}
+        yield with_column(row, self.__idf_column, idf)
+
+    def map_one(self, row: TRow) -> TRow | None:
+        idf = math.log(row[self.__total_docs_column] / row[self.__docs_with_word_column])
+        return set_column(row, self.__idf_column, idf)
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order_without(order, [self.__idf_column])
+
+    def map_batch(self, batch: RecordBatch) -> tp.Iterator[RecordBatch]:
+        columns = batch.numeric(self.__total_docs_column, self.__docs_with_word_column)
+        if columns is not None and ints_exact_in_float(columns):
+            total_docs, docs_with_word = columns
+            if docs_with_word.all():
+                ratio = total_docs / docs_with_word
+                if (ratio > 0).all():
+                    yield batch.with_column(self.__idf_column, np.log(ratio))
+                    return
+        yield from super().map_batch(batch)  # row by row, raises the same errors as row mode
 
 
 class CalculatePMI(Mapper):
@@ -41,10 +66,85 @@ class CalculatePMI(Mapper):
         self.__frequency_column = frequency_column
         self.__pmi_column = pmi_column
 
+    one_row = True
+    updates_row = True
+
     def __call__(self, row: TRow) -> TRowsGenerator:
-        pmi = math.log(
+        yield with_column(row, self.__pmi_column, self.__pmi(row))
+
+    def map_one(self, row: TRow) -> TRow | None:
+        return set_column(row, self.__pmi_column, self.__pmi(row))
+
+    def __pmi(self, row: TRow) -> float:
+        return math.log(
             row[self.__frequency_column] / (row[self.__docs_with_word_column] / row[self.__total_docs_column]))
-        yield {**row, self.__pmi_column: pmi}
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order_without(order, [self.__pmi_column])
+
+    def map_batch(self, batch: RecordBatch) -> tp.Iterator[RecordBatch]:
+        columns = batch.numeric(self.__frequency_column, self.__docs_with_word_column, self.__total_docs_column)
+        if columns is not None and ints_exact_in_float(columns):
+            frequency, words_in_doc, total_words = columns
+            if total_words.all():
+                share = words_in_doc / total_words
+                if share.all():
+                    ratio = frequency / share
+                    if (ratio > 0).all():
+                        yield batch.with_column(self.__pmi_column, np.log(ratio))
+                        return
+        yield from super().map_batch(batch)  # row by row, raises the same errors as row mode
+
+
+# datetime.fromisoformat parses basic format (20171020T112237.427000) since python 3.11
+BASIC_ISO_FORMAT_SUPPORTED = sys.version_info >= (3, 11)
+BASIC_ISO_LENGTH = len("20171020T112237.427000")
+BASIC_ISO_DIGITS = [*range(0, 8), *range(9, 15), *range(16, 22)]
+DAYS_IN_MONTH = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+
+def _parse_basic_iso(column: list[tp.Any]) -> tuple[tp.Any, tp.Any, tp.Any] | None:
+    """
+    Parse timestamps like 20171020T112237.427000 as datetime.fromisoformat does
+    :return: microseconds since epoch, days since epoch, hours; None if some timestamp is not in this exact format
+        or is invalid, fromisoformat then decides how to handle it
+    """
+    if not BASIC_ISO_FORMAT_SUPPORTED or set(map(type, column)) != {str} or set(map(len, column)) != {BASIC_ISO_LENGTH}:
+        return None
+    try:
+        data = "".join(column).encode("ascii")
+    except UnicodeEncodeError:
+        return None
+    chars = np.frombuffer(data, dtype=np.uint8).reshape(len(column), BASIC_ISO_LENGTH)
+    digits = chars.astype(np.int64) - ord("0")
+    if not ((chars[:, 8] == ord("T")) & (chars[:, 15] == ord("."))).all() \
+            or not ((digits[:, BASIC_ISO_DIGITS] >= 0) & (digits[:, BASIC_ISO_DIGITS] <= 9)).all():
+        return None
+
+    def number(start: int, stop: int) -> tp.Any:
+        result = np.zeros(len(column), dtype=np.int64)
+        for position in range(start, stop):
+            result = result * 10 + digits[:, position]
+        return result
+
+    year, month, day = number(0, 4), number(4, 6), number(6, 8)
+    hour, minute, second, microsecond = number(9, 11), number(11, 13), number(13, 15), number(16, 22)
+    if not ((year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)).all():
+        return None
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = np.array(DAYS_IN_MONTH)[month] + (leap & (month == 2))
+    if not ((day <= month_days) & (hour < 24) & (minute < 60) & (second < 60)).all():
+        return None
+
+    # days from civil date, proleptic gregorian calendar as in datetime
+    shifted_year = year - (month <= 2)
+    era = shifted_year // 400
+    year_of_era = shifted_year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+    microseconds = (((days * 24 + hour) * 60 + minute) * 60 + second) * 1_000_000 + microsecond
+    return microseconds, days, hour
 
 
 class CalculateTimeAndDistance(Mapper):
@@ -92,12 +192,25 @@ class CalculateTimeAndDistance(Mapper):
         distance = CalculateTimeAndDistance.EARTH_RADIUS_IN_KM * c
         return distance
 
+    one_row = True
+    updates_row = True
+
     def __call__(self, row: TRow) -> TRowsGenerator:
+        columns = self.__columns(row)
+        if columns is not None:
+            yield with_columns(row, columns)
+
+    def map_one(self, row: TRow) -> TRow | None:
+        columns = self.__columns(row)
+        return None if columns is None else set_columns(row, columns)
+
+    def __columns(self, row: TRow) -> TRow | None:
+        """Calculated columns of row, None if row is dropped as it leaves before it enters"""
         start_time = datetime.fromisoformat(row[self.__enter_time_column])
         end_time = datetime.fromisoformat(row[self.__leave_time_column])
 
         if end_time < start_time:
-            return
+            return None
 
         weekday_ = start_time.strftime("%A")[:3:]
         hour = start_time.hour
@@ -105,8 +218,66 @@ class CalculateTimeAndDistance(Mapper):
         end_lon, end_lat = row[self.__end_coords_column]
         distance = self.__haversine(start_lat, start_lon, end_lat, end_lon)
         time = (end_time - start_time).total_seconds() / self.SECONDS_IN_HOUR
-        yield {**row,
-               self.__result_length_column: distance,
-               self.__result_time_column: time,
-               "weekday": weekday_,
-               "hour": hour, }
+        return {self.__result_length_column: distance,
+                self.__result_time_column: time,
+                "weekday": weekday_,
+                "hour": hour, }
+
+    def map_batch(self, batch: RecordBatch) -> tp.Iterator[RecordBatch]:
+        """
+        Vectorized version giving bit-for-bit the same columns: timestamps of basic ISO format are parsed
+        with numpy, transcendental functions are taken from math module as numpy ones may differ in the last bit
+        """
+        enter = _parse_basic_iso(batch.column(self.__enter_time_column))
+        leave = _parse_basic_iso(batch.column(self.__leave_time_column))
+        start: tp.Any = None
+        end: tp.Any = None
+        try:
+            start = np.array(batch.column(self.__start_coords_column), dtype=np.float64)
+            end = np.array(batch.column(self.__end_coords_column), dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+        if enter is None or leave is None or start is None or end is None \
+                or start.shape != (len(batch), 2) or end.shape != (len(batch), 2):
+            yield from super().map_batch(batch)
+            return
+
+        (enter_microseconds, enter_days, enter_hour), (leave_microseconds, _, _) = enter, leave
+        kept = np.flatnonzero(leave_microseconds >= enter_microseconds)
+        if len(kept) != len(batch):
+            batch, start, end = batch.take(kept), start[kept], end[kept]
+            enter_microseconds, enter_days, enter_hour = \
+                enter_microseconds[kept], enter_days[kept], enter_hour[kept]
+            leave_microseconds = leave_microseconds[kept]
+        if not len(batch):
+            return
+
+        distance = self.EARTH_RADIUS_IN_KM * self.__haversine_batch(start[:, 1], start[:, 0], end[:, 1], end[:, 0])
+        time = (leave_microseconds - enter_microseconds) / 1_000_000 / self.SECONDS_IN_HOUR
+        # 2024-01-01 is monday, names are taken from strftime to follow its locale as row version does
+        names = [datetime(2024, 1, 1 + weekday).strftime("%A")[:3:] for weekday in range(7)]
+        weekday_ = [names[weekday] for weekday in ((enter_days + 3) % 7).tolist()]  # 1970-01-01 is thursday
+        yield batch.with_column(self.__result_length_column, distance) \
+            .with_column(self.__result_time_column, time) \
+            .with_column("weekday", weekday_) \
+            .with_column("hour", enter_hour)
+
+    @staticmethod
+    def __haversine_batch(lat1: tp.Any, lon1: tp.Any, lat2: tp.Any, lon2: tp.Any) -> tp.Any:
+        """Central angle between points, operations are done in the same order as in __haversine"""
+
+        def apply(function: tp.Callable[..., float], *columns: tp.Any) -> tp.Any:
+            return np.fromiter(map(function, *(column.tolist() for column in columns)), dtype=np.float64,
+                               count=len(columns[0]))
+
+        phi1 = np.radians(lat1)
+        phi2 = np.radians(lat2)
+        delta_phi = np.radians(lat2 - lat1)
+        delta_lambda = np.radians(lon2 - lon1)
+
+        a = np.float_power(apply(math.sin, delta_phi / 2), 2) \
+            + apply(math.cos, phi1) * apply(math.cos, phi2) * np.float_power(apply(math.sin, delta_lambda / 2), 2)
+        return 2 * apply(math.atan2, apply(math.sqrt, a), apply(math.sqrt, 1 - a))
+
+    def kept_order(self, order: TOrder) -> TOrder:
+        return order_without(order, [self.__result_length_column, self.__result_time_column, "weekday", "hour"])
@@ -1,11 +1,27 @@
 # operation_impl.py
 from __future__ import annotations
 
+import contextlib
+import heapq
+import io
 import itertools
+import json
+import locale
+import mmap
+import operator
+import os
 import typing as tp
 
-from .base import Operation, TRow, TRowsIterable, TRowsGenerator, Mapper, Reducer, Joiner
+from .base import Operation, TRow, TRowsIterable, TRowsGenerator, TOrder, Mapper, Reducer, Joiner
+from .record import writable
 from ..exception import CompgraphException
+from ..memory import MemoryGovernor, Reservation, RESERVE_PERIOD, row_size
+from ..spill import SpillFile
+
+try:
+    import orjson
+except ImportError:  # json module decodes lines then
+    orjson = None  # type: ignore[assignment]
 
 T = tp.TypeVar("T")
 V = tp.TypeVar("V", bound=tp.Any)
@@ -25,6 +41,132 @@ class Read(Operation):
             for line in f:
                 yield self.__parser(line)
 
+    def __repr__(self) -> str:
+        return f"Read({self.__filename!r})"
+
+
+class ReadJsonLines(Operation):
+    """
+    Read file of JSON lines in large binary blocks: lines are split in bytes and given to decoder without
+    decoding them to str first. orjson decodes lines if it is installed, json module otherwise.
+    Rows are the same as of Read(filename, json.loads): lines orjson rejects (NaN, Infinity, floats out of range)
+    and blocks with integers orjson would turn into floats (beyond 64 bits) are decoded by json module.
+    """
+
+    # every digit becomes "0", minus stays, other bytes become spaces; numbers are found in result with bytes.find
+    DIGITS = bytes(ord("0") if byte in b"0123456789" else byte if byte == ord("-") else ord(" ") for byte in range(256))
+
+    def __init__(self, filename: str, block_size: int = 1 << 16) -> None:
+        """
+        :param filename: file with one JSON value per line
+        :param block_size: number of bytes read at once
+        """
+        if block_size <= 0:
+            raise CompgraphException("block_size should be positive")
+        self.__filename = filename
+        self.__block_size = block_size
+
+    @staticmethod
+    def __loads(line: bytes) -> tp.Any:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            return json.loads(line)
+
+    @classmethod
+    def decode(cls, lines: bytes) -> tp.Iterator[tp.Any]:
+        """
+        Decode JSON lines
+        :param lines: complete lines, each of them ends with newline
+        """
+        if orjson is not None:
+            # orjson turns integers out of [-2 ** 63, 2 ** 64) into floats
+            digits = lines.translate(cls.DIGITS)
+            if b"0" * 20 not in digits and b"-" + b"0" * 19 not in digits:
+                return map(cls.__loads, lines.split(b"\n")[:-1])
+        return map(json.loads, lines.decode().split("\n")[:-1])
+
+    def __call__(self, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
+        pieces: list[bytes] = []  # blocks of the line not finished yet, joined once its newline is read
+        with open(self.__filename, "rb") as f:
+            while block := f.read(self.__block_size):
+                end = block.rfind(b"\n") + 1
+                if not end:
+                    pieces.append(block)
+                    continue
+                pieces.append(block[:end])
+                yield from self.decode(b"".join(pieces))
+                pieces = [block[end:]] if end < len(block) else []
+        if pieces:
+            yield from self.decode(b"".join(pieces) + b"\n")
+
+    def __repr__(self) -> str:
+        return f"ReadJsonLines({self.__filename!r})"
+
+
+class ReadMmap(Operation):
+    """
+    Read file through read-only memory map: file pages are not copied into read buffers, every read of the file
+    (several graphs, parallel workers) uses the same pages of OS page cache. File is scanned in blocks of whole
+    lines taken as memoryview slices, a block is copied only when it is decoded for parser.
+    Rows are the same as of Read(filename, parser) for files in ASCII-compatible encodings,
+    or as of ReadJsonLines(filename) if parser is None.
+    """
+
+    def __init__(self, filename: str, parser: tp.Callable[[str], TRow] | None = None,
+                 block_size: int = 1 << 16) -> None:
+        """
+        :param filename: filename to read from
+        :param parser: parser from string to Row as in Read; None for JSON lines decoded as in ReadJsonLines
+        :param block_size: approximate number of bytes decoded at once
+        """
+        if block_size <= 0:
+            raise CompgraphException("block_size should be positive")
+        self.__filename = filename
+        self.__parser = parser
+        self.__block_size = block_size
+
+    def __blocks(self, data: mmap.mmap) -> tp.Generator[memoryview, None, None]:
+        """Blocks of whole lines, the last one may have no newline at the end"""
+        size = len(data)
+        start = 0
+        with memoryview(data) as view:
+            while start < size:
+                end = data.rfind(b"\n", start, start + self.__block_size) + 1
+                if end <= start:  # line longer than block
+                    end = data.find(b"\n", start + self.__block_size) + 1 or size
+                with view[start:end] as block:
+                    yield block
+                start = end
+
+    def __parse(self, block: memoryview) -> tp.Iterator[tp.Any]:
+        if self.__parser is None:
+            data = bytes(block)
+            return ReadJsonLines.decode(data if data.endswith(b"\n") else data + b"\n")
+        # lines are decoded and split as in file opened in text mode
+        text = str(block, locale.getpreferredencoding(False))
+        if "\r" in text:
+            return map(self.__parser, io.StringIO(text, newline=None))
+        lines = text.split("\n")
+        last = lines.pop()
+        with_newlines = map(operator.add, lines, itertools.repeat("\n"))
+        return map(self.__parser, itertools.chain(with_newlines, [last]) if last else with_newlines)
+
+    def __call__(self, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
+        with open(self.__filename, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:  # empty file can not be mapped
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if hasattr(data, "madvise"):
+                    data.madvise(mmap.MADV_SEQUENTIAL)
+                # views of the map are released before it is closed, also when reading stops early
+                with contextlib.closing(self.__blocks(data)) as blocks:
+                    for block in blocks:
+                        yield from self.__parse(block)
+
+    def __repr__(self) -> str:
+        return f"ReadMmap({self.__filename!r})"
+
 
 class ReadIterFactory(Operation):
     """
@@ -38,6 +180,9 @@ class ReadIterFactory(Operation):
         for row in kwargs[self.__name]():
             yield row
 
+    def __repr__(self) -> str:
+        return f"ReadIterFactory({self.__name!r})"
+
 
 class Map(Operation):
     """
@@ -51,6 +196,80 @@ class Map(Operation):
         for row in rows:
             yield from self.__mapper(row)
 
+    @property
+    def mapper(self) -> Mapper:
+        return self.__mapper
+
+    def output_order(self, *input_orders: TOrder) -> TOrder:
+        return self.__mapper.kept_order(input_orders[0])
+
+    def __repr__(self) -> str:
+        return f"Map({type(self.__mapper).__name__})"
+
+
+class FusedMap(Operation):
+    """
+    Apply several mappers one after another in one pass, same as a chain of Map operations.
+    Consecutive mappers giving one row per row (Mapper.one_row) run as plain calls of map_one in one loop per row,
+    unless a subclass overrides __call__ but not map_one: such mapper runs through __call__ as mappers giving many rows.
+    with no generator per mapper; mappers updating rows change one copy of input row instead of copying it each.
+    Mappers giving many rows (e.g. Split) are chained with itertools at C level.
+    """
+
+    def __init__(self, mappers: tp.Sequence[Mapper]) -> None:
+        """
+        :param mappers: mappers in order of application
+        """
+        self.mappers = list(mappers)
+
+    def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
+        stream: tp.Iterator[TRow] = iter(rows)
+        one_row: list[Mapper] = []
+        for mapper in self.mappers:
+            if self.__maps_one(mapper):
+                one_row.append(mapper)
+                continue
+            if one_row:
+                stream = self.__map_one(stream, one_row)
+                one_row = []
+            stream = itertools.chain.from_iterable(map(mapper, stream))
+        if one_row:
+            stream = self.__map_one(stream, one_row)
+        yield from stream
+
+    @staticmethod
+    def __maps_one(mapper: Mapper) -> bool:
+        """Whether map_one of mapper maps rows as its __call__ does: it is defined with or after __call__"""
+        if not mapper.one_row:
+            return False
+        def owner(name: str) -> type:
+            return next(cls for cls in type(mapper).__mro__ if name in vars(cls))
+
+        return issubclass(owner("map_one"), owner("__call__"))
+
+    @staticmethod
+    def __map_one(rows: tp.Iterator[TRow], mappers: list[Mapper]) -> TRowsGenerator:
+        steps = [mapper.map_one for mapper in mappers]
+        updates = any(mapper.updates_row for mapper in mappers)
+        for row in rows:
+            mapped = writable(row) if updates else row
+            for step in steps:
+                result = step(mapped)
+                if result is None:
+                    break
+                mapped = result
+            else:
+                yield mapped
+
+    def output_order(self, *input_orders: TOrder) -> TOrder:
+        order = input_orders[0]
+        for mapper in self.mappers:
+            order = mapper.kept_order(order)
+        return order
+
+    def __repr__(self) -> str:
+        return f"FusedMap({', '.join(type(mapper).__name__ for mapper in self.mappers)})"
+
 
 class SafeGroupBy(tp.Iterator[tuple[V | None, TRowsIterable]]):
 
@@ -80,6 +299,14 @@ class Reduce(Operation):
         self.__reducer = reducer
         self.__keys = keys
 
+    @property
+    def reducer(self) -> Reducer:
+        return self.__reducer
+
+    @property
+    def keys(self) -> tp.Sequence[str]:
+        return self.__keys
+
     def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
         data_group: SafeGroupBy[tuple[str, ...]] = SafeGroupBy(rows, lambda row: tuple(row[k] for k in self.__keys))
         for key, group in data_group:
@@ -87,10 +314,202 @@ class Reduce(Operation):
                 break
             yield from self.__reducer(tuple(self.__keys), group)
 
+    def output_order(self, *input_orders: TOrder) -> TOrder:
+        return self.__reducer.kept_order(tuple(self.__keys), input_orders[0])
+
+    def __repr__(self) -> str:
+        return f"Reduce({type(self.__reducer).__name__}, keys={list(self.__keys)})"
+
+
+class HashReduce(Operation):
+    """
+    Apply reducer to each group of rows without sorting them: rows are grouped in hash table,
+    groups are reduced in key order at the end. Output is the same as of sort + Reduce.
+    Rows of reducers which can be combined are folded into one partial aggregate per combine key as they come,
+    so table holds about one row per group; other reducers keep all rows of group.
+    If table has more than max_rows_in_memory rows or memory governor of run asks for memory while table is built,
+    table and the rest of input are hash-partitioned to disk, partitions are reduced one by one and their outputs
+    are merged in key order.
+    """
+
+    def __init__(self, reducer: Reducer, keys: tp.Sequence[str], max_rows_in_memory: int = 500_000,
+                 partitions: int = 16) -> None:
+        """
+        :param reducer: reducer to use
+        :param keys: keys for grouping
+        :param max_rows_in_memory: maximum size of hash table in rows
+        :param partitions: number of partitions to spill rows to if they do not fit in memory
+        """
+        self.__reducer = reducer
+        self.__keys = tuple(keys)
+        self.__max_rows_in_memory = max_rows_in_memory
+        self.__partitions = partitions
+
+    @property
+    def reducer(self) -> Reducer:
+        return self.__reducer
+
+    @property
+    def keys(self) -> tuple[str, ...]:
+        return self.__keys
+
+    def __make_keys(self, row: TRow) -> tuple[tp.Any, ...]:
+        return tuple(row[k] for k in self.__keys)
+
+    def __reduce_table(self, table: dict[tuple[tp.Any, ...], list[TRow]]) \
+            -> tp.Generator[tuple[tuple[tp.Any, ...], TRow], None, None]:
+        merger = self.__reducer.merger()
+        for key in sorted(table):
+            for result in merger(self.__keys, table[key]):
+                yield key, result
+
+    def __reduce_partitioned(self, rows: tp.Iterator[TRow], table: dict[tuple[tp.Any, ...], list[TRow]]) \
+            -> TRowsGenerator:
+        partitions = [SpillFile() for _ in range(self.__partitions)]
+        outputs = [SpillFile() for _ in range(self.__partitions)]
+        try:
+            for row in itertools.chain.from_iterable(table.values()):
+                partitions[hash(self.__make_keys(row)) % self.__partitions].write(row)
+            table.clear()
+            for row in rows:
+                partitions[hash(self.__make_keys(row)) % self.__partitions].write(row)
+            for partition, output in zip(partitions, outputs):
+                part_table: dict[tuple[tp.Any, ...], list[TRow]] = {}
+                for row in partition.read():
+                    part_table.setdefault(self.__make_keys(row), []).append(row)
+                partition.remove()
+                for key, result in self.__reduce_table(part_table):
+                    output.write({"key": key, "row": result})
+            for item in heapq.merge(*(output.read() for output in outputs), key=operator.itemgetter("key")):
+                yield item["row"]
+        finally:
+            for spill_file in itertools.chain(partitions, outputs):
+                spill_file.remove()
+
+    def __one_row_partials(self, rows: tp.Iterator[TRow]) -> TRowsGenerator:
+        for row in rows:
+            partial = self.__reducer.combine(self.__keys, None, row)
+            if partial is None:
+                yield row
+                yield from rows
+                return
+            yield partial
+
+    def __call__(self, rows: TRowsIterable, *args: tp.Any, governor: MemoryGovernor | None = None,
+                 **kwargs: tp.Any) -> TRowsGenerator:
+        """
+        :param rows: rows to reduce
+        :param governor: memory governor of run to reserve memory of hash table in
+        """
+        reservation = None if governor is None else Reservation(governor)
+        try:
+            yield from self.__reduce(rows, reservation)
+        finally:
+            if reservation is not None:
+                reservation.release()
+
+    def __reduce(self, rows: TRowsIterable, reservation: Reservation | None) -> TRowsGenerator:
+        combining = type(self.__reducer).combine is not Reducer.combine
+        combine_key = self.__reducer.combine_key(self.__keys)
+        table: dict[tuple[tp.Any, ...], list[TRow]] = {}
+        partials: dict[tuple[tp.Any, ...], int] = {}  # combine key -> index of partial aggregate in its group
+        size = 0
+        rows = iter(rows)
+        for row in rows:
+            group = table.setdefault(self.__make_keys(row), [])
+            if combining:
+                key = tuple(row[k] for k in combine_key)
+                index = partials.get(key)
+                partial = self.__reducer.combine(self.__keys, None if index is None else group[index], row)
+                if partial is not None:
+                    if index is not None:
+                        group[index] = partial
+                        continue
+                    partials[key] = len(group)
+                    row = partial
+                else:  # rows from here on are given to merger as they are
+                    combining = False
+                    partials.clear()
+            group.append(row)
+            size += 1
+            if reservation is not None and size % RESERVE_PERIOD == 0:
+                reservation.reserve(RESERVE_PERIOD * row_size(row))
+            if size > self.__max_rows_in_memory or reservation is not None and reservation.spill_requested:
+                if reservation is not None:  # table is written to partitions before the rest of input is read
+                    reservation.release()
+                # partial aggregates go to partitions before the rest of rows, merger gets them in order
+                yield from self.__reduce_partitioned(self.__one_row_partials(rows) if combining else rows, table)
+                return
+        for _, result in self.__reduce_table(table):
+            yield result
+
+    def output_order(self, *input_orders: TOrder) -> TOrder:
+        return self.__reducer.kept_order(self.__keys, self.__keys)
+
+    def __repr__(self) -> str:
+        return f"HashReduce({type(self.__reducer).__name__}, keys={list(self.__keys)})"
+
+
+class Combine(Operation):
+    """
+    Fold rows into partial aggregates of reducer before they are sorted for reduce, so the sort gets
+    about one row per distinct key instead of every row; Reduce with reducer.merger() finishes aggregation.
+    Partial aggregates are kept in hash table of at most max_groups keys and yielded at the end. When the table
+    is full, rows of keys not in it pass as partial aggregates of one row, so merger folds partial aggregates of
+    a group in the order of its rows and gets exactly the result of plain reduce (float sums too).
+    If combine key is wider than keys (TermFrequency), order of partial aggregates inside group matters,
+    so full table is yielded and cleared instead.
+    Once reducer can not combine a row, table is flushed and the rest of rows pass as they are.
+    """
+
+    def __init__(self, reducer: Reducer, keys: tp.Sequence[str], max_groups: int = 100_000) -> None:
+        """
+        :param reducer: reducer to combine rows for
+        :param keys: keys for grouping of the reduce
+        :param max_groups: maximum size of hash table in partial aggregates
+        """
+        if max_groups <= 0:
+            raise CompgraphException("max_groups should be positive")
+        self.__reducer = reducer
+        self.__keys = tuple(keys)
+        self.__max_groups = max_groups
+
+    @property
+    def reducer(self) -> Reducer:
+        return self.__reducer
+
+    def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
+        combine_key = self.__reducer.combine_key(self.__keys)
+        table: dict[tuple[tp.Any, ...], TRow] = {}
+        rows = iter(rows)
+        for row in rows:
+            key = tuple(row[k] for k in combine_key)
+            partial = table.get(key)
+            table_is_full = partial is None and len(table) >= self.__max_groups
+            if table_is_full and combine_key != self.__keys:
+                yield from table.values()
+                table.clear()
+                table_is_full = False
+            partial = self.__reducer.combine(self.__keys, partial, row)
+            if partial is None:
+                yield from table.values()
+                yield row
+                yield from rows
+                return
+            if table_is_full:
+                yield partial
+            else:
+                table[key] = partial
+        yield from table.values()
+
+    def __repr__(self) -> str:
+        return f"Combine({type(self.__reducer).__name__}, keys={list(self.__keys)})"
+
 
 class Join(Operation):
     """
-    Join two datasets
+    Join two datasets sorted by keys group by group.
+    Group joiner keeps in memory is spilled to disk when memory governor of run asks for memory.
     """
 
     def __init__(self, joiner: Joiner, keys: tp.Sequence[str]):
@@ -100,19 +519,33 @@ class Join(Operation):
     def __make_keys(self, row: TRow) -> tuple[tp.Any, ...]:
         return tuple(row[k] for k in self.__keys)
 
+    def output_order(self, *input_orders: TOrder) -> TOrder:
+        return tuple(self.__keys)
+
+    def __repr__(self) -> str:
+        return f"Join({type(self.__joiner).__name__}, keys={list(self.__keys)})"
+
     def __find_common_keys(self, group_left: TRowsIterable, group_right: TRowsIterable) -> \
             tuple[TRowsIterable, TRowsIterable]:
-        group_left, group_left_copy = itertools.tee(group_left)
-        group_right, group_right_copy = itertools.tee(group_right)
-        common_keys: set[str] = dict(next(group_left_copy)).keys() & dict(next(group_right_copy)).keys() - set(
+        """Give joiner columns both inputs have besides keys, taken from first rows, which are put back to groups"""
+        rows_left, rows_right = iter(group_left), iter(group_right)
+        first_left, first_right = next(rows_left, None), next(rows_right, None)
+        self.__joiner._keys_that_were_before = dict(first_left or {}).keys() & dict(first_right or {}).keys() - set(
             self.__keys)
-        self.__joiner._keys_that_were_before = common_keys
-        return group_left, group_right
+        return (rows_left if first_left is None else itertools.chain([first_left], rows_left),
+                rows_right if first_right is None else itertools.chain([first_right], rows_right))
 
-    def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
+    def __call__(self, rows: TRowsIterable, *args: tp.Any, governor: MemoryGovernor | None = None,
+                 **kwargs: tp.Any) -> TRowsGenerator:
+        """
+        :param rows: left rows sorted by keys
+        :param args: right rows sorted by keys
+        :param governor: memory governor of run, groups joiner keeps in memory are spilled when it asks for memory
+        """
         if not args or not isinstance(args[0], tp.Iterable):
             raise CompgraphException("Second argument should be iterable and not empty")
 
+        self.__joiner._governor = governor
         data_group_left: SafeGroupBy[tuple[str, ...]] = SafeGroupBy(rows, self.__make_keys)
         data_group_right: SafeGroupBy[tuple[str, ...]] = SafeGroupBy(args[0], self.__make_keys)
         key_left, group_left = next(data_group_left)
@@ -135,3 +568,169 @@ class Join(Operation):
         while key_right is not None:
             yield from self.__joiner(self.__keys, [], group_right)
             key_right, group_right = next(data_group_right)
+
+
+class HashJoin(Operation):
+    """
+    Join two datasets without sorting them: the smaller dataset is built into hash table, the other one is streamed
+    through it. Both inputs are read in turns until one of them ends, it is the build side; the right one is built
+    when both end in the same turn. Output keeps order of rows of the streamed side, rows of the built side without
+    match (for joiners keeping them) go last.
+    If both datasets have more than max_rows_in_memory rows or memory governor of run asks for memory while they are
+    buffered, both are hash-partitioned to disk and joined partition by partition, building the smaller side of each.
+    """
+
+    def __init__(self, joiner: Joiner, keys: tp.Sequence[str], max_rows_in_memory: int = 500_000,
+                 partitions: int = 16) -> None:
+        """
+        :param joiner: join strategy to use
+        :param keys: keys for joining
+        :param max_rows_in_memory: maximum size of hash table in rows
+        :param partitions: number of partitions to spill datasets to if neither of them fits in memory
+        """
+        self.__joiner = joiner
+        self.__keys = keys
+        self.__max_rows_in_memory = max_rows_in_memory
+        self.__partitions = partitions
+
+    def __make_keys(self, row: TRow) -> tuple[tp.Any, ...]:
+        return tuple(row[k] for k in self.__keys)
+
+    def __repr__(self) -> str:
+        return f"HashJoin({type(self.__joiner).__name__}, keys={list(self.__keys)})"
+
+    def __build(self, rows: TRowsIterable) -> dict[tuple[tp.Any, ...], list[TRow]]:
+        table: dict[tuple[tp.Any, ...], list[TRow]] = {}
+        for row in rows:
+            table.setdefault(self.__make_keys(row), []).append(row)
+        return table
+
+    def __join_with_table(self, rows: TRowsIterable, table: dict[tuple[tp.Any, ...], list[TRow]],
+                          build_left: bool) -> TRowsGenerator:
+        matched: set[tuple[tp.Any, ...]] = set()
+        for row in rows:
+            key = self.__make_keys(row)
+            group = table.get(key)
+            if group is None:
+                group = []
+            else:
+                matched.add(key)
+            if build_left:
+                yield from self.__joiner(self.__keys, group, [row])
+            else:
+                yield from self.__joiner(self.__keys, [row], group)
+        for key, group in table.items():
+            if key not in matched:
+                if build_left:
+                    yield from self.__joiner(self.__keys, group, [])
+                else:
+                    yield from self.__joiner(self.__keys, [], group)
+
+    def __join_partitioned(self, rows_left: TRowsIterable, rows_right: TRowsIterable) -> TRowsGenerator:
+        right = [SpillFile() for _ in range(self.__partitions)]
+        left = [SpillFile() for _ in range(self.__partitions)]
+        try:
+            for row in rows_right:
+                right[hash(self.__make_keys(row)) % self.__partitions].write(row)
+            for row in rows_left:
+                left[hash(self.__make_keys(row)) % self.__partitions].write(row)
+            for left_part, right_part in zip(left, right):
+                left_part.close()
+                right_part.close()
+                if left_part.rows < right_part.rows:
+                    yield from self.__join_with_table(right_part.read(), self.__build(left_part.read()), True)
+                else:
+                    yield from self.__join_with_table(left_part.read(), self.__build(right_part.read()), False)
+        finally:
+            for spill_file in itertools.chain(left, right):
+                spill_file.remove()
+
+    @staticmethod
+    def __buffer(rows: tp.Iterator[TRow], buffer: list[TRow], reservation: Reservation | None) -> bool:
+        """Move next RESERVE_PERIOD rows to buffer, False if rows have ended"""
+        chunk = list(itertools.islice(rows, RESERVE_PERIOD))
+        buffer += chunk
+        if reservation is not None and chunk:
+            reservation.reserve(len(chunk) * row_size(chunk[-1]))
+        return len(chunk) == RESERVE_PERIOD
+
+    def __call__(self, rows: TRowsIterable, *args: tp.Any, governor: MemoryGovernor | None = None,
+                 **kwargs: tp.Any) -> TRowsGenerator:
+        """
+        :param rows: left rows
+        :param args: right rows
+        :param governor: memory governor of run to reserve memory of buffered rows and hash table in
+        """
+        if not args or not isinstance(args[0], tp.Iterable):
+            raise CompgraphException("Second argument should be iterable and not empty")
+
+        reservation = None if governor is None else Reservation(governor)
+        try:
+            yield from self.__join(iter(rows), iter(args[0]), reservation)
+        finally:
+            if reservation is not None:
+                reservation.release()
+
+    def __join(self, rows_left: tp.Iterator[TRow], rows_right: tp.Iterator[TRow],
+               reservation: Reservation | None) -> TRowsGenerator:
+        left: list[TRow] = []
+        right: list[TRow] = []
+        left_open = right_open = True
+        while right_open and left_open:
+            if len(right) <= self.__max_rows_in_memory:
+                right_open = self.__buffer(rows_right, right, reservation)
+            if len(left) <= self.__max_rows_in_memory:
+                left_open = self.__buffer(rows_left, left, reservation)
+            if min(len(left), len(right)) > self.__max_rows_in_memory or \
+                    reservation is not None and reservation.spill_requested:
+                break
+
+        first_left: TRow = left[0] if left else {}
+        first_right: TRow = right[0] if right else {}
+        self.__joiner._keys_that_were_before = (first_left.keys() & first_right.keys()) - set(self.__keys)
+
+        spill = reservation is not None and reservation.spill_requested
+        if not right_open and not spill:
+            yield from self.__join_with_table(itertools.chain(left, rows_left), self.__build(right), False)
+        elif not left_open and not spill:
+            yield from self.__join_with_table(itertools.chain(right, rows_right), self.__build(left), True)
+        else:
+            if reservation is not None:  # buffers are written to partitions before the rest of input is read
+                reservation.release()
+            yield from self.__join_partitioned(itertools.chain(left, rows_left), itertools.chain(right, rows_right))
+
+
+class BroadcastJoin(Operation):
+    """
+    Join every row of a dataset with the whole small dataset (join without keys).
+    Right dataset is materialized once and attached to left rows in one streaming pass, without grouping.
+    """
+
+    def __init__(self, joiner: Joiner, max_rows_in_memory: int = 10_000) -> None:
+        """
+        :param joiner: join strategy to use
+        :param max_rows_in_memory: maximum size of right dataset in rows
+        """
+        self.__joiner = joiner
+        self.__max_rows_in_memory = max_rows_in_memory
+
+    def __repr__(self) -> str:
+        return f"BroadcastJoin({type(self.__joiner).__name__})"
+
+    def __call__(self, rows: TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> TRowsGenerator:
+        if not args or not isinstance(args[0], tp.Iterable):
+            raise CompgraphException("Second argument should be iterable and not empty")
+
+        rows_right = list(itertools.islice(args[0], self.__max_rows_in_memory + 1))
+        if len(rows_right) > self.__max_rows_in_memory:
+            raise CompgraphException(f"Broadcast join needs at most {self.__max_rows_in_memory} rows on the right side")
+
+        rows_left = iter(rows)
+        first_left = next(rows_left, None)
+        if first_left is None:
+            yield from self.__joiner([], [], rows_right)
+            return
+        first_right: TRow = rows_right[0] if rows_right else {}
+        self.__joiner._keys_that_were_before = first_left.keys() & first_right.keys()
+        for row in itertools.chain([first_left], rows_left):
+            yield from self.__joiner([], [row], rows_right)
@@ -0,0 +1,178 @@
+# record.py
+from __future__ import annotations
+
+import typing as tp
+
+from collections.abc import Mapping
+
+TRow = dict[str, tp.Any]
+
+
+class Schema:
+    """
+    Ordered column names shared by records, with column name -> position index.
+    Schemas are interned: one object per tuple of columns, so records of the same columns share it
+    and it is pickled once per pickled batch of records
+    """
+
+    __slots__ = ("columns", "index", "__extended")
+    __interned: tp.ClassVar[dict[tuple[str, ...], Schema]] = {}
+
+    def __init__(self, columns: tuple[str, ...]) -> None:
+        """
+        :param columns: column names in order, use Schema.of to get the shared object
+        """
+        self.columns = columns
+        self.index = {column: position for position, column in enumerate(columns)}
+        self.__extended: dict[str, Schema] = {}
+
+    @classmethod
+    def of(cls, columns: tuple[str, ...]) -> Schema:
+        schema = cls.__interned.get(columns)
+        if schema is None:
+            schema = cls.__interned[columns] = cls(columns)
+        return schema
+
+    def extended(self, column: str) -> Schema:
+        """Schema with column appended, as {**row, column: value} appends new key"""
+        schema = self.__extended.get(column)
+        if schema is None:
+            schema = self.__extended[column] = Schema.of((*self.columns, column))
+        return schema
+
+    def __reduce__(self) -> tuple[tp.Any, ...]:
+        return Schema.of, (self.columns,)
+
+    def __repr__(self) -> str:
+        return f"Schema({list(self.columns)})"
+
+
+class Record(Mapping[str, tp.Any]):
+    """
+    Compact read-only row: tuple of values and shared schema instead of dict keeping its own keys.
+    Reads like dict row (row[column], keys, items, {**row}, equality with dicts), copy gives dict which may be
+    changed. Mappers set columns with with_column / with_columns and so keep records as records, operations
+    building new rows from scratch (reducers, joiners) give dict rows, both kinds of rows can be mixed
+    """
+
+    __slots__ = ("__schema", "__values")
+
+    def __init__(self, schema: Schema, values: tuple[tp.Any, ...]) -> None:
+        """
+        :param schema: columns of record
+        :param values: values in order of schema columns
+        """
+        self.__schema = schema
+        self.__values = values
+
+    @staticmethod
+    def from_row(row: tp.Mapping[str, tp.Any]) -> Record:
+        return Record(Schema.of(tuple(row)), tuple(row.values()))
+
+    @property
+    def schema(self) -> Schema:
+        return self.__schema
+
+    def __getitem__(self, column: str) -> tp.Any:
+        return self.__values[self.__schema.index[column]]
+
+    def get(self, column: str, default: tp.Any = None) -> tp.Any:
+        position = self.__schema.index.get(column)
+        return default if position is None else self.__values[position]
+
+    def __contains__(self, column: object) -> bool:
+        return column in self.__schema.index
+
+    def __iter__(self) -> tp.Iterator[str]:
+        return iter(self.__schema.columns)
+
+    def __len__(self) -> int:
+        return len(self.__values)
+
+    def copy(self) -> TRow:
+        return dict(zip(self.__schema.columns, self.__values))
+
+    def with_column(self, column: str, value: tp.Any) -> Record:
+        """Record with column replaced or appended, like {**row, column: value}"""
+        position = self.__schema.index.get(column)
+        if position is None:
+            return Record(self.__schema.extended(column), (*self.__values, value))
+        values = list(self.__values)
+        values[position] = value
+        return Record(self.__schema, tuple(values))
+
+    def select(self, columns: tp.Sequence[str]) -> Record:
+        """Record of given columns only, like {column: row[column] for column in columns}"""
+        index = self.__schema.index
+        return Record(Schema.of(tuple(columns)), tuple(self.__values[index[column]] for column in columns))
+
+    def __reduce__(self) -> tuple[tp.Any, ...]:
+        return Record, (self.__schema, self.__values)
+
+    def __repr__(self) -> str:
+        return f"Record({self.copy()!r})"
+
+
+def with_column(row: TRow, column: str, value: tp.Any) -> TRow:
+    """Row with column replaced or appended, {**row, column: value} for dict, record stays record"""
+    if type(row) is Record:
+        return row.with_column(column, value)
+    return {**row, column: value}
+
+
+def with_columns(row: TRow, columns: TRow) -> TRow:
+    """Row with columns replaced or appended, {**row, **columns} for dict, record stays record"""
+    if type(row) is Record:
+        for column, value in columns.items():
+            row = row.with_column(column, value)
+        return row
+    return {**row, **columns}
+
+
+def writable(row: TRow) -> TRow:
+    """Copy of dict row which may be changed in place by set_column, record stays record as it is read-only"""
+    if type(row) is Record:
+        return row
+    return row.copy()
+
+
+def set_column(row: TRow, column: str, value: tp.Any) -> TRow:
+    """Row with column replaced or appended: dict is changed in place, record is replaced by a new one"""
+    if type(row) is Record:
+        return row.with_column(column, value)
+    row[column] = value
+    return row
+
+
+def set_columns(row: TRow, columns: TRow) -> TRow:
+    """Row with columns replaced or appended: dict is changed in place, record is replaced by a new one"""
+    if type(row) is Record:
+        return with_columns(row, columns)
+    row.update(columns)
+    return row
+
+
+def select(row: TRow, columns: tp.Sequence[str]) -> TRow:
+    """Row of given columns only, record stays record"""
+    if type(row) is Record:
+        return row.select(columns)
+    return {column: row[column] for column in columns}
+
+
+def to_records(rows: tp.Iterable[TRow]) -> tp.Generator[TRow, None, None]:
+    """Turn rows into records, rows with the same columns in the same order share schema"""
+    schema = Schema.of(())
+    for row in rows:
+        if type(row) is Record:
+            yield row
+            continue
+        columns = tuple(row)
+        if columns != schema.columns:
+            schema = Schema.of(columns)
+        yield tp.cast(TRow, Record(schema, tuple(row.values())))
+
+
+def to_dicts(rows: tp.Iterable[TRow]) -> tp.Generator[TRow, None, None]:
+    """Turn records back into dict rows, other rows are passed as they are"""
+    for row in rows:
+        yield row.copy() if type(row) is Record else row
@@ -1,8 +1,10 @@
 # reducers.py
 import collections
 import heapq
+import typing as tp
 
-from .base import Reducer, TRow, TRowsIterable, TRowsGenerator
+from .base import Reducer, TRow, TRowsIterable, TRowsGenerator, TOrder, order_within
+from .batch import RecordBatch, INT64_SAFE_LIMIT, np
 
 
 class FirstReducer(Reducer):
@@ -13,6 +15,9 @@ class FirstReducer(Reducer):
             yield row
             break
 
+    def kept_order(self, group_key: tuple[str, ...], order: TOrder) -> TOrder:
+        return order_within(order, group_key)
+
 
 class TopN(Reducer):
     """Calculate top N by value"""
@@ -46,6 +51,9 @@ class TopN(Reducer):
             for _, _, row in heapq.nsmallest(self.__n, __heap):
                 yield row
 
+    def kept_order(self, group_key: tuple[str, ...], order: TOrder) -> TOrder:
+        return order_within(order, group_key)
+
 
 class TermFrequency(Reducer):
     """Calculate frequency of values in column"""
@@ -72,6 +80,42 @@ class TermFrequency(Reducer):
             yield {**important_columns, self.__words_column: word,
                    self.__result_column: result}
 
+    def kept_order(self, group_key: tuple[str, ...], order: TOrder) -> TOrder:
+        return order_within(order, set(group_key) - {self.__words_column, self.__result_column})
+
+    def combine(self, group_key: tuple[str, ...], partial: TRow | None, row: TRow) -> TRow | None:
+        if partial is None:
+            return {**{key: row[key] for key in group_key}, self.__words_column: row[self.__words_column],
+                    self.__result_column: 1}
+        partial[self.__result_column] += 1
+        return partial
+
+    def combine_key(self, group_key: tuple[str, ...]) -> tuple[str, ...]:
+        return (*group_key, self.__words_column)
+
+    def merger(self) -> Reducer:
+        return _MergeWordCounts(self.__words_column, self.__result_column)
+
+
+class _MergeWordCounts(Reducer):
+    """Merger of TermFrequency: partial aggregates keep number of occurrences of word in result column"""
+
+    def __init__(self, words_column: str, result_column: str) -> None:
+        self.__words_column = words_column
+        self.__result_column = result_column
+
+    def __call__(self, group_key: tuple[str, ...], rows: TRowsIterable) -> TRowsGenerator:
+        counter: dict[str, int] = collections.defaultdict(int)
+        total = 0
+        row: TRow = {}
+        for row in rows:
+            counter[row[self.__words_column]] += row[self.__result_column]
+            total += row[self.__result_column]
+
+        important_columns = {key: row[key] for key in group_key}
+        for word, count in counter.items():
+            yield {**important_columns, self.__words_column: word, self.__result_column: count / total}
+
 
 class Count(Reducer):
     """
@@ -98,6 +142,51 @@ class Count(Reducer):
         for word, count in counter.items():
             yield {self.__column: count, group_key[0]: word, **group_keys}
 
+    def kept_order(self, group_key: tuple[str, ...], order: TOrder) -> TOrder:
+        return order_within(order, set(group_key) - {self.__column})
+
+    def combine(self, group_key: tuple[str, ...], partial: TRow | None, row: TRow) -> TRow | None:
+        if partial is None:
+            return {self.__column: 1, **{key: row[key] for key in group_key}}
+        partial[self.__column] += 1
+        return partial
+
+    def merger(self) -> Reducer:
+        return _MergeCounts(self.__column)
+
+    def reduce_batch(self, group_key: tuple[str, ...], batch: RecordBatch) -> tp.Iterator[RecordBatch]:
+        starts = batch.group_starts(group_key)
+        counts = np.diff(starts, append=len(batch))
+        keys = batch.take(starts)
+        columns = {self.__column: counts, group_key[0]: keys.column(group_key[0])}
+        yield RecordBatch({**columns, **{key: keys.column(key) for key in group_key[1:]}}, len(starts))
+
+
+class _MergeCounts(Reducer):
+    """Merger of Count: partial aggregates keep number of rows in result column"""
+
+    def __init__(self, column: str) -> None:
+        self.__column = column
+
+    def __call__(self, group_key: tuple[str, ...], rows: TRowsIterable) -> TRowsGenerator:
+        counter: dict[str, int] = collections.defaultdict(int)
+        row: TRow = {}
+        for row in rows:
+            counter[row[group_key[0]]] += row[self.__column]
+        group_keys = {key: row[key] for key in group_key[1::]}
+        for word, count in counter.items():
+            yield {self.__column: count, group_key[0]: word, **group_keys}
+
+    def reduce_batch(self, group_key: tuple[str, ...], batch: RecordBatch) -> tp.Iterator[RecordBatch]:
+        columns = batch.numeric(self.__column)
+        if columns is None or columns[0].dtype.kind != "i":
+            yield from super().reduce_batch(group_key, batch)
+            return
+        starts = batch.group_starts(group_key)
+        keys = batch.take(starts)
+        result = {self.__column: np.add.reduceat(columns[0], starts), group_key[0]: keys.column(group_key[0])}
+        yield RecordBatch({**result, **{key: keys.column(key) for key in group_key[1:]}}, len(starts))
+
 
 class Sum(Reducer):
     """
@@ -125,3 +214,23 @@ class Sum(Reducer):
             yield {**{group_key: row[group_key] for group_key in group_keys}, self.__column: result}
         else:
             yield {self.__column: result}
+
+    def kept_order(self, group_key: tuple[str, ...], order: TOrder) -> TOrder:
+        return order_within(order, set(group_key) - {self.__column})
+
+    def combine(self, group_key: tuple[str, ...], partial: TRow | None, row: TRow) -> TRow | None:
+        if partial is None:
+            return {**{key: row[key] for key in group_key}, self.__column: row[self.__column]}
+        partial[self.__column] += row[self.__column]
+        return partial
+
+    def reduce_batch(self, group_key: tuple[str, ...], batch: RecordBatch) -> tp.Iterator[RecordBatch]:
+        columns = batch.numeric(self.__column)
+        # float sums are left to python: numpy adds floats in different order, results may differ in last bits
+        if not group_key or columns is None or columns[0].dtype.kind != "i" \
+                or np.abs(columns[0]).astype(np.float64).sum() >= INT64_SAFE_LIMIT:
+            yield from super().reduce_batch(group_key, batch)
+            return
+        starts = batch.group_starts(group_key)
+        sums = np.add.reduceat(columns[0], starts)
+        yield batch.take(starts).select(group_key).with_column(self.__column, sums)
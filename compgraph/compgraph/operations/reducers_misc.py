@@ -1,4 +1,4 @@
-from .base import TRowsGenerator, TRowsIterable, Reducer
+from .base import TRow, TRowsGenerator, TRowsIterable, Reducer, TOrder, order_within
 
 
 class AverageSpeed(Reducer):
@@ -22,6 +22,15 @@ class AverageSpeed(Reducer):
         for row in rows:
             distance += row[self.__distance_column]
             time += row[self.__time_column]
-        row.pop(self.__time_column)
-        row.pop(self.__distance_column)
-        yield {**row, self.__result_column: distance / time}
+        dropped = (self.__time_column, self.__distance_column)
+        kept = {key: value for key, value in row.items() if key not in dropped}
+        yield {**kept, self.__result_column: distance / time}
+
+    def kept_order(self, group_key: tuple[str, ...], order: TOrder) -> TOrder:
+        return order_within(order, set(group_key) - {self.__time_column, self.__distance_column, self.__result_column})
+
+    def combine(self, group_key: tuple[str, ...], partial: TRow | None, row: TRow) -> TRow | None:
+        if partial is None:
+            return dict(row)
+        return {**row, self.__distance_column: partial[self.__distance_column] + row[self.__distance_column],
+                self.__time_column: partial[self.__time_column] + row[self.__time_column]}
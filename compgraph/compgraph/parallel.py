@@ -0,0 +1,265 @@
+# parallel.py
+import collections
+import heapq
+import io
+import itertools
+import multiprocessing
+import multiprocessing.pool
+import os
+import tempfile
+import typing as tp
+
+from multiprocessing import connection
+from operator import itemgetter
+
+from . import operations as ops, worker_pool
+from .exception import CompgraphException
+from .external_sort import sort_rows, DEFAULT_MAX_ROWS_IN_MEMORY
+from .memory import MemoryGovernor
+from .transport import RowTransport, DEFAULT_BATCH_SIZE
+
+DEFAULT_CHUNK_SIZE = 1024
+DEFAULT_CHUNK_BYTES = 1 << 22
+
+_worker_mapper: ops.Mapper | None = None
+_worker_source: tuple[str, tp.Callable[[str], ops.TRow] | None, list[ops.Mapper]] | None = None
+
+
+def fork_context() -> multiprocessing.context.BaseContext:
+    """
+    Context of pools whose workers get mapper or parser on their start. Forked workers inherit them,
+    so they do not need to be picklable (e.g. Filter with lambda), whatever the default start method is
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise CompgraphException("Parallel map and read need fork start method, which is not available "
+                                 "on this platform: run them in place (workers=None)")
+    return multiprocessing.get_context("fork")
+
+
+def _init_map_worker(mapper: ops.Mapper) -> None:
+    global _worker_mapper
+    _worker_mapper = mapper
+
+
+def _map_chunk(chunk: list[ops.TRow]) -> list[ops.TRow]:
+    assert _worker_mapper is not None, "Map worker is not initialized"
+    mapper = _worker_mapper
+    return [result for row in chunk for result in mapper(row)]
+
+
+def chunked(rows: ops.TRowsIterable, chunk_size: int) -> tp.Generator[list[ops.TRow], None, None]:
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield chunk
+
+
+class ParallelMap(ops.Operation):
+    """
+    Apply mapper to each row in a pool of worker processes.
+    Rows are cut into chunks of chunk_size rows, at most 2 * workers chunks are in flight,
+    results are yielded in input order, so sortedness of data is kept as with ops.Map.
+    Mapper is passed to workers on their start, which are forked whatever the default start method is,
+    so it does not need to be picklable, rows do. Platforms without fork are rejected on construction.
+    """
+
+    def __init__(self, mapper: ops.Mapper, workers: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        """
+        :param mapper: mapper to use
+        :param workers: number of worker processes
+        :param chunk_size: number of rows mapped by worker at once
+        """
+        if workers <= 0:
+            raise CompgraphException("workers should be positive")
+        if chunk_size <= 0:
+            raise CompgraphException("chunk_size should be positive")
+        self.__context = fork_context()
+        self.__mapper = mapper
+        self.__workers = workers
+        self.__chunk_size = chunk_size
+
+    def __call__(self, rows: ops.TRowsIterable, *args: tp.Any, **kwargs: tp.Any) -> ops.TRowsGenerator:
+        with self.__context.Pool(self.__workers, initializer=_init_map_worker, initargs=(self.__mapper,)) as pool:
+            in_flight: collections.deque[multiprocessing.pool.AsyncResult[list[ops.TRow]]] = collections.deque()
+            for chunk in chunked(rows, self.__chunk_size):
+                if len(in_flight) == 2 * self.__workers:
+                    yield from in_flight.popleft().get()
+                in_flight.append(pool.apply_async(_map_chunk, (chunk,)))
+            while in_flight:
+                yield from in_flight.popleft().get()
+
+    def output_order(self, *input_orders: ops.TOrder) -> ops.TOrder:
+        return self.__mapper.kept_order(input_orders[0])
+
+    def __repr__(self) -> str:
+        return f"ParallelMap({type(self.__mapper).__name__}, workers={self.__workers})"
+
+
+def _init_read_worker(filename: str, parser: tp.Callable[[str], ops.TRow] | None, mappers: list[ops.Mapper]) -> None:
+    global _worker_source
+    _worker_source = filename, parser, mappers
+
+
+def _read_range(start: int, end: int) -> list[ops.TRow]:
+    assert _worker_source is not None, "Read worker is not initialized"
+    filename, parser, mappers = _worker_source
+    with open(filename, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    rows: tp.Iterable[ops.TRow]
+    if parser is None:
+        rows = ops.ReadJsonLines.decode(data if data.endswith(b"\n") else data + b"\n")
+    else:
+        rows = map(parser, io.TextIOWrapper(io.BytesIO(data)))
+    return list(ops.FusedMap(mappers)(rows))
+
+
+def line_ranges(filename: str, chunk_bytes: int) -> tp.Generator[tuple[int, int], None, None]:
+    """Split file into byte ranges [start, end) of about chunk_bytes bytes, every range ends with a whole line"""
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(start + chunk_bytes - 1)
+            f.readline()
+            end = min(f.tell(), size)
+            yield start, end
+            start = end
+
+
+class ParallelRead(ops.Operation):
+    """
+    Read file in a pool of worker processes: file is split into byte ranges aligned to lines,
+    every worker parses its range and applies mappers to parsed rows. Results are yielded in file order,
+    so output is the same as of reading file and mapping rows in place.
+    Parser and mappers (including those the planner pushes into workers, shown in plan as maps=[...]) are passed
+    to workers on their start, which are forked whatever the default start method is, so they do not need
+    to be picklable. Platforms without fork are rejected on construction.
+    """
+
+    def __init__(self, filename: str, parser: tp.Callable[[str], ops.TRow] | None, workers: int,
+                 chunk_bytes: int = DEFAULT_CHUNK_BYTES, mappers: tp.Sequence[ops.Mapper] = ()) -> None:
+        """
+        :param filename: filename to read from
+        :param parser: parser from string to Row as in ops.Read; None for JSON lines decoded as in ops.ReadJsonLines
+        :param workers: number of worker processes
+        :param chunk_bytes: approximate size of byte range parsed by worker at once
+        :param mappers: mappers applied to parsed rows in workers, in order of application
+        """
+        if workers <= 0:
+            raise CompgraphException("workers should be positive")
+        if chunk_bytes <= 0:
+            raise CompgraphException("chunk_bytes should be positive")
+        self.__context = fork_context()
+        self.__filename = filename
+        self.__parser = parser
+        self.__workers = workers
+        self.__chunk_bytes = chunk_bytes
+        self.mappers = list(mappers)
+
+    def with_mappers(self, mappers: tp.Sequence[ops.Mapper]) -> "ParallelRead":
+        """Same read which also applies mappers to its rows in workers"""
+        return ParallelRead(self.__filename, self.__parser, self.__workers, self.__chunk_bytes,
+                            [*self.mappers, *mappers])
+
+    def __call__(self, *args: tp.Any, **kwargs: tp.Any) -> ops.TRowsGenerator:
+        with self.__context.Pool(self.__workers, initializer=_init_read_worker,
+                                  initargs=(self.__filename, self.__parser, self.mappers)) as pool:
+            in_flight: collections.deque[multiprocessing.pool.AsyncResult[list[ops.TRow]]] = collections.deque()
+            for start, end in line_ranges(self.__filename, self.__chunk_bytes):
+                if len(in_flight) == 2 * self.__workers:
+                    yield from in_flight.popleft().get()
+                in_flight.append(pool.apply_async(_read_range, (start, end)))
+            while in_flight:
+                yield from in_flight.popleft().get()
+
+    def __repr__(self) -> str:
+        maps = f", maps=[{', '.join(type(mapper).__name__ for mapper in self.mappers)}]" if self.mappers else ""
+        return f"ParallelRead({self.__filename!r}, workers={self.__workers}{maps})"
+
+
+def do_reduce(endpoint: connection.Connection, reducer: ops.Reducer, keys: tuple[str, ...],
+              max_rows_in_memory: int, batch_size: int, memory_limit: int | None = None) -> None:
+    transport = RowTransport(endpoint, batch_size)
+    governor = None if memory_limit is None else MemoryGovernor(memory_limit)
+    with tempfile.TemporaryDirectory(prefix="compgraph-reduce-") as directory:
+        rows = sort_rows(transport.recv_rows(), keys, max_rows_in_memory, directory, governor)
+        transport.send_rows(ops.Reduce(reducer, keys)(rows))
+
+
+class PartitionedReduce(ops.Operation):
+    """
+    Apply reducer to each group of rows in several worker processes.
+    Rows are hash-partitioned by keys, so every group lands in one partition. Each worker sorts its partition
+    (spilling to disk above max_rows_in_memory rows) and reduces it, outputs are merged back in key order.
+    Unlike ops.Reduce input does not have to be sorted, output is the same as of sort + ops.Reduce.
+    Reducer output rows must contain keys columns, reducer is pickled to be sent to workers.
+    """
+
+    def __init__(self, reducer: ops.Reducer, keys: tp.Sequence[str], workers: int,
+                 max_rows_in_memory: int = DEFAULT_MAX_ROWS_IN_MEMORY, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """
+        :param reducer: reducer to use
+        :param keys: keys for grouping, should not be empty
+        :param workers: number of partitions and worker processes
+        :param max_rows_in_memory: memory budget of each worker in rows
+        :param batch_size: number of rows sent between processes in one message
+        """
+        if not keys:
+            raise CompgraphException("Partitioned reduce needs keys to partition by")
+        if workers <= 0:
+            raise CompgraphException("workers should be positive")
+        self.__reducer = reducer
+        self.__keys = tuple(keys)
+        self.__workers = workers
+        self.__max_rows_in_memory = max_rows_in_memory
+        self.__batch_size = batch_size
+
+    def output_order(self, *input_orders: ops.TOrder) -> ops.TOrder:
+        return self.__reducer.kept_order(self.__keys, self.__keys)
+
+    def __repr__(self) -> str:
+        return f"PartitionedReduce({type(self.__reducer).__name__}, keys={list(self.__keys)}, workers={self.__workers})"
+
+    def __scatter(self, rows: ops.TRowsIterable, transports: list[RowTransport]) -> None:
+        key = itemgetter(*self.__keys)
+        partitions: list[list[ops.TRow]] = [[] for _ in transports]
+        for row in rows:
+            index = hash(key(row)) % len(transports)
+            partition = partitions[index]
+            partition.append(row)
+            if len(partition) >= self.__batch_size:
+                transports[index].send_batch(partition)
+                partitions[index] = []
+        for transport, partition in zip(transports, partitions):
+            if partition:
+                transport.send_batch(partition)
+            transport.send_batch([])
+
+    def __call__(self, rows: ops.TRowsIterable, *args: tp.Any, governor: MemoryGovernor | None = None,
+                 **kwargs: tp.Any) -> ops.TRowsGenerator:
+        """
+        :param rows: rows to reduce
+        :param governor: memory governor of run, workers govern their sort buffers by the same memory limit
+        """
+        with worker_pool.session() as pool:
+            workers = [pool.acquire() for _ in range(self.__workers)]
+            completed = False
+            try:
+                transports = []
+                for worker in workers:
+                    worker.submit(do_reduce, self.__reducer, self.__keys, self.__max_rows_in_memory,
+                                  self.__batch_size, None if governor is None else governor.limit)
+                    transports.append(RowTransport(worker.endpoint, self.__batch_size))
+                try:
+                    self.__scatter(rows, transports)
+                except BrokenPipeError:  # some worker failed, its error is waiting in the pipe
+                    pass
+                yield from heapq.merge(*(transport.recv_rows() for transport in transports),
+                                       key=itemgetter(*self.__keys))
+                completed = True
+            finally:
+                for worker in workers:
+                    if completed:
+                        pool.release(worker)
+                    else:
+                        pool.discard(worker)
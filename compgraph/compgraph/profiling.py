@@ -0,0 +1,136 @@
+# profiling.py
+from __future__ import annotations
+
+import json
+import time
+import typing as tp
+
+from .spill import SpillFile
+
+T = tp.TypeVar("T")
+
+
+class OperationStats:
+    """Counters of one plan node collected during profiled run"""
+
+    def __init__(self, operation: str, depth: int) -> None:
+        """
+        :param operation: description of plan node, as in Graph.explain
+        :param depth: depth of node in plan tree, 0 for graph output
+        """
+        self.operation = operation
+        self.depth = depth
+        self.inputs: list[OperationStats] = []
+        self.rows_out = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.spilled_bytes = 0
+
+    @property
+    def rows_in(self) -> int:
+        return sum(stats.rows_out for stats in self.inputs)
+
+    def to_dict(self) -> dict[str, tp.Any]:
+        return {"operation": self.operation, "depth": self.depth, "rows_in": self.rows_in,
+                "rows_out": self.rows_out, "wall_time": self.wall_time, "cpu_time": self.cpu_time,
+                "spilled_bytes": self.spilled_bytes}
+
+
+class Profiler:
+    """
+    Per operation statistics of graph run: rows in and out, wall and CPU time, bytes spilled to disk.
+    Output of every plan node is pulled through track. Time and spills between two consecutive pulls starting
+    or ending are charged to the node whose pull is the innermost at the moment, so every node gets only
+    its own work, not the work of its inputs. Reading CPU clock costs much more than reading wall clock,
+    so CPU time is read every CPU_SAMPLE_PERIOD seconds and split among nodes by their wall time in between.
+    CPU time is the time of this process: work of sort workers is seen as wall time of sort, their spills
+    are counted. Rows of columnar operations are counted by batches.
+    """
+
+    CPU_SAMPLE_PERIOD = 0.001
+
+    def __init__(self) -> None:
+        self.operations: list[OperationStats] = []
+        self.__running: list[OperationStats] = []  # nodes whose output is being pulled, the innermost last
+        self.__time = time.perf_counter()
+        self.__spilled = SpillFile.bytes_written
+        self.__cpu_time = time.process_time()
+        self.__cpu_sampled = self.__time
+        self.__wall_since_sample: dict[OperationStats | None, float] = {}  # None is time out of graph
+
+    def add(self, operation: str, depth: int) -> OperationStats:
+        stats = OperationStats(operation, depth)
+        self.operations.append(stats)
+        return stats
+
+    def track(self, stats: OperationStats, items: tp.Iterable[T],
+              size: tp.Callable[[T], int] | None = None) -> tp.Generator[T, None, None]:
+        """
+        Count items pulled from iterable, time and spills of pulling them
+        :param stats: counters of plan node producing items
+        :param items: output of plan node
+        :param size: number of rows in item, item is one row if None
+        """
+        iterator = iter(items)
+        running = self.__running
+        while True:
+            self.__charge()
+            running.append(stats)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.__charge()
+                running.pop()
+            stats.rows_out += 1 if size is None else size(item)
+            yield item
+
+    def __charge(self) -> None:
+        """Charge time and spills since the previous call to the innermost running node"""
+        now = time.perf_counter()
+        spilled = SpillFile.bytes_written
+        stats = self.__running[-1] if self.__running else None
+        elapsed = now - self.__time
+        if stats is not None:
+            stats.wall_time += elapsed
+            stats.spilled_bytes += spilled - self.__spilled
+        self.__wall_since_sample[stats] = self.__wall_since_sample.get(stats, 0.0) + elapsed
+        self.__time = now
+        self.__spilled = spilled
+        if now - self.__cpu_sampled >= self.CPU_SAMPLE_PERIOD:
+            self.__sample_cpu(now)
+
+    def __sample_cpu(self, now: float) -> None:
+        cpu_time = time.process_time()
+        elapsed = now - self.__cpu_sampled
+        if elapsed > 0:
+            for stats, wall_time in self.__wall_since_sample.items():
+                if stats is not None:
+                    stats.cpu_time += (cpu_time - self.__cpu_time) * wall_time / elapsed
+        self.__wall_since_sample.clear()
+        self.__cpu_time = cpu_time
+        self.__cpu_sampled = now
+
+    def report(self) -> list[dict[str, tp.Any]]:
+        """Statistics of operations in plan order, as in Graph.explain"""
+        self.__charge()
+        self.__sample_cpu(self.__time)
+        return [stats.to_dict() for stats in self.operations]
+
+    def to_json(self) -> str:
+        return json.dumps(self.report(), indent=2)
+
+    def table(self) -> str:
+        """Statistics of operations as text table with share of every operation in total wall time"""
+        self.__charge()
+        self.__sample_cpu(self.__time)
+        total = sum(stats.wall_time for stats in self.operations) or 1.0
+        names = ["  " * stats.depth + stats.operation for stats in self.operations]
+        width = max(map(len, names), default=0)
+        lines = [f"{'operation':<{width}} {'rows in':>10} {'rows out':>10} {'wall, s':>9} {'cpu, s':>9} "
+                 f"{'time, %':>7} {'spilled, B':>12}"]
+        for name, stats in zip(names, self.operations):
+            lines.append(f"{name:<{width}} {stats.rows_in:>10} {stats.rows_out:>10} {stats.wall_time:>9.3f} "
+                         f"{stats.cpu_time:>9.3f} {100 * stats.wall_time / total:>7.1f} {stats.spilled_bytes:>12}")
+        return "\n".join(lines)
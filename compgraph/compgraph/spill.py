@@ -0,0 +1,82 @@
+# spill.py
+from __future__ import annotations
+
+import os
+import pickle
+import tempfile
+import typing as tp
+
+from .operations.base import TRow, TRowsIterable, TRowsGenerator
+
+FRAME_SIZE = 1024
+
+
+def read_rows(path: str) -> TRowsGenerator:
+    """Stream rows of file written by SpillFile"""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                frame = pickle.load(f)
+            except EOFError:
+                break
+            yield from frame
+
+
+class SpillFile:
+    """
+    Temporary file holding a stream of rows.
+    Rows are pickled in frames of FRAME_SIZE rows, so writing and reading cost one pickle call per frame.
+    Bytes written by all spill files of the process are counted in SpillFile.bytes_written.
+    """
+
+    bytes_written: tp.ClassVar[int] = 0
+
+    def __init__(self, directory: str | None = None) -> None:
+        """
+        :param directory: directory to create file in, system temp directory is used by default
+        """
+        fd, self.__path = tempfile.mkstemp(prefix="compgraph-", suffix=".spill", dir=directory)
+        self.__file: tp.BinaryIO | None = os.fdopen(fd, "wb")
+        self.__frame: list[TRow] = []
+        self.rows = 0
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    def write(self, row: TRow) -> None:
+        assert self.__file is not None, "Spill file is already closed for writing"
+        self.__frame.append(row)
+        self.rows += 1
+        if len(self.__frame) >= FRAME_SIZE:
+            self.__flush()
+
+    def write_all(self, rows: TRowsIterable) -> SpillFile:
+        for row in rows:
+            self.write(row)
+        return self.close()
+
+    def close(self) -> SpillFile:
+        """Finish writing, file can be read after that"""
+        if self.__file is not None:
+            self.__flush()
+            self.__file.close()
+            self.__file = None
+        return self
+
+    def read(self) -> TRowsGenerator:
+        """Stream rows back in the order they were written"""
+        self.close()
+        yield from read_rows(self.__path)
+
+    def remove(self) -> None:
+        self.close()
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+
+    def __flush(self) -> None:
+        if self.__frame and self.__file is not None:
+            data = pickle.dumps(self.__frame, protocol=pickle.HIGHEST_PROTOCOL)
+            self.__file.write(data)
+            SpillFile.bytes_written += len(data)
+            self.__frame = []
@@ -0,0 +1,157 @@
+# transport.py
+import pickle
+import struct
+
+from multiprocessing import connection, shared_memory
+
+from .exception import CompgraphException
+from .operations.base import TRow, TRowsIterable, TRowsGenerator
+
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_SLOTS = 4
+DEFAULT_SLOT_SIZE = 256 * 1024
+
+
+class RowTransport:
+    """
+    Streams rows through multiprocessing connection in batches.
+    Every message is one pickled list of at most batch_size rows, so pickling and syscall overhead
+    is paid per batch instead of per row. Empty batch marks the end of stream.
+    Failure on the other side arrives as CompgraphException instead of a batch and is raised by receiver.
+    Both sides of connection should wrap their endpoints in RowTransport.
+    """
+
+    def __init__(self, endpoint: connection.Connection, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """
+        :param endpoint: one end of multiprocessing.Pipe
+        :param batch_size: maximum number of rows in one message
+        """
+        self._endpoint = endpoint
+        self.batch_size = batch_size
+
+    def send_batch(self, batch: list[TRow]) -> None:
+        self._endpoint.send_bytes(pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def recv_batch(self) -> list[TRow]:
+        return self._loads(self._endpoint.recv_bytes())
+
+    @staticmethod
+    def _loads(data: bytes | memoryview) -> list[TRow]:
+        batch: list[TRow] | CompgraphException = pickle.loads(data)
+        if isinstance(batch, CompgraphException):
+            raise batch
+        return batch
+
+    def send_error(self, error: BaseException) -> None:
+        """Report failure to the other side instead of the rest of stream"""
+        message = CompgraphException(f"Worker process failed: {type(error).__name__}: {error}")
+        self._endpoint.send_bytes(pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def send_rows(self, rows: TRowsIterable) -> int:
+        """
+        Send all rows followed by end of stream mark
+        :param rows: rows to send
+        :return: number of rows sent
+        """
+        count = 0
+        batch: list[TRow] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.send_batch(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.send_batch(batch)
+            count += len(batch)
+        self.send_batch([])
+        return count
+
+    def send_count(self, count: int) -> None:
+        """Send a number after end of stream, e.g. statistics of the stream"""
+        self._endpoint.send_bytes(pickle.dumps(count, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def recv_count(self) -> int:
+        count: int | CompgraphException = pickle.loads(self._endpoint.recv_bytes())
+        if isinstance(count, CompgraphException):
+            raise count
+        return count
+
+    def recv_rows(self) -> TRowsGenerator:
+        """Receive rows until end of stream mark"""
+        while True:
+            batch = self.recv_batch()
+            if not batch:
+                break
+            yield from batch
+
+    def close(self) -> None:
+        self._endpoint.close()
+
+
+class SharedMemoryTransport(RowTransport):
+    """
+    Batched rows transport which stages pickled batches in shared memory segment instead of the pipe.
+    Segment is split into `slots` slots of `slot_size` bytes used round-robin: pipe carries only
+    (offset, size) of the filled slot, and receiver answers with acknowledgement once the batch is unpickled,
+    so sender never overwrites unread data. Receiver unpickles straight from shared memory.
+    Batch which does not fit into a slot (and errors) goes through the pipe as in RowTransport.
+    Stream is strictly one-directional at a time: send_rows returns after all slots were acknowledged,
+    so after that the same pair may stream in the opposite direction.
+    """
+    __HEADER = struct.Struct("<cqq")
+    __SLOT_TAG = b"S"
+    __ACK = b"A"
+
+    def __init__(self, endpoint: connection.Connection, segment: shared_memory.SharedMemory,
+                 batch_size: int = DEFAULT_BATCH_SIZE, slots: int = DEFAULT_SLOTS,
+                 slot_size: int = DEFAULT_SLOT_SIZE) -> None:
+        """
+        :param endpoint: one end of multiprocessing.Pipe
+        :param segment: shared memory of at least slots * slot_size bytes, same on both sides
+        :param batch_size: maximum number of rows in one message
+        :param slots: number of batches which may be in flight
+        :param slot_size: maximum size of pickled batch staged in shared memory
+        """
+        super().__init__(endpoint, batch_size)
+        assert segment.buf is not None and segment.size >= slots * slot_size, "Shared memory segment is too small"
+        self.__buffer: memoryview = segment.buf
+        self.__slots = slots
+        self.__slot_size = slot_size
+        self.__next_slot = 0
+        self.__unacknowledged = 0
+
+    def send_batch(self, batch: list[TRow]) -> None:
+        data = pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.__slot_size:
+            self._endpoint.send_bytes(data)
+            return
+        if self.__unacknowledged == self.__slots:
+            self.__wait_acknowledgement()
+        offset = self.__next_slot * self.__slot_size
+        self.__buffer[offset:offset + len(data)] = data
+        self._endpoint.send_bytes(self.__HEADER.pack(self.__SLOT_TAG, offset, len(data)))
+        self.__next_slot = (self.__next_slot + 1) % self.__slots
+        self.__unacknowledged += 1
+
+    def recv_batch(self) -> list[TRow]:
+        message = self._endpoint.recv_bytes()
+        if message[:1] != self.__SLOT_TAG:  # pickles start with PROTO opcode, never with the tag
+            return self._loads(message)
+        _, offset, size = self.__HEADER.unpack(message)
+        batch = self._loads(self.__buffer[offset:offset + size])
+        self._endpoint.send_bytes(self.__ACK)
+        return batch
+
+    def send_rows(self, rows: TRowsIterable) -> int:
+        count = super().send_rows(rows)
+        while self.__unacknowledged:
+            self.__wait_acknowledgement()
+        return count
+
+    def __wait_acknowledgement(self) -> None:
+        message = self._endpoint.recv_bytes()
+        if message != self.__ACK:
+            self._loads(message)  # raises error reported by the other side
+            raise CompgraphException("Unexpected message instead of acknowledgement")
+        self.__unacknowledged -= 1
@@ -0,0 +1,124 @@
+# worker_pool.py
+from __future__ import annotations
+
+import contextlib
+import typing as tp
+
+from multiprocessing import Pipe, Process, connection, resource_tracker
+
+from .transport import RowTransport
+
+TJob = tp.Callable[..., None]
+
+
+def serve(endpoint: connection.Connection) -> None:
+    """
+    Worker process main loop: receive (job, args) and run job(endpoint, *args) until None is received.
+    Job talks to the parent through the same endpoint. Failed job is reported to the parent
+    and the worker exits, because the rest of its input is still in the pipe.
+    """
+    while True:
+        message = endpoint.recv()
+        if message is None:
+            break
+        job, args = message
+        try:
+            job(endpoint, *args)
+        except Exception as e:
+            RowTransport(endpoint).send_error(e)
+            break
+    endpoint.close()
+
+
+class Worker:
+    """Persistent process running jobs one after another"""
+
+    def __init__(self) -> None:
+        # worker shares parent's resource tracker, so shared memory attached by jobs is not reported as leaked
+        resource_tracker.ensure_running()
+        self.endpoint, remote_endpoint = Pipe()
+        self.__process = Process(target=serve, args=(remote_endpoint,), daemon=True)
+        self.__process.start()
+        remote_endpoint.close()
+
+    def submit(self, job: TJob, *args: tp.Any) -> None:
+        """
+        Start job in worker, all following communication goes through self.endpoint
+        :param job: picklable function taking worker endpoint and args
+        """
+        self.endpoint.send((job, args))
+
+    def stop(self) -> None:
+        with contextlib.suppress(OSError):
+            self.endpoint.send(None)
+        self.__process.join()
+        self.endpoint.close()
+
+    def kill(self) -> None:
+        self.__process.terminate()
+        self.__process.join()
+        self.endpoint.close()
+
+
+class WorkerPool:
+    """
+    Set of warm worker processes.
+    Worker is taken for one job and returned after the job result was fully consumed,
+    so several streaming jobs (e.g. consecutive sorts) may hold their own workers at the same time.
+    """
+
+    def __init__(self) -> None:
+        self.__idle: list[Worker] = []
+        self.__busy: list[Worker] = []
+        self.spawned = 0
+
+    def acquire(self) -> Worker:
+        if self.__idle:
+            worker = self.__idle.pop()
+        else:
+            worker = Worker()
+            self.spawned += 1
+        self.__busy.append(worker)
+        return worker
+
+    def release(self, worker: Worker) -> None:
+        """Return worker whose job is finished, it will be reused"""
+        self.__busy.remove(worker)
+        self.__idle.append(worker)
+
+    def discard(self, worker: Worker) -> None:
+        """Kill worker whose job was abandoned or failed, its pipe may contain unread data"""
+        self.__busy.remove(worker)
+        worker.kill()
+
+    def shutdown(self) -> None:
+        for worker in self.__idle:
+            worker.stop()
+        for worker in self.__busy:
+            worker.kill()
+        self.__idle.clear()
+        self.__busy.clear()
+
+
+_pool: WorkerPool | None = None
+_sessions = 0
+
+
+@contextlib.contextmanager
+def session() -> tp.Generator[WorkerPool, None, None]:
+    """
+    Use shared worker pool. Pool is created by the first session and shut down when the last session ends,
+    so nested sessions (graph run, joined graphs runs, sorts inside them) share the same workers.
+    """
+    global _pool, _sessions
+    if _pool is None:
+        _pool = WorkerPool()
+    pool = _pool
+    _sessions += 1
+    try:
+        yield pool
+    finally:
+        _sessions -= 1
+        if _sessions == 0:
+            _pool = None
+            pool.shutdown()
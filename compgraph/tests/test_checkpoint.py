@@ -0,0 +1,102 @@
+import json
+import os
+import random
+import typing as tp
+from pathlib import Path
+
+import pytest
+
+from compgraph import CompgraphException, algorithms, operations as ops
+from compgraph.graph import Graph
+
+
+def _docs(count: int) -> list[ops.TRow]:
+    rng = random.Random(7)
+    words = ["Alpha,", "beta", "gamma!", "Delta", "epsilon", "zeta.", "eta", "theta"]
+    return [{"doc_id": i, "text": " ".join(rng.choice(words) for _ in range(rng.randint(1, 20)))}
+            for i in range(count)]
+
+
+class CountingSource:
+    """Data source counting how many times it was read"""
+
+    def __init__(self, rows: list[ops.TRow]) -> None:
+        self.rows = rows
+        self.reads = 0
+
+    def __call__(self) -> tp.Iterator[ops.TRow]:
+        self.reads += 1
+        return iter(self.rows)
+
+
+class Crash(ops.Mapper):
+    """Mapper failing while crashed is set"""
+
+    def __init__(self) -> None:
+        self.crashed = True
+
+    def __call__(self, row: ops.TRow) -> ops.TRowsGenerator:
+        if self.crashed:
+            raise RuntimeError("crash")
+        yield row
+
+    def __repr__(self) -> str:
+        return "Crash()"
+
+
+def _manifest(directory: Path) -> dict[str, tp.Any]:
+    return tp.cast(dict[str, tp.Any], json.loads((directory / "manifest.json").read_text()))
+
+
+@pytest.mark.parametrize("make_graph", [
+    lambda: algorithms.word_count_graph("docs"),
+    lambda: algorithms.inverted_index_graph("docs"),
+    lambda: algorithms.pmi_graph("docs"),
+])
+def test_resume_completed_run(tmp_path: Path, make_graph: tp.Callable[[], Graph]) -> None:
+    graph = make_graph()
+    docs = CountingSource(_docs(100))
+    expected = list(graph.run(docs=docs))
+    assert list(graph.run(checkpoint_dir=str(tmp_path), docs=docs)) == expected
+    manifest = _manifest(tmp_path)
+    assert manifest["plan"] == graph.explain()
+    sorts = [line for line in graph.explain().splitlines()
+             if "Sort(" in line and "(skipped)" not in line and "(see above)" not in line]
+    assert len(manifest["checkpoints"]) == len(sorts)
+    assert all(os.path.exists(tmp_path / entry["file"]) for entry in manifest["checkpoints"].values())
+    reads = docs.reads
+    assert list(graph.run(checkpoint_dir=str(tmp_path), resume=True, docs=docs)) == expected
+    assert list(graph.run(checkpoint_dir=str(tmp_path), resume=True, compact=True, docs=docs)) == expected
+    assert docs.reads == reads  # every path from the source goes through a completed sort
+
+
+def test_resume_after_crash(tmp_path: Path) -> None:
+    crash = Crash()
+    graph = Graph.graph_from_iter("docs").map(ops.Tokenize("text")).checkpoint() \
+        .sort(["text"]).reduce(ops.Count("count"), ["text"]).map(crash).sort(["count", "text"])
+    docs = CountingSource(_docs(100))
+    with pytest.raises(RuntimeError):
+        list(graph.run(checkpoint_dir=str(tmp_path), docs=docs))
+    checkpoints = _manifest(tmp_path)["checkpoints"]
+    assert [entry["operation"] for entry in checkpoints.values()] == ["Checkpoint()", "ExternalSort(keys=['text'])"]
+    assert len(os.listdir(tmp_path)) == 3  # manifest and two completed checkpoints, partial ones are removed
+
+    crash.crashed = False
+    reads = docs.reads
+    result = list(graph.run(checkpoint_dir=str(tmp_path), resume=True, docs=docs))
+    assert docs.reads == reads
+    assert result == list(algorithms.word_count_graph("docs").run(docs=docs))
+    assert len(_manifest(tmp_path)["checkpoints"]) == 3
+
+    list(graph.run(checkpoint_dir=str(tmp_path), docs=docs))  # fresh run replaces checkpoints
+    assert docs.reads == reads + 2
+    assert len(os.listdir(tmp_path)) == 4
+
+
+def test_resume_needs_same_plan(tmp_path: Path) -> None:
+    docs = CountingSource(_docs(10))
+    list(algorithms.word_count_graph("docs").run(checkpoint_dir=str(tmp_path), docs=docs))
+    with pytest.raises(CompgraphException):
+        list(algorithms.inverted_index_graph("docs").run(checkpoint_dir=str(tmp_path), resume=True, docs=docs))
+    with pytest.raises(CompgraphException):
+        list(algorithms.word_count_graph("docs").run(resume=True, docs=docs))
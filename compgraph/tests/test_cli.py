@@ -150,3 +150,53 @@ def test_cli_run_yandex_maps_example() -> None:
     tmp_length_file.close()
     tmp_time_file.close()
     tmp_out_file.close()
+
+
+def test_cli_profile(tmp_path: tp.Any) -> None:
+    input_path, output_path, profile_path = tmp_path / "docs.jsonl", tmp_path / "out.jsonl", tmp_path / "profile.json"
+    input_path.write_text("".join(json.dumps(line) + "\n" for line in text_raw))
+    result = CliRunner().invoke(cli, ["run-word-count", str(input_path), str(output_path),
+                                      "--profile", str(profile_path)])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line) for line in output_path.read_text().splitlines()] == answer_word_count
+    report = json.loads(profile_path.read_text())
+    assert report[0]["rows_out"] == len(answer_word_count)
+    assert {"operation", "rows_in", "rows_out", "wall_time", "cpu_time", "spilled_bytes"} <= report[0].keys()
+    assert "rows out" in result.stderr
+
+
+def test_cli_memory_limit(tmp_path: tp.Any) -> None:
+    input_path, output_path = tmp_path / "docs.jsonl", tmp_path / "out.jsonl"
+    input_path.write_text("".join(json.dumps(line) + "\n" for line in text_raw))
+    result = CliRunner().invoke(cli, ["run-inverted-index", str(input_path), str(output_path), "--memory-limit", "1"])
+    assert result.exit_code != 0 and "below memory already taken" in str(result.exception)
+    result = CliRunner().invoke(cli, ["run-word-count", str(input_path), str(output_path), "--memory-limit", "4096"])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line) for line in output_path.read_text().splitlines()] == answer_word_count
+
+
+def test_cli_resume(tmp_path: tp.Any) -> None:
+    input_path, output_path, work_dir = tmp_path / "docs.jsonl", tmp_path / "out.jsonl", tmp_path / "work"
+    input_path.write_text("".join(json.dumps(line) + "\n" for line in text_raw))
+    result = CliRunner().invoke(cli, ["run-word-count", str(input_path), str(output_path),
+                                      "--checkpoint-dir", str(work_dir)])
+    assert result.exit_code == 0, result.output
+    assert (work_dir / "manifest.json").exists()
+    input_path.write_text("")  # resumed run does not read input
+    output_path.unlink()
+    result = CliRunner().invoke(cli, ["run-word-count", str(input_path), str(output_path),
+                                      "--checkpoint-dir", str(work_dir), "--resume"])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line) for line in output_path.read_text().splitlines()] == answer_word_count
+    result = CliRunner().invoke(cli, ["run-word-count", str(input_path), str(output_path), "--resume"])
+    assert result.exit_code == 2 and "--resume needs --checkpoint-dir" in result.output
+
+
+def test_cli_incremental_word_count(tmp_path: tp.Any) -> None:
+    input_path, output_path, state_path = tmp_path / "docs.jsonl", tmp_path / "out.jsonl", tmp_path / "state.bin"
+    for part in (text_raw[:2], text_raw[2:5], text_raw[5:]):
+        input_path.write_text("".join(json.dumps(line) + "\n" for line in part))
+        result = CliRunner().invoke(cli, ["run-word-count", str(input_path), str(output_path),
+                                          "--state", str(state_path)])
+        assert result.exit_code == 0, result.output
+    assert [json.loads(line) for line in output_path.read_text().splitlines()] == answer_word_count
@@ -0,0 +1,191 @@
+import math
+import random
+import typing as tp
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from compgraph import CompgraphException, algorithms, operations as ops
+from compgraph.columnar import ColumnarMap, ColumnarReduce
+from compgraph.graph import Graph
+
+
+def _assert_rows_close(actual: list[ops.TRow], expected: list[ops.TRow]) -> None:
+    assert len(actual) == len(expected)
+    for actual_row, expected_row in zip(actual, expected):
+        assert actual_row.keys() == expected_row.keys()
+        for key, value in expected_row.items():
+            assert type(actual_row[key]) is type(value)
+            if isinstance(value, float):
+                assert math.isclose(actual_row[key], value, rel_tol=1e-15)
+            else:
+                assert actual_row[key] == value
+
+
+def _docs(count: int) -> list[ops.TRow]:
+    rng = random.Random(7)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+    return [{"doc_id": i, "text": " ".join(rng.choice(words) for _ in range(rng.randint(1, 30)))}
+            for i in range(count)]
+
+
+@pytest.mark.parametrize("rows", [
+    [{"a": 1, "b": 1.5, "c": "x", "d": [1, 2]}, {"a": -3, "b": 0.25, "c": "y", "d": [3, 4]}],
+    [{"a": 1}, {"a": 2.0}, {"a": True}, {"a": None}],
+    [{"a": 2 ** 70}, {"a": 1}],
+    [{}, {}],
+])
+def test_record_batch_round_trip(rows: list[ops.TRow]) -> None:
+    restored = ops.RecordBatch.from_rows(rows).to_rows()
+    assert restored == rows
+    assert [list(map(type, row.values())) for row in restored] == [list(map(type, row.values())) for row in rows]
+
+
+def test_record_batch_sets_columns_over_rows() -> None:
+    rows: list[ops.TRow] = [{"a": 1, "b": "x"}, {"a": 2, "b": "y", "c": 0}, {"a": 3, "b": "z"}]
+    batches = list(ops.to_batches(iter(rows), batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 1]
+    changed = []
+    for batch in batches:
+        numeric = batch.numeric("a")
+        assert numeric is not None
+        changed.append(batch.with_column("a", numeric[0] * 2).with_column("d", batch.column("b")))
+    expected = [{**row, "a": row["a"] * 2, "d": row["b"]} for row in rows]
+    restored = list(ops.to_rows(changed))
+    assert restored == expected
+    assert [list(row) for row in restored] == [list(row) for row in expected]
+
+
+@pytest.mark.parametrize("mapper, rows", [
+    (ops.Product(["a", "b"]), [{"a": i, "b": 3 - i} for i in range(10)]),
+    (ops.Product(["a", "b", "c"]), [{"a": i, "b": 0.5 * i, "c": 3} for i in range(10)]),
+    (ops.Product(["a", "b"]), [{"a": 2 ** 40, "b": 2 ** 40}]),
+    (ops.Product(["a", "b"]), [{"a": "ab", "b": 3}]),
+    (ops.CalculateIdf(), [{"count_docs": 10, "count_docs_with_word": i} for i in range(1, 11)]),
+    (ops.CalculatePMI(), [{"count_words_in_all_docs": 100, "count_words_in_this_doc": i, "tf": 0.1 * i}
+                          for i in range(1, 11)]),
+])
+def test_vectorized_mappers_match_rows(mapper: ops.Mapper, rows: list[ops.TRow]) -> None:
+    expected = list(ops.Map(mapper)(iter(rows)))
+    _assert_rows_close(list(ColumnarMap([mapper], batch_size=4)(iter(rows))), expected)
+
+
+def test_vectorized_mapper_errors_match_rows() -> None:
+    with pytest.raises(ZeroDivisionError):
+        list(ColumnarMap([ops.CalculateIdf()])(iter([{"count_docs": 1, "count_docs_with_word": 0}])))
+    with pytest.raises(ValueError):
+        list(ColumnarMap([ops.CalculateIdf()])(iter([{"count_docs": 0, "count_docs_with_word": 1}])))
+
+
+@pytest.mark.parametrize("reducer, keys", [
+    (ops.Count("count"), ["a"]),
+    (ops.Count("count"), ["a", "b"]),
+    (ops.Sum("value"), ["a"]),
+    (ops.Sum("value"), ["a", "b"]),
+    (ops.TermFrequency("b"), ["a"]),
+])
+@pytest.mark.parametrize("batch_size", [1, 3, 1000])
+def test_columnar_reduce_matches_rows(reducer: ops.Reducer, keys: list[str], batch_size: int) -> None:
+    rows = sorted(({"a": f"k{i % 7}", "b": i % 3, "value": i * 11 - 50} for i in range(100)),
+                  key=lambda row: tuple(row[key] for key in keys))
+    expected = list(ops.Reduce(reducer, keys)(iter(rows)))
+    _assert_rows_close(list(ColumnarReduce(reducer, keys, batch_size)(iter(rows))), expected)
+
+
+def test_columnar_reduce_float_sum_matches_rows() -> None:
+    rows = [{"a": i // 10, "value": 0.1 * i} for i in range(100)]
+    expected = list(ops.Reduce(ops.Sum("value"), ["a"])(iter(rows)))
+    assert list(ColumnarReduce(ops.Sum("value"), ["a"], 8)(iter(rows))) == expected
+
+
+@pytest.mark.parametrize("rows", [[{"a": 2}, {"a": 1}, {"a": 2}], [{"a": 2}, {"a": 2}, {"a": 1}]],
+                         ids=["within-batch", "across-batches"])
+def test_columnar_reduce_unsorted_input(rows: list[ops.TRow]) -> None:
+    with pytest.raises(CompgraphException):
+        list(ColumnarReduce(ops.Count("count"), ["a"], 2)(iter(rows)))
+
+
+def test_columnar_reduce_joins_long_group_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    rows = [{"a": 0}] + [{"a": 1}] * 500 + [{"a": 2}]
+    joined: list[int] = []
+    concat_all = ops.RecordBatch.concat_all
+
+    def counting_concat_all(batches: tp.Sequence[ops.RecordBatch]) -> ops.RecordBatch:
+        joined.append(len(batches))
+        return concat_all(batches)
+
+    monkeypatch.setattr(ops.RecordBatch, "concat_all", staticmethod(counting_concat_all))
+    result = list(ColumnarReduce(ops.Count("count"), ["a"], 10)(iter(rows)))
+    assert result == [{"count": 1, "a": 0}, {"count": 500, "a": 1}, {"count": 1, "a": 2}]
+    assert joined == [51, 1]  # pieces of the long group are joined once
+
+
+@pytest.mark.parametrize("make_graph", [
+    lambda: algorithms.word_count_graph("docs"),
+    lambda: algorithms.inverted_index_graph("docs"),
+    lambda: algorithms.pmi_graph("docs"),
+])
+def test_algorithms_in_columnar_mode(make_graph: tp.Callable[[], Graph]) -> None:
+    docs = _docs(200)
+    graph = make_graph()
+    assert "Columnar" in graph.explain(columnar=True)
+    expected = list(graph.run(docs=lambda: iter(docs)))
+    _assert_rows_close(list(graph.run(columnar=True, docs=lambda: iter(docs))), expected)
+
+
+def test_columnar_operations_exchange_batches() -> None:
+    rows = [{"a": i % 5, "b": i, "c": 2} for i in range(50)]
+    graph = Graph.graph_from_iter("data") \
+        .map(ops.Product(["b", "c"], "d")) \
+        .sort(["a"]) \
+        .reduce(ops.Sum("d"), ["a"]) \
+        .map(ops.Product(["d", "a"], "e"))
+    plan = graph.explain(columnar=True).splitlines()
+    assert plan[0].startswith("ColumnarMap(Product)")
+    assert plan[1].strip().startswith("ColumnarReduce(Sum, keys=['a'])")
+    assert list(graph.run(columnar=True, data=lambda: iter(rows))) == list(graph.run(data=lambda: iter(rows)))
+
+
+def _trips(count: int) -> list[ops.TRow]:
+    rng = random.Random(3)
+    trips = []
+    for i in range(count):
+        enter = datetime(1999, 12, 31, 23) + timedelta(seconds=rng.uniform(0, 30 * 365 * 86400))
+        leave = enter + timedelta(seconds=rng.uniform(-5, 600))
+        trips.append({"enter_time": enter.strftime("%Y%m%dT%H%M%S.%f"),
+                      "leave_time": leave.strftime("%Y%m%dT%H%M%S.%f"),
+                      "edge_id": i, "start": [rng.uniform(37, 38), rng.uniform(55, 56)],
+                      "end": [rng.uniform(37, 38), rng.uniform(55, 56)]})
+    trips.append({**trips[0], "enter_time": "20240229T235959.999999", "leave_time": "20240301T000000.000000"})
+    return trips
+
+
+@pytest.mark.parametrize("trips", [
+    _trips(5000),
+    [{**trip, "enter_time": trip["enter_time"][:15], "leave_time": trip["leave_time"][:15]} for trip in _trips(10)],
+    [{**trip, "start": [37, 55]} for trip in _trips(10)],
+])
+def test_time_and_distance_batch_is_exact(trips: list[ops.TRow]) -> None:
+    mapper = ops.CalculateTimeAndDistance()
+    expected = list(ops.Map(mapper)(iter(trips)))
+    actual = list(ColumnarMap([mapper], batch_size=1000)(iter(trips)))
+    assert actual == expected
+    assert [list(row) for row in actual] == [list(row) for row in expected]
+    assert [list(map(type, row.values())) for row in actual] == [list(map(type, row.values())) for row in expected]
+
+
+def test_time_and_distance_batch_invalid_timestamp() -> None:
+    trips = [{**trip, "enter_time": "20230229T120000.000000"} for trip in _trips(3)]
+    with pytest.raises(ValueError):
+        list(ColumnarMap([ops.CalculateTimeAndDistance()])(iter(trips)))
+
+
+def test_yandex_maps_in_columnar_mode() -> None:
+    trips = _trips(2000)
+    lengths = [{"edge_id": trip["edge_id"], "start": trip["start"], "end": trip["end"]} for trip in trips]
+    times = [{key: trip[key] for key in ["enter_time", "leave_time", "edge_id"]} for trip in trips]
+    graph = algorithms.yandex_maps_graph("times", "lengths")
+    assert "ColumnarMap(CalculateTimeAndDistance)" in graph.explain(columnar=True)
+    expected = list(graph.run(times=lambda: iter(times), lengths=lambda: iter(lengths)))
+    assert list(graph.run(columnar=True, times=lambda: iter(times), lengths=lambda: iter(lengths))) == expected
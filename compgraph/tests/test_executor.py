@@ -0,0 +1,150 @@
+import itertools
+import os
+import tempfile
+import typing as tp
+
+from compgraph import algorithms, operations as ops
+from compgraph.executor import SharedStream
+from compgraph.external_sort import SortWithinGroups
+from compgraph.graph import Graph
+
+
+class CountingSource:
+    def __init__(self, data: list[ops.TRow]) -> None:
+        self.data = data
+        self.calls = 0
+
+    def __call__(self) -> tp.Iterator[ops.TRow]:
+        self.calls += 1
+        return iter(self.data)
+
+
+def _spill_files() -> set[str]:
+    return {name for name in os.listdir(tempfile.gettempdir()) if name.endswith(".spill")}
+
+
+def test_shared_stream_readers_far_apart() -> None:
+    data = [{"a": i} for i in range(100)]
+    files_before = _spill_files()
+    stream = SharedStream(iter(data), consumers=3, chunk_size=3, max_chunks_in_memory=2)
+    first, second, third = stream.reader(), stream.reader(), stream.reader()
+    assert list(first) == data
+    assert len(_spill_files() - files_before) > 0
+    assert list(itertools.islice(second, 10)) == data[:10]
+    assert list(zip(second, third)) == list(zip(data[10:], data))
+    second.close()
+    assert list(third) == data[90:]
+    assert _spill_files() == files_before
+
+
+def test_shared_source_is_read_once() -> None:
+    source = CountingSource([{"doc_id": i, "text": "Hello, world! hello"} for i in range(10)])
+    graph = algorithms.inverted_index_graph("docs")
+    result = list(graph.run(docs=source))
+    assert source.calls == 1
+    assert {row["text"] for row in result} == {"hello", "world"}
+
+
+def test_shared_branches() -> None:
+    source = CountingSource([{"a": i % 3, "b": i} for i in range(9)])
+    base = Graph.graph_from_iter("data").map(ops.Filter(lambda row: row["b"] > 0))
+    sums = Graph.graph_from_another_graph(base).reduce(ops.Sum("b"), [])
+    firsts = Graph.graph_from_another_graph(base).sort(["a"]).reduce(ops.FirstReducer(), ["a"])
+    graph = firsts.join(ops.InnerJoiner(), sums, [], strategy="broadcast") \
+        .join(ops.InnerJoiner(), sums, [], strategy="broadcast")  # the same graph joined twice
+    result = list(graph.run(data=source))
+    assert source.calls == 1
+    assert result == [{"a": 0, "b_1": 3, "b_2": 36, "b": 36}, {"a": 1, "b_1": 1, "b_2": 36, "b": 36},
+                      {"a": 2, "b_1": 2, "b_2": 36, "b": 36}]
+
+
+def test_sort_of_sorted_data_is_skipped() -> None:
+    data = [{"a": i % 3, "b": i} for i in range(20)]
+    graph = Graph.graph_from_iter("data") \
+        .sort(["a"]) \
+        .map(ops.Filter(lambda row: row["b"] % 2 == 0)) \
+        .sort(["a"]) \
+        .reduce(ops.Sum("b"), ["a"]) \
+        .sort(["a", "b"])
+    plan = graph.explain().splitlines()
+    assert plan[0].startswith("SortWithinGroups(prefix=['a'], keys=['a', 'b']) instead of ExternalSort")
+    assert plan[2].strip().startswith("(skipped) ExternalSort(keys=['a'])")
+    assert plan[4].strip().startswith("ExternalSort(keys=['a'])")
+    assert list(graph.run(data=lambda: iter(data))) == [{"a": 0, "b": 36}, {"a": 1, "b": 30}, {"a": 2, "b": 24}]
+
+
+def test_sort_after_order_changing_mapper_is_kept() -> None:
+    data = [{"a": 3 - i, "b": i} for i in range(4)]
+    graph = Graph.graph_from_iter("data") \
+        .sort(["a"]) \
+        .map(ops.Product(["b", "b"], "a")) \
+        .sort(["a"])
+    assert "skipped" not in graph.explain()
+    assert [row["a"] for row in graph.run(data=lambda: iter(data))] == [0, 1, 4, 9]
+
+
+def test_sort_within_groups_matches_full_sort() -> None:
+    data = [{"a": i // 10, "b": (i * 7) % 10, "c": i} for i in range(50)]
+    rows = list(SortWithinGroups(["a"], ["a", "b"], max_rows_in_memory=3)(iter(data)))
+    assert rows == sorted(data, key=lambda row: (row["a"], row["b"]))
+
+
+def test_merge_join_output_is_sorted_by_keys() -> None:
+    left = Graph.graph_from_iter("left").sort(["k"])
+    right = Graph.graph_from_iter("right").sort(["k"])
+    graph = left.join(ops.InnerJoiner(), right, ["k"]).sort(["k"])
+    assert "(skipped) ExternalSort(keys=['k'])" in graph.explain().splitlines()[0]
+    result = graph.run(left=lambda: iter([{"k": 2, "l": 1}, {"k": 1, "l": 2}]),
+                       right=lambda: iter([{"k": 1, "r": 3}, {"k": 2, "r": 4}]))
+    assert list(result) == [{"k": 1, "l": 2, "r": 3}, {"k": 2, "l": 1, "r": 4}]
+
+
+def test_consecutive_maps_are_fused() -> None:
+    data = [{"text": "Hello, World! hello", "n": i} for i in range(3)]
+    graph = Graph.graph_from_iter("data") \
+        .map(ops.FilterPunctuation("text")) \
+        .map(ops.LowerCase("text")) \
+        .map(ops.Split("text"))
+    plan = graph.explain().splitlines()
+    assert plan[0] == "FusedMap(FilterPunctuation, LowerCase, Split) -- 3 maps fused"
+    expected = [{"text": word, "n": i} for i in range(3) for word in ["hello", "world", "hello"]]
+    assert list(graph.run(data=lambda: iter(data))) == expected
+
+
+def test_shared_map_output_is_not_fused() -> None:
+    base = Graph.graph_from_iter("data").map(ops.Filter(lambda row: row["a"] > 0))
+    doubled = Graph.graph_from_another_graph(base).map(ops.Product(["a", "a"], "b"))
+    graph = base.map(ops.Project(["a"])).join(ops.InnerJoiner(), doubled, ["a"], strategy="hash")
+    assert "fused" not in graph.explain()
+    result = graph.run(data=lambda: iter([{"a": 2}, {"a": 0}, {"a": 3}]))
+    assert list(result) == [{"a": 2, "b": 4}, {"a": 3, "b": 9}]
+
+
+def test_sort_before_combinable_reduce_gets_combined_input() -> None:
+    docs: list[ops.TRow] = [{"doc_id": i, "text": "b a B c, a" * (i % 3 + 1)} for i in range(30)]
+    graph = algorithms.word_count_graph("docs")
+    plan = graph.explain().splitlines()
+    assert plan[1].strip().startswith("Reduce(_MergeCounts, keys=['text']) instead of Reduce(Count")
+    assert plan[3].strip() == "Combine(Count, keys=['text'])"
+    words = [{"text": word} for doc in docs for word in doc["text"].replace(",", " ").lower().split()]
+    counts = ops.Reduce(ops.Count("count"), ["text"])(sorted(words, key=lambda row: row["text"]))
+    expected = sorted(counts, key=lambda row: (row["count"], row["text"]))
+    assert list(graph.run(docs=lambda: iter(docs))) == expected
+
+
+def test_reduce_after_shared_sort_is_not_combined() -> None:
+    base = Graph.graph_from_iter("data").sort(["a"])
+    summed = Graph.graph_from_another_graph(base).reduce(ops.Sum("b"), ["a"])
+    graph = base.reduce(ops.Count("n"), ["a"]).join(ops.InnerJoiner(), summed, ["a"])
+    assert "Combine" not in graph.explain()
+    result = graph.run(data=lambda: iter([{"a": 1, "b": 2}, {"a": 0, "b": 3}, {"a": 1, "b": 4}]))
+    assert list(result) == [{"n": 1, "a": 0, "b": 3}, {"n": 2, "a": 1, "b": 6}]
+
+
+def test_aggregate_does_not_sort() -> None:
+    plan = algorithms.yandex_maps_graph("times", "lengths").explain()
+    assert "HashReduce(AverageSpeed, keys=['weekday', 'hour'])" in plan
+    assert "Sort(keys=['weekday', 'hour'])" not in plan
+    data = [{"a": i % 4, "b": i} for i in range(20, 0, -1)]
+    graph = Graph.graph_from_iter("data").aggregate(ops.Sum("b"), ["a"], max_rows_in_memory=3)
+    assert list(graph.run(data=lambda: iter(data))) == [{"a": a, "b": sum(range(a or 4, 21, 4))} for a in range(4)]
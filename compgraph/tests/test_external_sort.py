@@ -0,0 +1,55 @@
+import os
+import random
+from pathlib import Path
+from operator import itemgetter
+
+import pytest
+
+from compgraph import CompgraphException
+from compgraph.external_sort import ExternalSort, sort_rows
+from compgraph.graph import Graph
+from compgraph.spill import SpillFile
+
+
+def test_spill_file_roundtrip(tmp_path: Path) -> None:
+    data = [{"a": i, "b": str(i)} for i in range(5000)]
+    spill_file = SpillFile(str(tmp_path)).write_all(data)
+    assert spill_file.rows == len(data)
+    assert list(spill_file.read()) == data
+    spill_file.remove()
+    assert not os.path.exists(spill_file.path)
+
+
+@pytest.mark.parametrize("max_rows_in_memory", [1, 3, 7, 1000])
+def test_sort_rows_with_spill(tmp_path: Path, max_rows_in_memory: int) -> None:
+    rng = random.Random(0)
+    data = [{"a": rng.randint(0, 10), "b": rng.randint(0, 3), "i": i} for i in range(100)]
+    result = list(sort_rows(iter(data), ("a", "b"), max_rows_in_memory, str(tmp_path)))
+    assert result == sorted(data, key=itemgetter("a", "b"))  # stable
+    assert os.listdir(tmp_path) == []
+
+
+def test_external_sort_small_budget() -> None:
+    data = [{"a": i % 13, "i": i} for i in range(1000)]
+    result = list(ExternalSort(["a"], max_rows_in_memory=10)(iter(data)))
+    assert result == sorted(data, key=itemgetter("a"))
+
+
+def test_graph_sort_small_budget() -> None:
+    graph = Graph.graph_from_iter("data").sort(["a"], max_rows_in_memory=2)
+    data = [{"a": 3}, {"a": 1}, {"a": 2}, {"a": 1}, {"a": 0}]
+    assert list(graph.run(data=lambda: iter(data))) == [{"a": 0}, {"a": 1}, {"a": 1}, {"a": 2}, {"a": 3}]
+
+
+def test_external_sort_wrong_budget() -> None:
+    with pytest.raises(CompgraphException):
+        ExternalSort(["a"], max_rows_in_memory=0)
+    with pytest.raises(CompgraphException):
+        ExternalSort(["a"], batch_size=0)
+
+
+@pytest.mark.parametrize("use_shared_memory", [True, False], ids=["shared-memory", "pipe"])
+def test_external_sort_transports(use_shared_memory: bool) -> None:
+    data = [{"a": (i * 7919) % 1000, "payload": "x" * (i % 50)} for i in range(20000)]
+    result = list(ExternalSort(["a"], use_shared_memory=use_shared_memory)(iter(data)))
+    assert result == sorted(data, key=itemgetter("a"))
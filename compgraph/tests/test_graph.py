@@ -2,6 +2,7 @@ from pathlib import Path
 
 import compgraph.operations as ops
 import pytest
+from compgraph import CompgraphException
 from compgraph.graph import Graph
 from compgraph.operations import DummyMapper, FirstReducer
 
@@ -68,3 +69,30 @@ def test_multiple_runs() -> None:
     assert result1 != result2
     assert result1 == [{"a": 1}, {"a": 2}]
     assert result2 == [{"a": 2}, {"a": 1}]
+
+
+def test_hash_join() -> None:
+    graph1 = Graph.graph_from_iter("data1")
+    graph2 = Graph.graph_from_iter("data2")
+    graph = graph1.join(ops.LeftJoiner(), graph2, ["a"], strategy="hash")
+    data1 = [{"a": 2, "b": 1}, {"a": 1, "b": 2}]
+    data2 = [{"a": 1, "b": 3}]
+    result = list(graph.run(data1=lambda: iter(data1), data2=lambda: iter(data2)))
+    assert result == [{"a": 2, "b_1": 1}, {"a": 1, "b_1": 2, "b_2": 3}]
+
+
+def test_unknown_join_strategy() -> None:
+    with pytest.raises(CompgraphException):
+        Graph.graph_from_iter("data1").join(ops.InnerJoiner(), Graph.graph_from_iter("data2"), ["a"], strategy="x")
+
+
+def test_broadcast_join() -> None:
+    graph1 = Graph.graph_from_iter("data1")
+    graph2 = Graph.graph_from_iter("data2")
+    graph = graph1.join(ops.InnerJoiner(), graph2, [], strategy="broadcast")
+    data1 = [{"a": 2}, {"a": 1}]
+    data2 = [{"total": 3}]
+    result = list(graph.run(data1=lambda: iter(data1), data2=lambda: iter(data2)))
+    assert result == [{"a": 2, "total": 3}, {"a": 1, "total": 3}]
+    with pytest.raises(CompgraphException):
+        graph1.join(ops.InnerJoiner(), graph2, ["a"], strategy="broadcast")
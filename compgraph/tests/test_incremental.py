@@ -0,0 +1,111 @@
+import json
+import os
+import random
+import typing as tp
+from pathlib import Path
+
+import pytest
+
+from compgraph import CompgraphException, algorithms, operations as ops
+from compgraph.incremental import CountState
+
+
+def _docs(count: int, seed: int) -> list[ops.TRow]:
+    rng = random.Random(seed)
+    words = ["Alpha,", "beta", "gamma!", "Delta", "epsilon", "zeta.", "eta", "theta"] + \
+        [f"word{i}" for i in range(3000)]
+    return [{"doc_id": i, "text": " ".join(rng.choice(words) for _ in range(rng.randint(1, 20)))}
+            for i in range(count)]
+
+
+@pytest.mark.parametrize("mode", [{}, {"columnar": True}, {"compact": True}])
+def test_incremental_word_count_equals_full_run(tmp_path: Path, mode: dict[str, tp.Any]) -> None:
+    days = [_docs(500, seed) for seed in range(3)] + [[]]
+    graph = algorithms.word_count_incremental_graph("docs", str(tmp_path / "state"))
+    seen: list[ops.TRow] = []
+    for docs in days:
+        seen += docs
+        result = list(graph.run(docs=lambda: iter(docs), **mode))
+        assert result == list(algorithms.word_count_graph("docs").run(docs=lambda: iter(seen)))
+    assert os.listdir(tmp_path) == ["state"]
+
+
+def test_count_state_is_compact(tmp_path: Path) -> None:
+    state = CountState(str(tmp_path / "state"))
+    rows = [{"text": f"word{i:05}", "count": i} for i in range(5000)]
+    assert list(state.write(iter(rows))) == rows
+    state.commit()
+    assert list(state.read()) == rows
+    json_size = sum(len(json.dumps(row)) + 1 for row in rows)
+    assert os.path.getsize(state.path) < json_size / 2
+    with pytest.raises(CompgraphException):
+        list(CountState(state.path, "word", "count").read())
+
+
+def _failing(rows: list[ops.TRow], count: int) -> ops.TRowsGenerator:
+    yield from rows[:count]
+    raise ZeroDivisionError
+
+
+def test_failed_run_keeps_state(tmp_path: Path) -> None:
+    state = CountState(str(tmp_path / "state"))
+    rows: list[ops.TRow] = [{"text": f"word{i:05}", "count": i} for i in range(5000)]
+    list(state.write(iter(rows)))
+    state.commit()
+    graph = algorithms.word_count_incremental_graph("docs", state.path)
+    with pytest.raises(ZeroDivisionError):
+        list(graph.run(docs=lambda: _failing(_docs(200, 0), 100)))
+    with pytest.raises(ZeroDivisionError):
+        list(state.write(_failing(rows, 3000)))
+    assert list(state.read()) == rows and os.listdir(tmp_path) == ["state"]
+
+
+def test_state_is_committed_when_output_is_exhausted(tmp_path: Path) -> None:
+    docs = _docs(500, 0)
+    graph = algorithms.word_count_incremental_graph("docs", str(tmp_path / "state"))
+    expected = list(algorithms.word_count_graph("docs").run(docs=lambda: iter(docs)))
+    with pytest.raises(ZeroDivisionError):
+        for _ in graph.run(docs=lambda: iter(docs)):
+            raise ZeroDivisionError  # output of the run fails to be written
+    assert not os.path.exists(tmp_path / "state")
+    assert list(graph.run(docs=lambda: iter(docs))) == expected
+    assert list(graph.run(docs=lambda: iter([]))) == expected
+
+
+
+def test_stale_staged_state_is_not_committed(tmp_path: Path) -> None:
+    state = CountState(str(tmp_path / "state"))
+    rows: list[ops.TRow] = [{"text": "word", "count": 1}]
+    Path(state.staged_path).write_bytes(b"left by a crashed run")
+    state.commit()
+    assert os.listdir(tmp_path) == ["state.tmp"]
+    with pytest.raises(ZeroDivisionError):
+        list(state.write(_failing(rows, 0)))
+    state.commit()
+    assert os.listdir(tmp_path) == []
+    list(state.write(iter(rows)))
+    state.commit()
+    state.commit()
+    assert list(state.read()) == rows and os.listdir(tmp_path) == ["state"]
+
+
+def test_resumed_run_commits_state(tmp_path: Path) -> None:
+    docs = _docs(500, 0)
+    graph = algorithms.word_count_incremental_graph("docs", str(tmp_path / "state"))
+    expected = list(algorithms.word_count_graph("docs").run(docs=lambda: iter(docs)))
+    work_dir = str(tmp_path / "work")
+    with pytest.raises(ZeroDivisionError):
+        for _ in graph.run(checkpoint_dir=work_dir, docs=lambda: iter(docs)):
+            raise ZeroDivisionError
+    # sorts after the state is written are not checkpointed, resumed run (e.g. of a new process) writes
+    # and commits state again
+    graph = algorithms.word_count_incremental_graph("docs", str(tmp_path / "state"))
+    assert list(graph.run(checkpoint_dir=work_dir, resume=True, docs=lambda: iter(docs))) == expected
+    assert list(graph.run(docs=lambda: iter([]))) == expected
+
+
+def test_merge_joiner() -> None:
+    left = [{"key": 1, "sum": 2}, {"key": 3, "sum": 1}]
+    right = [{"key": 1, "sum": 5}, {"key": 2, "sum": 1}]
+    result = list(ops.Join(ops.MergeJoiner(ops.Sum("sum")), ["key"])(iter(left), iter(right)))
+    assert result == [{"key": 1, "sum": 7}, {"key": 2, "sum": 1}, {"key": 3, "sum": 1}]
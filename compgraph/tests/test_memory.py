@@ -0,0 +1,182 @@
+import os
+import random
+import typing as tp
+from multiprocessing import connection
+from operator import itemgetter
+from pathlib import Path
+
+import pytest
+
+from compgraph import CompgraphException, operations as ops, worker_pool
+from compgraph.external_sort import ExternalSort, sort_rows
+from compgraph.graph import Graph
+from compgraph import memory
+from compgraph.memory import MIN_RUN_ROWS, MemoryGovernor, Reservation, RowBuffer, current_rss, row_size
+from compgraph.spill import SpillFile
+
+
+def _rows(count: int, seed: int = 0) -> list[ops.TRow]:
+    rng = random.Random(seed)
+    return [{"key": rng.randint(0, 20), "value": rng.random(), "i": i} for i in range(count)]
+
+
+def test_governor_budget() -> None:
+    assert MemoryGovernor(1000, baseline=0).budget == 1000
+    assert MemoryGovernor(current_rss() + 2 ** 20).budget <= 2 ** 20
+    with pytest.raises(CompgraphException):
+        MemoryGovernor(1000, baseline=1000)
+
+
+def test_row_buffer_spills_when_governor_asks(tmp_path: Path) -> None:
+    rows = _rows(2000)
+    governor = MemoryGovernor(300 * row_size(rows[0]), baseline=0)
+    with RowBuffer(governor, directory=str(tmp_path)) as buffer:
+        buffer.extend(rows)
+        assert len(buffer) == len(rows) and os.listdir(tmp_path)
+        # buffer below MIN_RUN_ROWS rows spills once it has that many
+        assert governor.used <= governor.budget + MIN_RUN_ROWS * row_size(rows[0]) and governor.spills > 0
+        assert list(buffer) == rows and list(buffer) == rows
+    assert governor.used == 0 and os.listdir(tmp_path) == []
+
+
+def test_governor_spills_largest_holder_first() -> None:
+    rows = _rows(2500)
+    governor = MemoryGovernor(2600 * row_size(rows[0]), baseline=0)
+    with RowBuffer(governor) as large, RowBuffer(governor) as small:
+        spilled_before = SpillFile.bytes_written
+        large.extend(rows[:2400])
+        small.extend(rows[2400:])
+        assert SpillFile.bytes_written == spilled_before
+        small.extend(rows[:256])
+        assert governor.spills == 1 and SpillFile.bytes_written > spilled_before
+        assert list(large) == rows[:2400] and list(small) == rows[2400:] + rows[:256]
+
+
+def test_governor_waits_for_requested_reservation() -> None:
+    rows = _rows(1000)
+    governor = MemoryGovernor(1100 * row_size(rows[0]), baseline=0)
+    reservation = Reservation(governor)
+    with RowBuffer(governor) as buffer:
+        reservation.reserve(900 * row_size(rows[0]))
+        spilled_before = SpillFile.bytes_written
+        buffer.extend(rows[:512])
+        # reservation is asked once, buffer is not spilled for memory reservation is about to free
+        assert reservation.spill_requested and governor.spills == 1
+        assert SpillFile.bytes_written == spilled_before
+        reservation.release()
+        buffer.extend(rows[512:])
+        assert governor.spills == 1 and list(buffer) == rows
+
+
+@pytest.mark.parametrize("key", [None, itemgetter("key")])
+def test_row_buffer_being_read_keeps_reservation(key: tp.Callable[[ops.TRow], tp.Any] | None) -> None:
+    rows = _rows(3000)
+    governor = MemoryGovernor(3500 * row_size(rows[0]), baseline=0)
+    with RowBuffer(governor, key) as read, RowBuffer(governor) as other:
+        read.extend(rows)
+        used = governor.used
+        reader = iter(read)
+        first = next(reader)
+        spilled_before = SpillFile.bytes_written
+        other.extend(rows[:MIN_RUN_ROWS])
+        # rows of buffer being read stay in memory and reserved, the other buffer spills instead
+        assert governor.used == used and SpillFile.bytes_written > spilled_before
+        assert [first, *reader] == (rows if key is None else sorted(rows, key=key))
+    assert governor.used == 0
+
+
+@pytest.mark.parametrize("budget_rows", [10, 300, 5000])
+def test_sort_rows_under_governor(tmp_path: Path, budget_rows: int) -> None:
+    rows = _rows(3000)
+    governor = MemoryGovernor(budget_rows * row_size(rows[0]), baseline=0)
+    result = list(sort_rows(iter(rows), ("key",), 1_000_000, str(tmp_path), governor))
+    assert result == sorted(rows, key=itemgetter("key"))  # stable
+    assert (governor.spills > 0) == (budget_rows < len(rows))
+    assert governor.used == 0 and os.listdir(tmp_path) == []
+
+
+def test_row_buffer_runs_under_tight_budget(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(memory, "MERGE_FAN_IN", 4)
+    rows = _rows(20000)
+    governor = MemoryGovernor(10 * row_size(rows[0]), baseline=0)
+    with RowBuffer(governor, itemgetter("key"), directory=str(tmp_path)) as buffer:
+        buffer.extend(rows)
+        assert len(os.listdir(tmp_path)) <= len(rows) // MIN_RUN_ROWS
+        assert list(buffer) == sorted(rows, key=itemgetter("key"))  # stable
+        assert len(os.listdir(tmp_path)) <= 4
+        assert list(buffer) == sorted(rows, key=itemgetter("key"))
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("joiner", [ops.InnerJoiner(), ops.OuterJoiner(), ops.LeftJoiner(), ops.RightJoiner()])
+def test_join_spills_groups(joiner: ops.Joiner) -> None:
+    # buffered groups are longer than MIN_RUN_ROWS to be spilled: of left rows, and of right rows with key 3
+    left = sorted(({"key": i % 3, "left": i} for i in range(3300)), key=itemgetter("key"))
+    right = sorted([{"key": i % 4, "right": i} for i in range(30)] + [{"key": 3, "right": i} for i in range(1100)],
+                   key=itemgetter("key"))
+    expected = list(ops.Join(joiner, ["key"])(iter(left), iter(right)))
+    governor = MemoryGovernor(20 * row_size(left[0]), baseline=0)
+    spilled_before = SpillFile.bytes_written
+    assert list(ops.Join(joiner, ["key"])(iter(left), iter(right), governor=governor)) == expected
+    assert SpillFile.bytes_written > spilled_before and governor.used == 0
+
+
+def test_join_of_empty_input() -> None:
+    right = [{"key": 1, "value": 2}]
+    assert list(ops.Join(ops.InnerJoiner(), ["key"])(iter([]), iter(right))) == []
+    assert list(ops.Join(ops.OuterJoiner(), ["key"])(iter([]), iter(right))) == right
+
+
+@pytest.mark.parametrize("reducer, spills", [(ops.FirstReducer(), True), (ops.Sum("value"), False)])
+def test_hash_reduce_partitions_when_governor_asks(reducer: ops.Reducer, spills: bool) -> None:
+    rows = _rows(3000)
+    expected = list(ops.HashReduce(reducer, ["key"])(iter(rows)))
+    governor = MemoryGovernor(500 * row_size(rows[0]), baseline=0)
+    spilled_before = SpillFile.bytes_written
+    assert list(ops.HashReduce(reducer, ["key"])(iter(rows), governor=governor)) == expected
+    assert (SpillFile.bytes_written > spilled_before) == spills and governor.used == 0
+
+
+def test_hash_join_partitions_when_governor_asks() -> None:
+    left, right = _rows(300, seed=1), _rows(3000, seed=2)
+    join = ops.HashJoin(ops.InnerJoiner(), ["key"])
+    expected = list(join(iter(left), iter(right)))
+    governor = MemoryGovernor(500 * row_size(right[0]), baseline=0)
+    spilled_before = SpillFile.bytes_written
+    result = list(join(iter(left), iter(right), governor=governor))
+    assert sorted(result, key=itemgetter("i_1", "i_2")) == sorted(expected, key=itemgetter("i_1", "i_2"))
+    assert SpillFile.bytes_written > spilled_before and governor.used == 0
+
+
+def _send_rss(endpoint: connection.Connection) -> None:
+    endpoint.send(current_rss())
+
+
+def test_external_sort_spills_in_worker() -> None:
+    rows = _rows(20000)
+    with worker_pool.session() as pool:
+        worker = pool.acquire()
+        worker.submit(_send_rss)
+        worker_rss = worker.endpoint.recv()
+        pool.release(worker)
+        # sort takes the same warm worker, its buffer may take 1 MiB
+        governor = MemoryGovernor(worker_rss + 2 ** 20, baseline=0)
+        spilled_before = SpillFile.bytes_written
+        assert list(ExternalSort(["key"])(iter(rows), governor=governor)) == sorted(rows, key=itemgetter("key"))
+        assert SpillFile.bytes_written > spilled_before
+
+
+def test_run_with_memory_limit() -> None:
+    left = [{"key": i % 3, "left": i} for i in range(3300)]
+    right = [{"key": i % 3, "right": i} for i in range(30)]
+    graph = Graph.graph_from_iter("left").sort(["key"]) \
+        .join(ops.InnerJoiner(), Graph.graph_from_iter("right").sort(["key"]), ["key"]) \
+        .aggregate(ops.Count("count"), ["key"])
+    expected = list(graph.run(left=lambda: iter(left), right=lambda: iter(right)))
+    assert expected == [{"key": key, "count": 11000} for key in range(3)]
+    spilled_before = SpillFile.bytes_written
+    assert list(graph.run(memory_limit=current_rss() + 2 ** 16, left=lambda: iter(left),
+                          right=lambda: iter(right))) == expected
+    assert SpillFile.bytes_written > spilled_before
+    with pytest.raises(CompgraphException):
+        list(graph.run(memory_limit=2 ** 20, left=lambda: iter(left), right=lambda: iter(right)))
@@ -1,9 +1,12 @@
 import dataclasses
+import json
 import typing as tp
 
 import pytest
 
 import compgraph.operations as ops
+from compgraph import CompgraphException
+from compgraph.spill import SpillFile
 
 
 @dataclasses.dataclass
@@ -253,3 +256,247 @@ def test_tricky_joiner(case: JoinCase) -> None:
     result = ops.Join(case.joiner, case.join_keys)(iter(case.data_left), iter(case.data_right))
     assert isinstance(result, tp.Iterator)
     assert [*result] == case.ground_truth
+
+
+def _sorted_rows(rows: tp.Iterable[ops.TRow]) -> list[ops.TRow]:
+    return sorted(rows, key=lambda row: sorted((key, repr(value)) for key, value in row.items()))
+
+
+@pytest.mark.parametrize("joiner_type", [ops.InnerJoiner, ops.LeftJoiner, ops.RightJoiner, ops.OuterJoiner])
+@pytest.mark.parametrize("max_rows_in_memory", [3, 1000], ids=["partitioned", "in-memory"])
+def test_hash_join_matches_merge_join(joiner_type: tp.Type[ops.Joiner], max_rows_in_memory: int) -> None:
+    left = [{"key": (i * 7) % 10, "value": i, "side": "left"} for i in range(30)]
+    right = [{"key": (i * 3) % 13, "other": i, "side": "right"} for i in range(20)]
+    expected = ops.Join(joiner_type(), ["key"])(sorted(left, key=lambda row: row["key"]),
+                                                sorted(right, key=lambda row: row["key"]))
+    result = ops.HashJoin(joiner_type(), ["key"], max_rows_in_memory=max_rows_in_memory, partitions=4)(
+        iter(left), iter(right))
+    assert _sorted_rows(result) == _sorted_rows(expected)
+
+
+def test_hash_join_keeps_left_order() -> None:
+    left = [{"key": 3, "a": 1}, {"key": 1, "a": 2}, {"key": 2, "a": 3}, {"key": 1, "a": 4}]
+    right = [{"key": 1, "b": 1}, {"key": 3, "b": 3}, {"key": 5, "b": 5}]
+    result = ops.HashJoin(ops.OuterJoiner(), ["key"])(iter(left), iter(right))
+    assert list(result) == [
+        {"key": 3, "a": 1, "b": 3},
+        {"key": 1, "a": 2, "b": 1},
+        {"key": 2, "a": 3},
+        {"key": 1, "a": 4, "b": 1},
+        {"key": 5, "b": 5},
+    ]
+
+
+@pytest.mark.parametrize("joiner_type", [ops.InnerJoiner, ops.LeftJoiner, ops.RightJoiner, ops.OuterJoiner])
+def test_hash_join_builds_smaller_side(joiner_type: tp.Type[ops.Joiner]) -> None:
+    left = [{"key": i % 5, "value": i} for i in range(8)]
+    right = [{"key": i % 7, "other": i} for i in range(2000)]
+    expected = ops.Join(joiner_type(), ["key"])(sorted(left, key=lambda row: row["key"]),
+                                                sorted(right, key=lambda row: row["key"]))
+    spilled_before = SpillFile.bytes_written
+    result = list(ops.HashJoin(joiner_type(), ["key"], max_rows_in_memory=100)(iter(left), iter(right)))
+    assert SpillFile.bytes_written == spilled_before  # left side fits in memory, right one is streamed
+    assert _sorted_rows(result) == _sorted_rows(expected)
+    streamed = [row["other"] for row in result]
+    assert streamed == sorted(streamed)  # output keeps order of streamed right rows
+
+
+@pytest.mark.parametrize("left, right", [([], [{"key": 1, "b": 1}]), ([{"key": 1, "a": 1}], [])],
+                         ids=["empty-left", "empty-right"])
+def test_hash_join_empty_side(left: list[ops.TRow], right: list[ops.TRow]) -> None:
+    assert list(ops.HashJoin(ops.OuterJoiner(), ["key"])(iter(left), iter(right))) == left + right
+    assert list(ops.HashJoin(ops.InnerJoiner(), ["key"])(iter(left), iter(right))) == []
+
+
+@pytest.mark.parametrize("joiner_type", [ops.InnerJoiner, ops.LeftJoiner, ops.RightJoiner, ops.OuterJoiner])
+@pytest.mark.parametrize("n_left, n_right", [(5, 1), (5, 3), (1, 4)])
+def test_broadcast_join_matches_merge_join(joiner_type: tp.Type[ops.Joiner], n_left: int, n_right: int) -> None:
+    left = [{"doc_id": i, "count": i} for i in range(n_left)]
+    right = [{"total": i, "count": -i} for i in range(n_right)]
+    expected = ops.Join(joiner_type(), [])(iter(left), iter(right))
+    result = ops.BroadcastJoin(joiner_type())(iter(left), iter(right))
+    assert _sorted_rows(result) == _sorted_rows(expected)
+
+
+@pytest.mark.parametrize("joiner, left, right, expected", [
+    (ops.InnerJoiner(), [], [{"b": 1}], []),
+    (ops.RightJoiner(), [], [{"b": 1}], [{"b": 1}]),
+    (ops.LeftJoiner(), [{"a": 1}], [], [{"a": 1}]),
+    (ops.InnerJoiner(), [{"a": 1}], [], []),
+])
+def test_broadcast_join_empty_side(joiner: ops.Joiner, left: list[ops.TRow], right: list[ops.TRow],
+                                   expected: list[ops.TRow]) -> None:
+    assert list(ops.BroadcastJoin(joiner)(iter(left), iter(right))) == expected
+
+
+def test_broadcast_join_streams_left() -> None:
+    left = ({"doc_id": i} for i in range(10))
+    result = ops.BroadcastJoin(ops.InnerJoiner())(left, iter([{"total": 10}]))
+    assert list(result) == [{"doc_id": i, "total": 10} for i in range(10)]
+
+
+def test_broadcast_join_too_big_right() -> None:
+    with pytest.raises(CompgraphException):
+        list(ops.BroadcastJoin(ops.InnerJoiner(), max_rows_in_memory=2)(iter([{"a": 1}]), iter([{"b": 1}] * 3)))
+
+
+@pytest.mark.parametrize("reducer, keys", [
+    (ops.Count("count"), ["a"]),
+    (ops.Count("count"), ["a", "b"]),
+    (ops.Sum("value"), ["a"]),
+    (ops.TermFrequency("b"), ["a"]),
+])
+@pytest.mark.parametrize("max_groups", [1, 3, 1000])
+def test_combine_then_merge_matches_reduce(reducer: ops.Reducer, keys: list[str], max_groups: int) -> None:
+    rows = [{"a": f"k{i % 7}", "b": i % 3, "value": i * 11 - 50} for i in range(100)]
+
+    def sort(data: ops.TRowsIterable) -> list[ops.TRow]:
+        return sorted(data, key=lambda row: tuple(row[key] for key in keys))
+
+    expected = list(ops.Reduce(reducer, keys)(sort(rows)))
+    combined = list(ops.Combine(reducer, keys, max_groups)(iter(rows)))
+    if max_groups == 1000:
+        assert len(combined) < len(rows)
+    result = list(ops.Reduce(reducer.merger(), keys)(sort(combined)))
+    assert result == expected
+    assert [list(row) for row in result] == [list(row) for row in expected]
+
+
+@pytest.mark.parametrize("reducer", [ops.Sum("value"), ops.AverageSpeed(time_column="time", distance_column="value")])
+@pytest.mark.parametrize("max_groups", [1, 2, 100])
+def test_combined_float_sums_are_exact(reducer: ops.Reducer, max_groups: int) -> None:
+    rows = [{"a": i % 3, "value": 0.1 * i + 1e-9 * (i % 7), "time": 0.3 * i + 1, "b": i} for i in range(300)]
+    # AverageSpeed changes last row of group
+    expected = list(ops.Reduce(reducer, ["a"])(sorted(map(dict, rows), key=lambda row: row["a"])))
+    combined = list(ops.Combine(reducer, ["a"], max_groups)(iter(rows)))
+    assert list(ops.Reduce(reducer.merger(), ["a"])(sorted(combined, key=lambda row: row["a"]))) == expected
+
+
+@pytest.mark.parametrize("reducer, keys", [
+    (ops.Count("count"), ["a"]),
+    (ops.Sum("value"), ["a", "b"]),
+    (ops.TermFrequency("b"), ["a"]),
+    (ops.AverageSpeed(time_column="time", distance_column="value"), ["a"]),
+    (ops.TopN("value", 2), ["a"]),
+    (ops.FirstReducer(), ["b"]),
+])
+@pytest.mark.parametrize("max_rows_in_memory", [2, 10, 1000])
+def test_hash_reduce_matches_sort_and_reduce(reducer: ops.Reducer, keys: list[str], max_rows_in_memory: int) -> None:
+    rows = [{"a": f"k{i * 5 % 7}", "b": i % 3, "value": 0.1 * i - 3, "time": i % 4 + 1} for i in range(100)]
+    expected = list(ops.Reduce(reducer, keys)(sorted(map(dict, rows), key=lambda row: tuple(row[key] for key in keys))))
+    result = list(ops.HashReduce(reducer, keys, max_rows_in_memory, partitions=3)(iter(rows)))
+    assert result == expected
+    assert [list(row) for row in result] == [list(row) for row in expected]
+
+
+JSON_LINES = [
+    '{"doc_id": 1, "text": "Hello, world! \\u00e9\\u00e8", "x": 0.1}',
+    '{"edge_id": 8414926848168493057, "start": [37.84870228730142, 55.73853974696249]}',
+    '{"big": 123456789012345678901234567890, "neg": -9999999999999999999}',
+    '{"nan": NaN, "inf": -Infinity, "huge": 1e400}',
+    '{"a": 1, "a": 2}\r',
+    '{"text": "' + "long text " * 50 + '"}',
+]
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 1 << 20])
+@pytest.mark.parametrize("with_orjson", [True, False])
+@pytest.mark.parametrize("last_newline", ["\n", ""])
+def test_read_json_lines_matches_read(tmp_path: tp.Any, monkeypatch: pytest.MonkeyPatch, block_size: int,
+                                      with_orjson: bool, last_newline: str) -> None:
+    if not with_orjson:
+        monkeypatch.setattr("compgraph.operations.operation_impl.orjson", None)
+    path = tmp_path / "rows.jsonl"
+    path.write_bytes(("\n".join(JSON_LINES) + last_newline).encode())
+    expected = list(ops.Read(str(path), json.loads)())
+    result = list(ops.ReadJsonLines(str(path), block_size)())
+    assert repr(result) == repr(expected)
+
+
+def test_read_json_lines_invalid_line(tmp_path: tp.Any) -> None:
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"a": 1}\n{"a": \n')
+    with pytest.raises(ValueError):
+        list(ops.ReadJsonLines(str(path))())
+
+
+@pytest.mark.parametrize("content", [
+    b"",
+    ("\n".join(JSON_LINES) + "\n").encode(),
+    ("\n".join(JSON_LINES)).encode(),
+    b'{"a": 1}\r\n{"a": 2}\r{"a": 3}\n',
+    b'{"text": "' + b"x" * 1000 + b'"}\n{"a": 1}\n',
+])
+@pytest.mark.parametrize("block_size", [1, 16, 1 << 16])
+def test_read_mmap_matches_read(tmp_path: tp.Any, content: bytes, block_size: int) -> None:
+    path = tmp_path / "rows.jsonl"
+    path.write_bytes(content)
+    parsers: list[tp.Callable[[str], ops.TRow]] = [tp.cast(tp.Callable[[str], ops.TRow], str), json.loads]
+    for parser in parsers:
+        expected = list(ops.Read(str(path), parser)())
+        assert repr(list(ops.ReadMmap(str(path), parser, block_size)())) == repr(expected)
+    if b"\r" not in content:
+        expected = list(ops.ReadJsonLines(str(path))())
+        assert repr(list(ops.ReadMmap(str(path), None, block_size)())) == repr(expected)
+
+
+def test_read_mmap_stops_early(tmp_path: tp.Any) -> None:
+    path = tmp_path / "rows.jsonl"
+    path.write_text('{"a": 1}\n{"a": 2}\n')
+    rows = ops.ReadMmap(str(path))()
+    assert next(rows) == {"a": 1}
+    rows.close()
+
+
+@pytest.mark.parametrize("text", ["Hello, World!  hello", "", "   ", " lead", "trail \t", "one", "a-b\\c\nD_e",
+                                  "ÀÉ İß «x»", "...  ,"])
+def test_tokenize_matches_mapper_chain(text: str) -> None:
+    rows = [{"doc_id": 1, "text": text, "n": 2}]
+    chain = ops.FusedMap([ops.FilterPunctuation("text"), ops.LowerCase("text"), ops.Split("text")])
+    expected = list(chain(iter(rows)))
+    actual = list(ops.Map(ops.Tokenize("text"))(iter(rows)))
+    assert actual == expected
+    assert [list(row) for row in actual] == [list(row) for row in expected]
+
+
+class _Shout(ops.LowerCase):
+    def __call__(self, row: ops.TRow) -> ops.TRowsGenerator:
+        yield {**row, "text": row["text"].upper()}
+
+
+class _Repeat(ops.Mapper):
+    def __init__(self, times: int) -> None:
+        self.times = times
+
+    def __call__(self, row: ops.TRow) -> ops.TRowsGenerator:
+        for _ in range(self.times):
+            yield row
+
+
+def test_fused_map_runs_overridden_call() -> None:
+    rows: list[ops.TRow] = [{"text": "Hello"}]
+    assert list(ops.FusedMap([ops.DummyMapper(), _Shout("text")])(iter(rows))) == [{"text": "HELLO"}]
+    # map_one of mapper which does not define it maps row by __call__
+    assert _Repeat(1).map_one(rows[0]) == rows[0] and _Repeat(0).map_one(rows[0]) is None
+    with pytest.raises(CompgraphException):
+        _Repeat(2).map_one(rows[0])
+
+
+def test_tokenize_drops_short_and_stop_words() -> None:
+    rows = [{"text": "The quick, brown fox: THE lazy dog"}]
+    mapper = ops.Tokenize("text", min_length=4, stop_words={"lazy"})
+    assert [row["text"] for row in ops.Map(mapper)(iter(rows))] == ["quick", "brown"]
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["dicts", "records"])
+def test_fused_map_matches_chain_of_maps(compact: bool) -> None:
+    rows = [{"doc_id": i, "text": f"Hello, World {i}!", "n": i % 3} for i in range(20)]
+    mappers = [ops.FilterPunctuation("text"), ops.LowerCase("text"), ops.Filter(lambda row: row["n"] > 0),
+               ops.Product(["n", "doc_id"], "product"), ops.Split("text"), ops.DummyMapper(),
+               ops.Project(["doc_id", "text", "product"])]
+    source = list(ops.to_records(rows)) if compact else rows
+    expected: ops.TRowsIterable = source
+    for mapper in mappers:
+        expected = ops.Map(mapper)(expected)
+    assert list(ops.FusedMap(mappers)(iter(source))) == list(expected)
+    assert source[0] == {"doc_id": 0, "text": "Hello, World 0!", "n": 0}  # input rows are not changed
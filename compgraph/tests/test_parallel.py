@@ -0,0 +1,168 @@
+import json
+import multiprocessing
+import typing as tp
+
+import pytest
+
+from compgraph import CompgraphException, algorithms, operations as ops
+from compgraph.graph import Graph
+from compgraph.parallel import ParallelMap, PartitionedReduce, ParallelRead, line_ranges
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, 1), (2, 3), (4, 100), (3, 10000)])
+def test_parallel_map_keeps_order(workers: int, chunk_size: int) -> None:
+    data = [{"doc_id": i, "text": f"Hello, World! {i}"} for i in range(1000)]
+    expected = list(ops.Map(ops.Split("text"))(ops.Map(ops.FilterPunctuation("text"))(iter(data))))
+    graph = Graph.graph_from_iter("data") \
+        .map(ops.FilterPunctuation("text"), workers=workers, chunk_size=chunk_size) \
+        .map(ops.Split("text"), workers=workers, chunk_size=chunk_size)
+    assert list(graph.run(data=lambda: iter(data))) == expected
+
+
+def test_parallel_map_with_unpicklable_mapper() -> None:
+    data = [{"a": i} for i in range(100)]
+    result = ParallelMap(ops.Filter(lambda row: row["a"] % 2 == 0), workers=2, chunk_size=7)(iter(data))
+    assert list(result) == data[::2]
+
+
+@pytest.fixture
+def spawn_by_default() -> tp.Generator[None, None, None]:
+    method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method("spawn", force=True)
+    yield
+    multiprocessing.set_start_method(method, force=True)
+
+
+@pytest.mark.usefixtures("spawn_by_default")
+def test_parallel_map_forks_under_spawn_default() -> None:
+    data = [{"a": i} for i in range(100)]
+    result = ParallelMap(ops.Filter(lambda row: row["a"] % 2 == 0), workers=2, chunk_size=7)(iter(data))
+    assert list(result) == data[::2]
+
+
+def test_parallel_map_needs_fork(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    with pytest.raises(CompgraphException):
+        ParallelMap(ops.DummyMapper(), workers=2)
+
+
+def test_parallel_map_empty_input() -> None:
+    assert list(ParallelMap(ops.DummyMapper(), workers=2)(iter([]))) == []
+
+
+def test_parallel_map_error() -> None:
+    with pytest.raises(KeyError):
+        list(ParallelMap(ops.LowerCase("missing"), workers=2)(iter([{"a": 1}])))
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(0, 1), (1, 0)])
+def test_parallel_map_wrong_arguments(workers: int, chunk_size: int) -> None:
+    with pytest.raises(CompgraphException):
+        ParallelMap(ops.DummyMapper(), workers=workers, chunk_size=chunk_size)
+
+
+@pytest.mark.parametrize("reducer, keys", [
+    (ops.Count("count"), ("text",)),
+    (ops.Sum("value"), ("doc_id", "text")),
+    (ops.TermFrequency("text"), ("doc_id",)),
+    (ops.TopN("value", 2), ("text",)),
+    (ops.FirstReducer(), ("doc_id", "text")),
+], ids=["count", "sum", "tf", "top", "first"])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_partitioned_reduce(reducer: ops.Reducer, keys: tuple[str, ...], workers: int) -> None:
+    data = [{"doc_id": i % 7, "text": f"word{i % 11}", "value": (i * 31) % 17} for i in range(500)]
+    expected = list(ops.Reduce(reducer, keys)(sorted(data, key=lambda row: tuple(row[k] for k in keys))))
+    graph = Graph.graph_from_iter("data").reduce(reducer, keys, workers=workers)
+    assert list(graph.run(data=lambda: iter(data))) == expected
+
+
+def test_partitioned_reduce_small_budget() -> None:
+    data = [{"text": f"word{i % 13}"} for i in range(1000)]
+    result = PartitionedReduce(ops.Count("count"), ["text"], workers=2, max_rows_in_memory=10, batch_size=3)(data)
+    assert list(result) == [{"count": 77 if i < 12 else 76, "text": f"word{i}"}
+                            for i in sorted(range(13), key=lambda i: f"word{i}")]
+
+
+def test_partitioned_reduce_error() -> None:
+    with pytest.raises(CompgraphException):
+        list(PartitionedReduce(ops.Sum("value"), ["key"], workers=2)(iter([{"key": 1, "value": 1}, {"key": 2}])))
+
+
+@pytest.mark.parametrize("keys, workers", [((), 2), (("a",), 0)])
+def test_partitioned_reduce_wrong_arguments(keys: tuple[str, ...], workers: int) -> None:
+    with pytest.raises(CompgraphException):
+        PartitionedReduce(ops.FirstReducer(), keys, workers=workers)
+
+
+@pytest.fixture
+def docs_file(tmp_path: tp.Any) -> str:
+    path = tmp_path / "docs.jsonl"
+    path.write_text("".join(json.dumps({"doc_id": i, "text": f"Hello, World! \u00e9 {i % 7}"}) + "\n"
+                            for i in range(300)) + '{"doc_id": 300, "text": "last line without newline"}')
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 100, 1 << 20])
+def test_line_ranges_cover_file(docs_file: str, chunk_bytes: int) -> None:
+    ranges = list(line_ranges(docs_file, chunk_bytes))
+    with open(docs_file, "rb") as f:
+        data = f.read()
+    assert b"".join(data[start:end] for start, end in ranges) == data
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges[:-1])
+
+
+@pytest.mark.parametrize("parser", [json.loads, None])
+@pytest.mark.parametrize("workers, chunk_bytes", [(1, 1), (2, 100), (3, 1 << 20)])
+def test_parallel_read_keeps_order(docs_file: str, parser: tp.Callable[[str], ops.TRow] | None, workers: int,
+                                   chunk_bytes: int) -> None:
+    expected = list(ops.Read(docs_file, json.loads)())
+    assert list(ParallelRead(docs_file, parser, workers, chunk_bytes)()) == expected
+
+
+def test_maps_run_in_read_workers(docs_file: str) -> None:
+    expected = list(algorithms.word_count_graph(docs_file, from_file=True).run())
+    graph = Graph.graph_from_json_lines(docs_file, workers=2, chunk_bytes=500) \
+        .map(ops.FilterPunctuation("text")) \
+        .map(ops.LowerCase("text")) \
+        .map(ops.Split("text")) \
+        .sort(["text"]) \
+        .reduce(ops.Count("count"), ["text"]) \
+        .sort(["count", "text"])
+    plan = graph.explain()
+    assert "ParallelRead(" in plan and "maps=[FilterPunctuation, LowerCase, Split]" in plan
+    assert "Map(" not in plan
+    assert list(graph.run()) == expected
+
+
+def test_shared_parallel_read_keeps_maps_in_place(docs_file: str) -> None:
+    source = Graph.graph_from_file(docs_file, json.loads, workers=2, chunk_bytes=500)
+    ids = Graph.graph_from_another_graph(source).map(ops.Project(["doc_id"]))
+    graph = source.map(ops.LowerCase("text")).join(ops.InnerJoiner(), ids, ["doc_id"], strategy="hash")
+    assert "maps=" not in graph.explain()
+    expected = [{**row, "text": row["text"].lower()} for row in ops.Read(docs_file, json.loads)()]
+    assert list(graph.run()) == expected
+
+
+@pytest.mark.usefixtures("spawn_by_default")
+def test_parallel_read_forks_under_spawn_default(docs_file: str) -> None:
+    graph = Graph.graph_from_file(docs_file, lambda line: tp.cast(ops.TRow, json.loads(line)), workers=2,
+                                  chunk_bytes=64).map(ops.Filter(lambda row: row["doc_id"] % 2 == 0))
+    assert "maps=[Filter]" in graph.explain()
+    assert list(graph.run()) == [row for row in ops.Read(docs_file, json.loads)() if row["doc_id"] % 2 == 0]
+
+
+def test_parallel_read_needs_fork(docs_file: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    with pytest.raises(CompgraphException):
+        ParallelRead(docs_file, None, workers=2)
+
+
+def test_parallel_read_error(docs_file: str) -> None:
+    with pytest.raises(KeyError):
+        list(ParallelRead(docs_file, json.loads, workers=2, mappers=[ops.LowerCase("missing")])())
+
+
+@pytest.mark.parametrize("workers, chunk_bytes", [(0, 1), (1, 0)])
+def test_parallel_read_wrong_arguments(docs_file: str, workers: int, chunk_bytes: int) -> None:
+    with pytest.raises(CompgraphException):
+        ParallelRead(docs_file, None, workers=workers, chunk_bytes=chunk_bytes)
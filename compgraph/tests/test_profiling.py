@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from compgraph import algorithms, operations as ops
+from compgraph.graph import Graph
+
+
+def _docs(count: int) -> list[ops.TRow]:
+    return [{"doc_id": i, "text": f"Hello, world {i % 7}! hello"} for i in range(count)]
+
+
+def test_profile_counts_rows_of_every_operation(capsys: pytest.CaptureFixture[str]) -> None:
+    docs = _docs(100)
+    graph = algorithms.word_count_graph("docs")
+    expected = list(graph.run(docs=lambda: iter(docs)))
+    assert graph.last_profile is None
+    assert list(graph.run(profile=True, docs=lambda: iter(docs))) == expected
+    assert graph.last_profile is not None
+    report = graph.last_profile.report()
+    assert [row["operation"] for row in report] == [line.split(" order=")[0].split(" -- ")[0].strip()
+                                                     for line in graph.explain().splitlines()]
+    assert [row["depth"] for row in report] == list(range(len(report)))
+    source, tokenize = report[-1], report[-2]
+    assert (source["rows_in"], source["rows_out"]) == (0, 100)
+    assert (tokenize["rows_in"], tokenize["rows_out"]) == (100, 400)
+    assert report[0]["rows_out"] == len(expected)
+    assert all(row["wall_time"] >= 0 and row["cpu_time"] >= 0 for row in report)
+    assert json.loads(graph.last_profile.to_json()) == report
+    table = capsys.readouterr().err
+    assert "Map(Tokenize)" in table and "rows out" in table
+
+
+def test_profile_shared_and_joined_operations() -> None:
+    docs = _docs(30)
+    graph = algorithms.inverted_index_graph("docs")
+    list(graph.run(profile=True, docs=lambda: iter(docs)))
+    assert graph.last_profile is not None
+    report = graph.last_profile.report()
+    sources = [row for row in report if row["operation"] == "ReadIterFactory('docs')"]
+    assert len(sources) == 1 and sources[0]["rows_out"] == 30
+    joins = [row for row in report if row["operation"].startswith("Join(")]
+    assert joins and all(row["rows_in"] > row["rows_out"] > 0 for row in joins)
+
+
+def test_profile_columnar_chain() -> None:
+    rows = [{"a": i % 5, "b": i, "c": 2} for i in range(50)]
+    graph = Graph.graph_from_iter("data") \
+        .map(ops.Product(["b", "c"], "d")) \
+        .sort(["a"]) \
+        .reduce(ops.Sum("d"), ["a"]) \
+        .map(ops.Product(["d", "a"], "e"))
+    list(graph.run(columnar=True, profile=True, data=lambda: iter(rows)))
+    assert graph.last_profile is not None
+    assert graph.last_profile.report()[1]["operation"].startswith("ColumnarReduce")  # its batches are counted
+    assert [(row["rows_in"], row["rows_out"]) for row in graph.last_profile.report()] == \
+        [(5, 5), (5, 5), (5, 5), (50, 5), (50, 50), (0, 50)]
+
+
+def test_profile_counts_spilled_bytes() -> None:
+    rows = [{"key": i % 13, "value": f"{i:0100}"} for i in range(2000)]
+    graph = Graph.graph_from_iter("data").sort(["key"], max_rows_in_memory=100)
+    list(graph.run(profile=True, data=lambda: iter(rows)))
+    assert graph.last_profile is not None
+    sort, source = graph.last_profile.report()
+    assert sort["spilled_bytes"] > 2000 * 100 and source["spilled_bytes"] == 0
@@ -0,0 +1,105 @@
+import pickle
+import random
+import typing as tp
+
+import pytest
+
+from compgraph import algorithms, operations as ops
+from compgraph.graph import Graph
+
+
+def _docs(count: int) -> list[ops.TRow]:
+    rng = random.Random(11)
+    words = ["Alpha,", "beta", "gamma!", "Delta", "epsilon", "zeta.", "eta", "theta"]
+    return [{"doc_id": i, "text": " ".join(rng.choice(words) for _ in range(rng.randint(1, 30)))}
+            for i in range(count)]
+
+
+def test_record_reads_like_dict() -> None:
+    row = {"a": 1, "b": "x", "c": [1, 2]}
+    record = ops.Record.from_row(row)
+    assert record == row and row == record
+    assert record["b"] == "x" and record.get("d", 5) == 5 and "c" in record and "d" not in record
+    assert list(record) == list(row) and list(record.items()) == list(row.items()) and len(record) == 3
+    assert {**record, "d": 4} == {**row, "d": 4}
+    assert record.keys() & {"a", "d"} == {"a"}
+    copy = record.copy()
+    copy["a"] = 2
+    assert type(copy) is dict and record["a"] == 1
+    with pytest.raises(KeyError):
+        record["d"]
+    with pytest.raises(TypeError):
+        record["a"] = 2  # type: ignore[index]
+
+
+def test_records_share_schema() -> None:
+    records = list(ops.to_records([{"a": 1, "b": 2}, {"a": 3, "b": 4}, {"b": 5, "a": 6}]))
+    assert all(type(record) is ops.Record for record in records)
+    schemas = [tp.cast(ops.Record, record).schema for record in records]
+    assert schemas[0] is schemas[1] is ops.Schema.of(("a", "b"))
+    assert schemas[2].columns == ("b", "a")
+    restored = pickle.loads(pickle.dumps(records))
+    assert restored == records and tp.cast(ops.Record, restored[0]).schema is schemas[0]
+    assert list(ops.to_dicts(records)) == [{"a": 1, "b": 2}, {"a": 3, "b": 4}, {"b": 5, "a": 6}]
+    assert all(type(row) is dict for row in ops.to_dicts(records))
+
+
+@pytest.mark.parametrize("row", [{"a": 1, "b": 2}, ops.Record.from_row({"a": 1, "b": 2})])
+def test_set_columns(row: ops.TRow) -> None:
+    for result, expected in [(ops.with_column(row, "a", 3), {"a": 3, "b": 2}),
+                             (ops.with_column(row, "c", 3), {"a": 1, "b": 2, "c": 3}),
+                             (ops.with_columns(row, {"c": 3, "b": 4}), {"a": 1, "b": 4, "c": 3})]:
+        assert type(result) is type(row)
+        assert list(result.items()) == list(expected.items())
+    assert row == {"a": 1, "b": 2}
+
+
+@pytest.mark.parametrize("mapper", [
+    ops.FilterPunctuation("text"),
+    ops.LowerCase("text"),
+    ops.Split("text"),
+    ops.Product(["doc_id", "doc_id"], "square"),
+    ops.Project(["text"]),
+])
+def test_mappers_keep_records(mapper: ops.Mapper) -> None:
+    rows = _docs(20)
+    expected = list(ops.Map(mapper)(iter(rows)))
+    actual = list(ops.Map(mapper)(ops.to_records(rows)))
+    assert all(type(row) is ops.Record for row in actual)
+    assert [list(row.items()) for row in actual] == [list(row.items()) for row in expected]
+
+
+@pytest.mark.parametrize("make_graph", [
+    lambda: algorithms.word_count_graph("docs"),
+    lambda: algorithms.inverted_index_graph("docs"),
+    lambda: algorithms.pmi_graph("docs"),
+])
+def test_algorithms_in_compact_mode(make_graph: tp.Callable[[], Graph]) -> None:
+    docs = _docs(200)
+    graph = make_graph()
+    expected = list(graph.run(docs=lambda: iter(docs)))
+    actual = list(graph.run(compact=True, docs=lambda: iter(docs)))
+    assert actual == expected
+    assert all(type(row) is dict for row in actual)
+
+
+def test_compact_mode_spills_records() -> None:
+    rows = [{"key": i % 7, "value": i} for i in range(100)]
+    graph = Graph.graph_from_iter("data").map(ops.Product(["key", "value"], "product")).sort(["key"], 10)
+    expected = list(graph.run(data=lambda: iter(rows)))
+    actual = list(graph.run(compact=True, data=lambda: iter(rows)))
+    assert actual == expected and [list(row) for row in actual] == [list(row) for row in expected]
+    assert all(type(row) is dict for row in actual)
+
+
+def test_yandex_maps_in_compact_mode() -> None:
+    rng = random.Random(5)
+    lengths = [{"edge_id": i, "start": [rng.uniform(37, 38), rng.uniform(55, 56)],
+                "end": [rng.uniform(37, 38), rng.uniform(55, 56)]} for i in range(50)]
+    times = [{"enter_time": f"201710{rng.randint(10, 28)}T{rng.randint(10, 22)}0000.000000",
+              "leave_time": f"201710{rng.randint(10, 28)}T{rng.randint(10, 22)}3000.000000",
+              "edge_id": rng.randrange(50)} for _ in range(500)]
+    graph = algorithms.yandex_maps_graph("times", "lengths")
+    expected = list(graph.run(times=lambda: iter(times), lengths=lambda: iter(lengths)))
+    assert expected
+    assert list(graph.run(compact=True, times=lambda: iter(times), lengths=lambda: iter(lengths))) == expected
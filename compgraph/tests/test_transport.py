@@ -0,0 +1,48 @@
+from multiprocessing import Pipe, Process, connection, shared_memory
+
+import pytest
+
+from compgraph.transport import RowTransport, SharedMemoryTransport
+
+
+def echo(endpoint: connection.Connection, batch_size: int) -> None:
+    transport = RowTransport(endpoint, batch_size)
+    transport.send_rows(list(transport.recv_rows()))
+
+
+@pytest.mark.parametrize("batch_size, n_rows", [(1, 10), (3, 10), (5, 10), (1024, 0), (1024, 5000)])
+def test_transport_roundtrip(batch_size: int, n_rows: int) -> None:
+    data = [{"text": f"word{i}", "count": i} for i in range(n_rows)]
+    local_endpoint, remote_endpoint = Pipe()
+    process = Process(target=echo, args=(remote_endpoint, batch_size))
+    process.start()
+    transport = RowTransport(local_endpoint, batch_size)
+    assert transport.send_rows(iter(data)) == n_rows
+    assert list(transport.recv_rows()) == data
+    process.join()
+
+
+def echo_shared_memory(endpoint: connection.Connection, segment_name: str, batch_size: int, slot_size: int) -> None:
+    segment = shared_memory.SharedMemory(segment_name)
+    transport = SharedMemoryTransport(endpoint, segment, batch_size, slots=2, slot_size=slot_size)
+    transport.send_rows(list(transport.recv_rows()))
+    del transport
+    segment.close()
+
+
+@pytest.mark.parametrize("batch_size, n_rows, slot_size", [(1, 10, 1024), (7, 1000, 1024), (100, 1000, 1024),
+                                                           (1024, 0, 1024), (1024, 5000, 64 * 1024)],
+                         ids=["tiny-batches", "many-slots-reused", "oversized-batches", "empty", "big"])
+def test_shared_memory_transport_roundtrip(batch_size: int, n_rows: int, slot_size: int) -> None:
+    data = [{"text": f"word{i}", "count": i} for i in range(n_rows)]
+    segment = shared_memory.SharedMemory(create=True, size=2 * slot_size)
+    local_endpoint, remote_endpoint = Pipe()
+    process = Process(target=echo_shared_memory, args=(remote_endpoint, segment.name, batch_size, slot_size))
+    process.start()
+    transport = SharedMemoryTransport(local_endpoint, segment, batch_size, slots=2, slot_size=slot_size)
+    assert transport.send_rows(iter(data)) == n_rows
+    assert list(transport.recv_rows()) == data
+    process.join()
+    del transport
+    segment.close()
+    segment.unlink()
@@ -0,0 +1,48 @@
+import pytest
+
+from compgraph import CompgraphException, operations as ops, worker_pool
+from compgraph.external_sort import ExternalSort
+from compgraph.graph import Graph
+from compgraph.operations import Count
+
+
+def test_sorts_reuse_worker() -> None:
+    data = [{"a": i % 7, "b": i % 3} for i in range(100)]
+    with worker_pool.session() as pool:
+        first = list(ExternalSort(["a"])(iter(data)))
+        second = list(ExternalSort(["b"])(iter(first)))
+        assert pool.spawned == 1
+    assert second == sorted(first, key=lambda row: row["b"])
+
+
+def test_streaming_sorts_hold_own_workers() -> None:
+    data = [{"a": i % 7, "b": i % 3} for i in range(100)]
+    with worker_pool.session() as pool:
+        result = list(ExternalSort(["b"])(ExternalSort(["a"])(iter(data))))
+        assert pool.spawned == 2
+        list(ExternalSort(["a"])(iter(result)))
+        assert pool.spawned == 2
+    assert result == sorted(sorted(data, key=lambda row: row["a"]), key=lambda row: row["b"])
+
+
+def test_pool_is_shut_down_after_run() -> None:
+    graph = Graph.graph_from_iter("data").sort(["a"]).reduce(Count("n"), ["a"]).sort(["n", "a"])
+    data = [{"a": i % 5} for i in range(50)]
+    result = graph.run(data=lambda: iter(data))
+    assert list(result) == [{"n": 10, "a": a} for a in range(5)]
+    assert worker_pool._pool is None
+
+
+def test_abandoned_sort_releases_pool() -> None:
+    graph = Graph.graph_from_iter("data").sort(["a"])
+    result = iter(graph.run(data=lambda: iter([{"a": i} for i in range(10000)])))
+    assert next(result) == {"a": 0}
+    result.close()  # type: ignore
+    assert worker_pool._pool is None
+
+
+def test_worker_failure_is_reported() -> None:
+    data: list[ops.TRow] = [{"a": 1}, {"a": "x"}]
+    with pytest.raises(CompgraphException):
+        list(ExternalSort(["a"])(iter(data)))
+    assert worker_pool._pool is None